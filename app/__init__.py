@@ -43,10 +43,30 @@ def create_app(config_name='development'):
     from app.extensions import init_extensions
     init_extensions(app)
     
+    # Persistent Jinja bytecode cache shared by workers and restarts
+    from app.template_cache import init_template_cache
+    init_template_cache(app)
+    
+    # Initialize the password hashing service
+    from app.hashing import init_hashing
+    init_hashing(app)
+
     # Initialize Flask-Assets (SCSS compilation)
     from app.assets import init_assets
     init_assets(app)
 
+    # Responsive image variants and the responsive_image() template global
+    from app.images import init_images
+    init_images(app)
+
+    # Inlined critical CSS and purged per-page stylesheets (page_styles() global)
+    from app.critical_css import init_critical_css
+    init_critical_css(app)
+
+    # Precompressed .br/.gz static siblings and the in-memory static file index
+    from app.static_files import init_static_files, unversioned_cache_control
+    init_static_files(app)
+
     # Register blueprints
     _register_blueprints(app)
 
@@ -69,6 +89,7 @@ def create_app(config_name='development'):
             'app_name': 'Sing App',
             'app_version': '1.0.0',
             'form_csrf': lambda: f'<input type="hidden" name="csrf_token" value="{generate_csrf()}">',
+            **_layout_cache_context(app),
         }
     
     # Register error handlers
@@ -94,13 +115,22 @@ def create_app(config_name='development'):
         """
         Add long-lived Cache-Control headers to static assets in production.
         In development (app.debug=True), do nothing so hot-reload works normally.
+
+        Only content-hashed files from the asset manifest are immutable; any
+        other static URL (including /node_modules/) may change in place, so it
+        gets STATIC_UNVERSIONED_MAX_AGE. StaticFilesMiddleware sends the same
+        headers for the files it serves itself.
         """
         if app.debug:
             return response
         if response.content_type and request.path.startswith('/static/'):
-            response.cache_control.max_age = 31_536_000   # 1 year
-            response.cache_control.immutable = True
-            response.cache_control.public = True
+            from app.assets import is_fingerprinted
+            if is_fingerprinted(app, request.path[len('/static/'):]):
+                response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+            else:
+                response.headers['Cache-Control'] = unversioned_cache_control(app)
+        elif response.status_code in (200, 206, 304) and request.path.startswith('/node_modules/'):
+            response.headers['Cache-Control'] = unversioned_cache_control(app)
         return response
     
     # Health check endpoint — must respond 200 quickly for Render / load balancers
@@ -112,10 +142,15 @@ def create_app(config_name='development'):
     @app.route('/node_modules/<path:filename>')
     def serve_node_modules(filename):
         """Serve files from static/node_modules folder."""
-        from flask import send_from_directory
+        from app.static_files import send_offloadable_file
         import os
         node_modules_path = os.path.join(app.root_path, '..', 'static', 'node_modules')
-        return send_from_directory(node_modules_path, filename)
+        return send_offloadable_file(node_modules_path, filename)
+    
+    # Compile every template before the first request instead of on it
+    if app.config.get('TEMPLATE_EAGER_LOAD'):
+        from app.template_cache import eager_load_templates
+        eager_load_templates(app)
     
     app.logger.info(f'Flask Sing App initialized in {config_name} mode.')
     
@@ -148,7 +183,9 @@ def _register_blueprints(app):
     # Register examples blueprint (conditionally)
     if app.config.get('ENABLE_EXAMPLES'):
         from app.examples import examples_bp
+        from app.examples.snapshots import init_snapshots
         app.register_blueprint(examples_bp, url_prefix='/examples')
+        init_snapshots(app)
         app.logger.info('Examples blueprint registered.')
     else:
         app.logger.info('Examples blueprint disabled via ENABLE_EXAMPLES.')
@@ -158,6 +195,7 @@ def _register_cli(app):
     """
     Register Flask CLI commands.
     """
+    import click
     from app.extensions import db
     
     @app.cli.command('init-db')
@@ -185,27 +223,151 @@ def _register_cli(app):
             print('Database already has users — skipping seed.')
     
     @app.cli.command('compile-assets')
-    def compile_assets():
-        """Compile SCSS to CSS using Flask-Assets."""
-        from flask_assets import Environment
-        
-        # Get existing Environment instance from app.extensions
-        assets = app.extensions.get('assets')
-        if assets is None:
-            # Create new if not found (e.g., when running CLI directly)
-            assets = Environment(app)
-        
+    @click.option('--force', is_flag=True, help='Ignore the dependency graph and rebuild everything.')
+    @click.option('--watch', is_flag=True, help='Keep running and rebuild when a source file changes.')
+    @click.option('--interval', default=1.0, show_default=True, help='Seconds between --watch polls.')
+    def compile_assets(force, watch, interval):
+        """Compile changed SCSS bundles with libsass (incremental, parallel)."""
+        from app.scss import build_scss, watch_scss
+
+        def report(result):
+            for name, bundle in sorted(result['bundles'].items()):
+                output = os.path.relpath(bundle['output'], os.path.dirname(app.root_path))
+                if bundle['status'] == 'compiled':
+                    print(f"  Created: {output} ({bundle['bytes']:,} B in {bundle['seconds']:.2f} s)")
+                elif bundle['status'] == 'failed':
+                    print(f"  Failed: {name}: {bundle['error']}")
+                else:
+                    print(f"  Up to date: {output}")
+            kind = 'cold' if result['cold'] else 'warm'
+            print(f"SCSS build ({kind}) finished in {result['seconds']:.2f} s, "
+                  f"{result['hashed']} source files read.")
+
         print('Compiling SCSS assets...')
-        try:
-            assets['main_css'].build()
-            print('  Created: static/css/application.css')
-            assets['dark_css'].build()
-            print('  Created: static/css/application-dark.css')
-            print('SCSS compilation complete!')
-        except KeyError as e:
-            print(f'Bundle not found: {e}. Check app/assets.py bundle registration.')
-        except Exception as e:
-            print(f'Error compiling assets: {e}')
+        if watch:
+            print(f'Watching for changes every {interval:g} s (Ctrl+C to stop)...')
+            try:
+                watch_scss(app, interval, report)
+            except KeyboardInterrupt:
+                pass
+            return
+        result = build_scss(app, force=force)
+        report(result)
+        if any(b['status'] == 'failed' for b in result['bundles'].values()):
+            raise SystemExit(1)
+    
+    @app.cli.command('build-images')
+    def build_images():
+        """Write resized AVIF/WebP variants of static images (cached by source hash)."""
+        from app.images import VARIANTS_DIR, build_images as build
+
+        print('Building responsive image variants...')
+        stats = build(app)
+        print(f"{stats['images']} images: {stats['generated']} variants written, "
+              f"{stats['cached']} cached, {stats['removed']} stale removed (static/{VARIANTS_DIR}/)")
+        print(f"Originals: {stats['source_bytes'] / 1024:,.0f} KB, largest variants: "
+              f"{stats['variant_bytes'] / 1024:,.0f} KB")
+        print('Run `flask fingerprint-assets` next when fingerprinting is enabled.')
+    
+    @app.cli.command('precompile-templates')
+    def precompile_templates():
+        """Compile every template into the Jinja bytecode cache."""
+        from app.template_cache import cache_dir, precompile_templates as precompile
+
+        if app.jinja_env.bytecode_cache is None:
+            print('TEMPLATE_BYTECODE_CACHE is off (or its directory is not writable); nothing to warm.')
+            raise SystemExit(1)
+        print('Precompiling templates...')
+        stats = precompile(app)
+        for name, error in sorted(stats['errors'].items()):
+            print(f'  FAILED {name}: {error}')
+        print(f"{stats['templates']} templates in {stats['seconds']:.2f}s: {stats['compiled']} compiled, "
+              f"{stats['cached']} already cached ({cache_dir(app)})")
+        if stats['errors']:
+            raise SystemExit(1)
+    
+    @app.cli.command('subset-fonts')
+    def subset_fonts():
+        """Write WOFF2 subsets of the icon fonts with only the glyphs the app uses."""
+        from app.fonts import SUBSETS_DIR, build_font_subsets
+
+        print('Subsetting fonts...')
+        index = build_font_subsets(app)
+        for font_path, entry in sorted(index.items()):
+            print(f"  {font_path:<42} {entry['source_bytes'] / 1024:>6,.1f} KB -> {entry['bytes'] / 1024:>5,.1f} KB "
+                  f"({entry['glyphs']} glyphs, {entry['status']})")
+        total = sum(e['source_bytes'] for e in index.values())
+        subset = sum(e['bytes'] for e in index.values())
+        print(f"{len(index)} fonts: {total / 1024:,.0f} KB -> {subset / 1024:,.0f} KB (static/{SUBSETS_DIR}/)")
+        if not app.config.get('FONT_SUBSETTING', True):
+            print('FONT_SUBSETTING is off: fingerprint-assets keeps publishing the full fonts '
+                  '(it is read at build time only).')
+        print('Run `flask fingerprint-assets` next when fingerprinting is enabled.')
+    
+    @app.cli.command('purge-css')
+    def purge_css():
+        """Write purged and critical CSS per page group from the rendered pages."""
+        from app.critical_css import PURGED_INDEX, build_purged_css
+
+        print('Rendering pages and purging unused CSS...')
+        index = build_purged_css(app)
+        full_raw, full_gz = index['full']
+        print(f"{'route':<38} {'group':<20} {'critical KB':>12} {'async KB':>10}   (gzip)")
+        for endpoint, route in index['routes'].items():
+            (crit_raw, crit_gz), (css_raw, css_gz) = route['critical_bytes'], route['css_bytes']
+            print(f"  {route['path']:<36} {route['group']:<20} {crit_raw / 1024:>6,.1f} ({crit_gz / 1024:>4,.1f}) "
+                  f"{css_raw / 1024:>6,.1f} ({css_gz / 1024:>4,.1f})")
+        print(f"Full stylesheets: {full_raw / 1024:,.0f} KB ({full_gz / 1024:,.0f} KB gzip) render-blocking on "
+              f"every page; {len(index['groups'])} groups written in {index['seconds']:.1f}s ({PURGED_INDEX}).")
+        print('Run `flask fingerprint-assets` next when fingerprinting is enabled.')
+    
+    @app.cli.command('build-bundles')
+    def build_bundles():
+        """Concatenate per-page JS/CSS bundles from the libraries templates declare."""
+        from app.assets import build_bundles as build
+
+        print('Building page bundles...')
+        for name, sizes in sorted(build(app).items()):
+            print(f"  {name}: {sizes['js']:,} B JS, {sizes['css']:,} B CSS")
+        print('Run `flask fingerprint-assets` next when fingerprinting is enabled.')
+    
+    @app.cli.command('fingerprint-assets')
+    def fingerprint_assets():
+        """Write content-hashed copies of static files and the asset manifest."""
+        from app.assets import DIST_DIR, MANIFEST_NAME, build_fingerprints
+
+        print('Fingerprinting static assets...')
+        manifest = build_fingerprints(app)
+        print(f'{len(manifest)} files written to static/{DIST_DIR}/ '
+              f'(manifest: static/{DIST_DIR}/{MANIFEST_NAME})')
+        print('Run `flask precompress-assets` next, then restart the app to serve the new URLs.')
+    
+    @app.cli.command('precompress-assets')
+    def precompress_assets():
+        """Write .br/.gz siblings for compressible files under static/."""
+        from app.static_files import precompress_static
+
+        print('Precompressing static assets...')
+        stats = precompress_static(app)
+        saved = stats['bytes_in'] - stats['bytes_out']
+        print(f"{stats['written']} written, {stats['unchanged']} up to date, "
+              f"{stats['removed']} orphaned siblings removed "
+              f"({saved / 1024:,.0f} KB saved on files compressed this run)")
+    
+    @app.cli.command('prerender')
+    def prerender():
+        """Pre-render static example pages for PRERENDER_EXAMPLES=true."""
+        if not app.config.get('ENABLE_EXAMPLES'):
+            print('ENABLE_EXAMPLES is False — nothing to pre-render.')
+            return
+
+        from app.examples.snapshots import build_snapshots, snapshot_dir
+
+        print('Pre-rendering example pages...')
+        rendered, skipped = build_snapshots(app)
+        for endpoint, reason in sorted(skipped.items()):
+            print(f'  Dynamic: {endpoint} ({reason})')
+        print(f'{len(rendered)} pages written to {snapshot_dir(app)}')
     
     @app.cli.command('clear-cache')
     def clear_cache():
@@ -215,6 +377,32 @@ def _register_cli(app):
         print('Cache cleared.')
 
 
+def _layout_cache_context(app):
+    """
+    Vary-on values for the {% cache %} fragments in base.html.
+
+    Fragments are shared by every visitor with the same role and theme, so
+    anything per-user or per-request (user menu, flash messages, CSRF tokens)
+    must stay outside them. In debug mode the fragments are re-rendered on
+    every request (timeout 'del') so template edits show up immediately.
+    """
+    from flask_login import current_user
+
+    if not current_user.is_authenticated:
+        role = 'anonymous'
+    elif current_user.is_admin:
+        role = 'admin'
+    else:
+        role = 'user'
+    theme = 'dark' if app.config.get('ENABLE_DARK_THEME') else 'light'
+    # The asset manifest version busts fragments that embed fingerprinted static URLs
+    return {
+        'layout_cache_key': (f"{app.config.get('APP_VERSION')}:"
+                             f"{app.extensions.get('asset_manifest_version', '')}:{theme}:{role}"),
+        'layout_cache_timeout': 'del' if app.debug else app.config['LAYOUT_FRAGMENT_CACHE_TIMEOUT'],
+    }
+
+
 def _configure_logging(app):
     """
     Attach a rotating file handler in development mode.
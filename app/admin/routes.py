@@ -5,6 +5,7 @@ from app.admin import admin_bp
 from app.admin.forms import UserForm
 from app.models import User
 from app.extensions import db
+from app.streaming import render_page
 from app.utils import conditional_login_required
 
 
@@ -26,11 +27,13 @@ def admin_required(f):
 @admin_bp.route('/users')
 @admin_required
 def users_list():
-    users = User.query.order_by(User.id).all()
-    return render_template('admin/users_list.html',
-                           title='User Management',
-                           active_page='admin_users',
-                           users=users)
+    # Streamed, with the rows fetched in batches while the table renders:
+    # the <head> goes out before the query runs
+    users = User.query.order_by(User.id).yield_per(500)
+    return render_page('admin/users_list.html', csrf=True,
+                       title='User Management',
+                       active_page='admin_users',
+                       users=users)
 
 
 @admin_bp.route('/users/new', methods=['GET', 'POST'])
@@ -1,10 +1,23 @@
 """
 Flask Sing App - API Blueprint Routes
 """
-from flask import jsonify, request, current_app
+import base64
+import binascii
+import csv
+import hashlib
+import io
+import json
+from datetime import timezone
+
+from flask import jsonify, request, current_app, abort, Response, stream_with_context
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
 from app.api import api_bp
 from app.models import User
 from app.extensions import db
+from app.hashing import HashingBusy, hash_passwords
+from app.images import image_srcset
 
 
 # ── Error handlers (JSON instead of HTML for API consumers) ──────────────────
@@ -24,21 +37,199 @@ def api_bad_request(e):
     return jsonify(error='Bad Request', message=str(e)), 400
 
 
+@api_bp.errorhandler(413)
+def api_payload_too_large(e):
+    return jsonify(error='Payload Too Large', message=str(e)), 413
+
+
+# ── Conditional GET (ETag / Last-Modified) ───────────────────────────────────
+
+# Flask-Compress appends the coding to strong ETags ("abc" -> "abc:gzip")
+_COMPRESSED_ETAG_SUFFIXES = ('', ':gzip', ':br', ':deflate', ':zstd')
+
+
+def _not_modified(etag, last_modified):
+    """
+    Return a 304 response if the request's validators match, else None.
+
+    If-None-Match takes precedence over If-Modified-Since (RFC 9110 §13.2.2).
+    Called before the body is serialized so unchanged resources skip it.
+    """
+    if request.if_none_match:
+        for suffix in _COMPRESSED_ETAG_SUFFIXES:
+            if request.if_none_match.contains(etag + suffix):
+                return _with_validators(current_app.response_class(status=304),
+                                        etag + suffix, last_modified)
+        return None
+    if last_modified and request.if_modified_since:
+        if _http_date(last_modified) <= request.if_modified_since:
+            return _with_validators(current_app.response_class(status=304),
+                                    etag, last_modified)
+    return None
+
+
+def _with_validators(response, etag, last_modified):
+    """Attach a strong ETag and Last-Modified header to `response`."""
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = _http_date(last_modified)
+    return response
+
+
+def _http_date(value):
+    """Naive UTC column value -> aware datetime at HTTP-date (second) resolution."""
+    return value.replace(microsecond=0, tzinfo=timezone.utc)
+
+
+def _user_validators(user, fields):
+    """ETag and Last-Modified for a single user, from its row version."""
+    etag = f'user-{user.id}-v{user.version}'
+    if fields != User.SERIALIZABLE_FIELDS:
+        etag += '-' + '.'.join(fields)
+    return etag, user.updated_at
+
+
+# Selected with every listed page: the validators are computed from them
+_VALIDATOR_COLUMNS = ('id', 'version', 'updated_at')
+
+
+def _user_list_validators(rows, meta):
+    """
+    ETag and Last-Modified for one page of a users listing, from its own rows.
+
+    The (id, version) pairs change whenever a row on the page is added,
+    removed or updated; `meta` holds the rest of the payload that depends
+    on other rows (total/pages, next_cursor). The query string is mixed in
+    because it selects the fields. No extra query is run.
+    """
+    digest = hashlib.sha1(request.query_string)
+    for row in rows:
+        digest.update(f'{row.id}:{row.version},'.encode())
+    digest.update(json.dumps(meta, sort_keys=True).encode())
+    last_modified = max((row.updated_at for row in rows if row.updated_at), default=None)
+    return f'users-{digest.hexdigest()}', last_modified
+
+
+# ── Sparse fieldsets (?fields=id,username) ───────────────────────────────────
+
+def _requested_fields():
+    """
+    Parse ?fields= into a tuple of User.SERIALIZABLE_FIELDS names.
+
+    Defaults to every field; aborts with 400 on unknown names.
+    """
+    raw = request.args.get('fields')
+    if raw is None:
+        return User.SERIALIZABLE_FIELDS
+    fields = tuple(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in User.SERIALIZABLE_FIELDS]
+    if not fields or unknown:
+        abort(400, description='fields must be a comma-separated subset of: '
+                               + ', '.join(User.SERIALIZABLE_FIELDS))
+    return fields
+
+
+def _columns(fields):
+    """User columns for a column-only SELECT of `fields`."""
+    return [getattr(User, field) for field in fields]
+
+
+def _row_to_dict(row, fields):
+    """Serialize a column-only result row like User.to_dict(fields) would."""
+    return {field: User.serialize_value(row._mapping[field]) for field in fields}
+
+
 # ── Users ─────────────────────────────────────────────────────────────────────
 
+_MAX_CURSOR_ID = 2 ** 63 - 1
+
+
+def _encode_cursor(last_id):
+    """Encode the last seen user id as an opaque, URL-safe cursor."""
+    raw = json.dumps({'id': last_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def _decode_cursor(cursor):
+    """Decode a cursor produced by _encode_cursor(). Aborts with 400 if malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))['id']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        abort(400, description='Invalid cursor')
+    # bool is an int subclass; ids beyond BIGINT overflow the database driver
+    if type(last_id) is not int or not 1 <= last_id <= _MAX_CURSOR_ID:
+        abort(400, description='Invalid cursor')
+    return last_id
+
+
 @api_bp.route('/users', methods=['GET'])
 def get_users():
-    """List users. Supports ?page= and ?per_page= query parameters."""
-    page = request.args.get('page', 1, type=int)
-    per_page = min(request.args.get('per_page', 20, type=int), 100)
+    """
+    List active users.
+
+    Two pagination modes are supported:
+
+    - Offset mode (default): ?page= and ?per_page= — returns total/pages,
+      which costs a COUNT(*) and an OFFSET scan per call.
+    - Cursor mode: ?after=<cursor>&limit= (an empty ?after= starts at the
+      first page) — seeks on users.id, so every page costs the same.
+      Returns next_cursor (null on the last page); the total is only
+      computed when ?count=true is passed.
+
+    ?fields=id,username narrows the response; only those columns are
+    selected and no ORM objects are built.
+    """
     query = User.query.filter_by(is_active=True).order_by(User.id)
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-    return jsonify({
-        'users': [u.to_dict() for u in pagination.items],
-        'total': pagination.total,
-        'page': pagination.page,
-        'pages': pagination.pages,
-    })
+    fields = _requested_fields()
+
+    if 'after' in request.args or 'limit' in request.args:
+        rows, meta = _get_users_by_cursor(query, fields)
+    else:
+        page = request.args.get('page', 1, type=int)
+        per_page = min(request.args.get('per_page', 20, type=int), 100)
+        pagination = query.with_entities(*_columns(dict.fromkeys(fields + _VALIDATOR_COLUMNS))).paginate(
+            page=page, per_page=per_page, error_out=False)
+        rows = pagination.items
+        meta = {'total': pagination.total, 'page': pagination.page, 'pages': pagination.pages}
+
+    # Validators come from the page itself, so a 304 saves serialization and transfer only
+    etag, last_modified = _user_list_validators(rows, meta)
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified:
+        return not_modified
+    payload = {'users': [_row_to_dict(row, fields) for row in rows], **meta}
+    return _with_validators(jsonify(payload), etag, last_modified)
+
+
+def _get_users_by_cursor(query, fields):
+    """
+    Keyset pagination for get_users(): WHERE id > :after ORDER BY id LIMIT :limit.
+
+    Returns:
+        tuple: (rows of the page, {'next_cursor', 'limit'[, 'total']})
+    """
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    after = request.args.get('after', '')
+
+    page_query = query
+    if after:
+        page_query = page_query.filter(User.id > _decode_cursor(after))
+
+    # Fetch one extra row to learn whether another page exists without counting;
+    # id (next cursor) and version/updated_at (validators) are always selected
+    columns = _columns(dict.fromkeys(fields + _VALIDATOR_COLUMNS))
+    rows = page_query.with_entities(*columns).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    meta = {
+        'next_cursor': _encode_cursor(rows[-1].id) if has_more else None,
+        'limit': limit,
+    }
+    if request.args.get('count', 'false').lower() == 'true':
+        meta['total'] = query.order_by(None).count()
+    return rows, meta
 
 
 @api_bp.route('/users', methods=['POST'])
@@ -62,10 +253,214 @@ def create_user():
     return jsonify(user.to_dict()), 201
 
 
+@api_bp.route('/users/bulk', methods=['POST'])
+def bulk_create_users():
+    """
+    Create many users in one request.
+
+    Accepts a JSON array of {username, email, password} objects, or the same
+    objects as NDJSON (Content-Type: application/x-ndjson). Only NDJSON is
+    read line by line; a JSON array is parsed in one piece, so its body is
+    capped at BULK_IMPORT_JSON_MAX_BYTES (413 above it). Rows are processed in batches of BULK_IMPORT_BATCH_SIZE:
+    one duplicate-check query, pooled password hashing and one executemany
+    INSERT per batch. The response streams one NDJSON result per input row,
+    in input order, followed by a summary line. A batch that cannot get a
+    hashing slot (HashingBusy) is reported as per-row errors to retry.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        rows = _iter_ndjson_rows()
+    else:
+        request.max_content_length = current_app.config.get('BULK_IMPORT_JSON_MAX_BYTES')
+        data = request.get_json(silent=True)
+        if not isinstance(data, list):
+            return jsonify(error='JSON array or NDJSON body required'), 400
+        rows = iter(data)
+
+    batch_size = current_app.config.get('BULK_IMPORT_BATCH_SIZE', 500)
+
+    def generate():
+        seen_usernames, seen_emails = set(), set()
+        summary = {'created': 0, 'skipped': 0, 'error': 0}
+        batch = []
+        for index, row in enumerate(rows):
+            batch.append((index, row))
+            if len(batch) >= batch_size:
+                yield from _import_batch(batch, seen_usernames, seen_emails, summary)
+                batch = []
+        if batch:
+            yield from _import_batch(batch, seen_usernames, seen_emails, summary)
+        yield json.dumps({'summary': summary}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def _iter_ndjson_rows():
+    """Yield one parsed object per non-blank NDJSON line of the request body."""
+    for line in request.stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None   # reported as an invalid row, keeps indexes aligned
+
+
+def _import_batch(batch, seen_usernames, seen_emails, summary):
+    """
+    Validate, de-duplicate, hash and insert one batch for bulk_create_users().
+
+    Yields one NDJSON result line per row in `batch`.
+    """
+    results = {}
+    candidates = []
+    for index, row in batch:
+        if not isinstance(row, dict):
+            results[index] = {'status': 'error', 'error': 'Row must be a JSON object'}
+            continue
+        missing = [f for f in ('username', 'email', 'password')
+                   if not isinstance(row.get(f), str) or not row.get(f)]
+        if missing:
+            results[index] = {'status': 'error',
+                              'error': f'Missing fields: {", ".join(missing)}'}
+            continue
+        if row['username'] in seen_usernames or row['email'] in seen_emails:
+            results[index] = {'status': 'skipped', 'error': 'Duplicate in request body'}
+            continue
+        seen_usernames.add(row['username'])
+        seen_emails.add(row['email'])
+        candidates.append((index, row))
+
+    # One set-based query for every username/email in the batch
+    if candidates:
+        existing = db.session.execute(
+            select(User.username, User.email).where(or_(
+                User.username.in_([r['username'] for _, r in candidates]),
+                User.email.in_([r['email'] for _, r in candidates]),
+            ))
+        ).all()
+        taken_usernames = {username for username, _ in existing}
+        taken_emails = {email for _, email in existing}
+        fresh = []
+        for index, row in candidates:
+            if row['username'] in taken_usernames or row['email'] in taken_emails:
+                results[index] = {'status': 'skipped',
+                                  'error': 'Username or email already exists'}
+            else:
+                fresh.append((index, row))
+        candidates = fresh
+
+    if candidates:
+        try:
+            hashes = hash_passwords([row['password'] for _, row in candidates])
+        except HashingBusy:
+            # The stream is already a 200; report the batch so the client can retry those rows
+            for index, _ in candidates:
+                results[index] = {'status': 'error', 'error': 'Server busy, retry'}
+            candidates = []
+
+    if candidates:
+        values = [
+            {'username': row['username'], 'email': row['email'], 'password_hash': pw_hash}
+            for (_, row), pw_hash in zip(candidates, hashes)
+        ]
+        try:
+            ids = _insert_users(values)
+            db.session.commit()
+        except IntegrityError:
+            # Lost a race with a concurrent writer; report the batch rather than abort the stream
+            db.session.rollback()
+            for index, _ in candidates:
+                results[index] = {'status': 'error', 'error': 'Conflicting concurrent insert'}
+        else:
+            for (index, _), user_id in zip(candidates, ids):
+                results[index] = {'status': 'created', 'id': user_id}
+
+    for index, _ in batch:
+        result = results[index]
+        summary[result['status']] += 1
+        yield json.dumps({'index': index, **result}) + '\n'
+
+
+def _insert_users(values):
+    """
+    INSERT `values` and return the new ids in the same order.
+
+    One executemany INSERT .. RETURNING where the backend can return ids in
+    parameter order (SQLite 3.35+, PostgreSQL, MariaDB 10.5+ ...), else one
+    INSERT per row in the same transaction.
+    """
+    if db.engine.dialect.insert_executemany_returning_sort_by_parameter_order:
+        return db.session.execute(
+            insert(User).returning(User.id, sort_by_parameter_order=True), values
+        ).scalars().all()
+    return [db.session.execute(insert(User).values(**row)).inserted_primary_key[0]
+            for row in values]
+
+
+_EXPORT_BATCH_SIZE = 1000
+
+
+@api_bp.route('/users/export', methods=['GET'])
+def export_users():
+    """
+    Stream every user as NDJSON (default) or CSV: ?format=ndjson|csv.
+
+    Rows are read through a server-side cursor (yield_per) as plain column
+    tuples — no ORM objects — and written out one batch at a time, so
+    memory use stays flat regardless of table size. Supports ?fields=.
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify(error='format must be one of: ndjson, csv'), 400
+
+    names = _requested_fields()
+
+    def batches():
+        result = db.session.execute(
+            select(*_columns(names)).order_by(User.id)
+            .execution_options(yield_per=_EXPORT_BATCH_SIZE)
+        )
+        for partition in result.partitions():
+            yield [[User.serialize_value(value) for value in row] for row in partition]
+
+    def generate_ndjson():
+        for batch in batches():
+            yield ''.join(json.dumps(dict(zip(names, row))) + '\n' for row in batch)
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+        for batch in batches():
+            writer.writerows(batch)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()   # header only, when the table is empty
+
+    generate, mimetype = {
+        'ndjson': (generate_ndjson, 'application/x-ndjson'),
+        'csv': (generate_csv, 'text/csv'),
+    }[fmt]
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=users.{fmt}'
+    return response
+
+
 @api_bp.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
-    user = User.query.get_or_404(user_id)
-    return jsonify(user.to_dict())
+    """
+    Get one user. Supports ?fields= and answers If-None-Match /
+    If-Modified-Since with 304.
+    """
+    fields = _requested_fields()
+    user = User.query.options(
+        load_only(*_columns(fields), User.version, User.updated_at)
+    ).filter_by(id=user_id).first_or_404()
+    etag, last_modified = _user_validators(user, fields)
+    return (_not_modified(etag, last_modified)
+            or _with_validators(jsonify(user.to_dict(fields)), etag, last_modified))
 
 
 @api_bp.route('/users/<int:user_id>', methods=['PUT', 'PATCH'])
@@ -105,6 +500,7 @@ def get_settings():
 def get_notifications():
     return jsonify([
         {'type': 'user', 'avatar': '/static/demo/img/people/a3.jpg',
+         'avatar_srcset': image_srcset('demo/img/people/a3.jpg'),
          'text': '1 new user just signed up!', 'time': '2 mins ago'},
         {'type': 'system', 'icon': 'fa-solid fa-upload',
          'text': '2.1.0-pre-alpha just released.', 'time': '5h ago'},
@@ -117,5 +513,6 @@ def get_notifications():
 def get_messages():
     return jsonify([
         {'from': 'Philip Smith', 'avatar': '/static/demo/img/people/a5.jpg',
+         'avatar_srcset': image_srcset('demo/img/people/a5.jpg'),
          'text': 'Hey, are you there?', 'time': '12:18 AM'},
     ])
@@ -2,8 +2,100 @@
 Flask Sing App - Asset Bundles Configuration
 
 Defines SCSS/CSS and JS bundles for the application using Flask-Assets.
+
+Fingerprinting: `flask fingerprint-assets` publishes every static file in
+static/dist/ under a content-hashed name (css/app.css ->
+dist/css/app.3f9c2a1b.css) and writes dist/manifest.json. At startup the
+manifest is loaded once and url_for('static', filename=...) resolves
+through it, so a changed file always gets a new URL and the hashed copies
+can be cached forever. Only stylesheets (their url()s are rewritten) are
+written out; every other file is hard-linked, so dist/ takes almost no
+extra disk space. The build commands replace their outputs (write + rename)
+rather than rewriting them in place, which would change a linked copy
+under its old hash. Each build is published next to the previous ones,
+so pages rendered by workers still running the old manifest (and caches
+holding them) keep resolving; files referenced by none of the last
+ASSET_RETENTION_GENERATIONS manifests are pruned. Image variants (flask
+build-images) already carry a content hash in their names and are served
+as they are.
+
+Page bundles: each page template declares the front-end libraries it uses,
+
+    {% extends "base.html" %}
+    {% set page_libraries = ['flot'] %}
+
+and the layout emits only those (plus their `requires`). `flask
+build-bundles` concatenates every combination used by a template into one
+JS and one CSS file; until a bundle is built, or with ASSETS_DEBUG, the
+library files are linked individually.
 """
+import glob
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+from collections import namedtuple
+
+from flask import current_app
 from flask_assets import Bundle, Environment
+from jinja2 import nodes
+
+try:
+    import rjsmin
+except ImportError:   # vendor files are concatenated as shipped (already minified)
+    rjsmin = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Source-only folders under static/ that are never served directly
+_FINGERPRINT_SKIP = {DIST_DIR, 'sass'}
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+# Front-end libraries available to page templates. Files load in the order
+# listed; `requires` names libraries that must load first. Declaration order
+# is also the load order, so a library must come after everything it requires.
+LIBRARIES = {
+    'core': {
+        # Layout dropdowns, collapsible sidebar sections, inline jQuery
+        'js': ['js/vendor/jquery.min.js', 'js/vendor/popper.min.js', 'js/vendor/bootstrap.min.js'],
+    },
+    'chartjs': {'js': ['js/vendor/chart.umd.min.js']},
+    'raphael': {'js': ['js/vendor/raphael.min.js']},
+    'morris': {
+        'js': ['js/vendor/morris.min.js'],
+        'css': ['css/vendor/morris.css'],
+        'requires': ['core', 'raphael'],
+    },
+    'flot': {
+        'js': ['js/vendor/jquery.flot.min.js', 'js/vendor/jquery.flot.time.min.js',
+               'js/vendor/jquery.flot.pie.min.js', 'js/vendor/jquery.flot.stack.min.js'],
+        'requires': ['core'],
+    },
+    'd3': {'js': ['js/vendor/d3.min.js']},
+    'rickshaw': {
+        'js': ['js/vendor/rickshaw.min.js'],
+        'css': ['css/vendor/rickshaw.min.css'],
+        'requires': ['core', 'd3'],
+    },
+    'animate-number': {'js': ['js/vendor/jquery.animateNumber.min.js'], 'requires': ['core']},
+    'fullcalendar': {'js': ['js/vendor/fullcalendar.global.min.js']},
+    'leaflet': {'js': ['js/vendor/leaflet.js'], 'css': ['css/vendor/leaflet.css']},
+}
+# Libraries every page gets, whatever it declares
+BASE_LIBRARIES = ('core',)
+# Bundles sit next to the vendor files so relative url()s in the CSS still resolve
+_BUNDLE_JS = 'js/vendor/bundle.{}.js'
+_BUNDLE_CSS = 'css/vendor/bundle.{}.css'
+
+PageAssets = namedtuple('PageAssets', 'name js css')
+
+# SCSS entry points: bundle name -> (source, output), relative to static/
+SCSS_BUNDLES = {
+    'main_css': ('sass/application.scss', 'css/application.css'),
+    'dark_css': ('sass/application-dark.scss', 'css/application-dark.css'),
+}
 
 def init_assets(app):
     """Initialize Flask-Assets with SCSS compilation."""
@@ -15,26 +107,15 @@ def init_assets(app):
     css_output_dir = os.path.join(static_dir, 'css')
     os.makedirs(css_output_dir, exist_ok=True)
     
-    # SCSS/CSS Bundles
-    # Main application styles
-    main_scss = Bundle(
-        'sass/application.scss',
-        output='css/application.css',
-        filters=['libsass'],
-        depends=['sass/**/*.scss']
-    )
-    
-    # Dark theme styles
-    dark_scss = Bundle(
-        'sass/application-dark.scss',
-        output='css/application-dark.css',
-        filters=['libsass'],
-        depends=['sass/**/*.scss']
-    )
-    
-    # Register CSS bundles
-    assets.register('main_css', main_scss)
-    assets.register('dark_css', dark_scss)
+    # SCSS/CSS Bundles (main application styles and dark theme). `flask
+    # compile-assets` builds them incrementally through app/scss.py.
+    for name, (source, output) in SCSS_BUNDLES.items():
+        assets.register(name, Bundle(
+            source,
+            output=output,
+            filters=['libsass'],
+            depends=['sass/**/*.scss']
+        ))
     
     # JavaScript Bundles
     # Main app JavaScript
@@ -47,4 +128,335 @@ def init_assets(app):
     # Register JS bundles
     assets.register('main_js', main_js)
     
+    init_bundles(app)
+    init_fingerprints(app)
+    
     return assets
+
+
+def resolve_libraries(names):
+    """
+    Return `names` plus BASE_LIBRARIES and everything they require, in load order.
+
+    Raises:
+        ValueError: if a name is not declared in LIBRARIES
+    """
+    wanted = set()
+    pending = list(BASE_LIBRARIES) + list(names)
+    while pending:
+        name = pending.pop()
+        if name not in LIBRARIES:
+            raise ValueError(f'Unknown front-end library {name!r}; declare it in app/assets.py LIBRARIES')
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(LIBRARIES[name].get('requires', ()))
+    return [name for name in LIBRARIES if name in wanted]
+
+
+def page_assets(names=()):
+    """
+    Static filenames of the JS and CSS a page needs (template global).
+
+    Returns the prebuilt bundle when it exists, otherwise the individual
+    library files. With ASSET_PAGE_BUNDLES off every library is loaded, as
+    the layout did before page bundles existed.
+    """
+    app = current_app
+    if not app.config.get('ASSET_PAGE_BUNDLES', True):
+        names = list(LIBRARIES)
+    libraries = resolve_libraries(names)
+    name = '.'.join(libraries)
+    if name in app.extensions.get('asset_bundles', ()) and not app.config.get('ASSETS_DEBUG'):
+        css = [_BUNDLE_CSS.format(name)] if any(LIBRARIES[lib].get('css') for lib in libraries) else []
+        return PageAssets(name, [_BUNDLE_JS.format(name)], css)
+    return PageAssets(
+        name,
+        [f for lib in libraries for f in LIBRARIES[lib].get('js', ())],
+        [f for lib in libraries for f in LIBRARIES[lib].get('css', ())],
+    )
+
+
+def declared_library_sets(app):
+    """
+    Yield the library list of every template declaring `page_libraries`.
+
+    Only literal top-level `{% set page_libraries = [...] %}` statements count;
+    that is also what the layout sees at render time.
+    """
+    yield []   # pages that declare nothing still get BASE_LIBRARIES
+    env = app.jinja_env
+    for template_name in env.list_templates(extensions=('html',)):
+        source = env.loader.get_source(env, template_name)[0]
+        for node in env.parse(source).body:
+            if isinstance(node, nodes.Assign) and getattr(node.target, 'name', None) == 'page_libraries':
+                yield node.node.as_const()
+
+
+def build_bundles(app):
+    """
+    Concatenate the JS and CSS of every library combination used by a template.
+
+    Returns:
+        dict: bundle name -> {'js': bytes, 'css': bytes} written
+    """
+    static_dir = app.static_folder
+    for stale in glob.glob(os.path.join(static_dir, _BUNDLE_JS.format('*'))) + \
+            glob.glob(os.path.join(static_dir, _BUNDLE_CSS.format('*'))):
+        os.remove(stale)
+
+    def read(filename):
+        with open(os.path.join(static_dir, filename), encoding='utf-8') as f:
+            return f.read()
+
+    built = {}
+    for names in declared_library_sets(app):
+        libraries = resolve_libraries(names)
+        name = '.'.join(libraries)
+        if name in built:
+            continue
+        js_parts = []
+        for filename in (f for lib in libraries for f in LIBRARIES[lib].get('js', ())):
+            code = read(filename)
+            if rjsmin is not None and not filename.endswith('.min.js'):
+                code = rjsmin.jsmin(code)
+            # A file without a trailing semicolon must not run into the next one
+            js_parts.append(f'/* {filename} */\n{code}\n;')
+        css_parts = [f'/* {filename} */\n{read(filename)}'
+                     for lib in libraries for filename in LIBRARIES[lib].get('css', ())]
+
+        sizes = {'js': 0, 'css': 0}
+        for kind, parts, pattern in (('js', js_parts, _BUNDLE_JS), ('css', css_parts, _BUNDLE_CSS)):
+            if not parts:
+                continue
+            data = '\n'.join(parts).encode('utf-8')
+            target = os.path.join(static_dir, pattern.format(name))
+            with open(target + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(target + '.tmp', target)   # never rewrite a file dist/ may link to
+            sizes[kind] = len(data)
+        built[name] = sizes
+    return built
+
+
+def init_bundles(app):
+    """Record which page bundles have been built, once at startup."""
+    found = glob.glob(os.path.join(app.static_folder, _BUNDLE_JS.format('*')))
+    prefix, suffix = _BUNDLE_JS.split('{}')
+    app.extensions['asset_bundles'] = {
+        os.path.basename(path)[len(os.path.basename(prefix)):-len(suffix)] for path in found
+    }
+    app.add_template_global(page_assets)
+
+
+def _hashed_name(path, data):
+    root, ext = posixpath.splitext(path)
+    return f'{root}.{hashlib.sha256(data).hexdigest()[:8]}{ext}'
+
+
+def _rewrite_css(rel_path, data, resolve):
+    """
+    Point relative url() references of a CSS file at their fingerprinted copies.
+
+    The CSS itself moves from `rel_path` to dist/`rel_path`, one level deeper,
+    so references to files outside the manifest get an extra '../' and keep
+    resolving to the same URL.
+    """
+    base = posixpath.dirname(rel_path)
+
+    def replace(match):
+        quote, ref = match.groups()
+        if re.match(r'^([a-z][a-z0-9+.-]*:|/|#)', ref, re.I):
+            return match.group(0)   # data:, absolute, or fragment-only (e.g. #default#VML)
+        target, suffix = re.match(r'^([^?#]*)(.*)$', ref).groups()
+        hashed = resolve(posixpath.normpath(posixpath.join(base, target)))
+        if hashed is None:
+            new_ref = '../' + ref
+        else:
+            new_ref = posixpath.relpath(hashed, posixpath.join(DIST_DIR, base)) + suffix
+        return f'url({quote}{new_ref}{quote})'
+
+    return _CSS_URL.sub(replace, data.decode('utf-8')).encode('utf-8')
+
+
+def _link(source, target):
+    """Hard-link `target` to `source`; False where links aren't possible (other device, FAT, ...)."""
+    try:
+        os.link(source, target)
+    except OSError:
+        return False
+    return True
+
+
+def build_fingerprints(app):
+    """
+    Publish content-hashed copies of all static files plus the manifest.
+
+    CSS files are processed after the files they reference, so a changed
+    font or image also changes the hash of every stylesheet that uses it.
+    Fonts with a subset from `flask subset-fonts` are copied from the subset
+    (see app/fonts.py) unless FONT_SUBSETTING is off.
+
+    dist/ is never cleared: hashed names only ever hold the same bytes, so
+    existing files are kept, the manifest is replaced atomically and also
+    archived as dist/manifest.<version>.json, and _prune_generations()
+    removes what the retained generations no longer reference.
+
+    Returns:
+        dict: manifest mapping 'css/app.css' -> 'dist/css/app.3f9c2a1b.css'
+    """
+    from app.fonts import SUBSETS_DIR, font_subsets
+    from app.images import VARIANTS_DIR
+
+    static_dir = app.static_folder
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    # Subsetted fonts are published under their original names
+    subsets = font_subsets(app)
+
+    sources = []
+    for root, dirs, files in os.walk(static_dir):
+        if root == static_dir:
+            dirs[:] = [d for d in dirs if d not in _FINGERPRINT_SKIP and d not in (SUBSETS_DIR, VARIANTS_DIR)]
+        for name in files:
+            if name.endswith(('.br', '.gz')):
+                continue   # precompressed siblings (flask precompress-assets) are rebuilt from dist/
+            sources.append(os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, '/'))
+
+    manifest = {}
+    in_progress = set()
+
+    def resolve(rel_path):
+        """Fingerprint `rel_path` (once) and return its hashed path, or None if it isn't a static file."""
+        if rel_path in manifest:
+            return manifest[rel_path]
+        source = os.path.join(static_dir, *rel_path.split('/'))
+        if rel_path in in_progress or rel_path.startswith('../') or not os.path.isfile(source):
+            return None
+        in_progress.add(rel_path)
+        source = subsets.get(rel_path, source)
+        with open(source, 'rb') as f:
+            data = f.read()
+        if rel_path.endswith('.css'):
+            data = _rewrite_css(rel_path, data, resolve)
+        hashed = posixpath.join(DIST_DIR, _hashed_name(rel_path, data))
+        target = os.path.join(static_dir, *hashed.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(target):
+            pass   # published by an earlier generation
+        elif rel_path.endswith('.css') or not _link(source, target):
+            with open(target, 'wb') as f:
+                f.write(data)
+            shutil.copystat(source, target)
+        manifest[rel_path] = hashed
+        return hashed
+
+    for rel_path in sorted(sources):
+        resolve(rel_path)
+
+    raw = json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8')
+    manifest_path = os.path.join(dist_dir, MANIFEST_NAME)
+    _archive_manifest(manifest_path)   # a manifest from before generations were kept
+    _archive_manifest(manifest_path, raw)
+    tmp = manifest_path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(raw)
+    os.replace(tmp, manifest_path)
+    _prune_generations(app, dist_dir)
+    return manifest
+
+
+def _generation_path(manifest_path, raw):
+    """dist/manifest.<version>.json, with the version init_fingerprints() reports."""
+    root, ext = os.path.splitext(manifest_path)
+    return f'{root}.{hashlib.sha256(raw).hexdigest()[:8]}{ext}'
+
+
+def _archive_manifest(manifest_path, raw=None):
+    """Keep a copy of a manifest generation; `raw` defaults to the published manifest."""
+    if raw is None:
+        if not os.path.exists(manifest_path):
+            return
+        with open(manifest_path, 'rb') as f:
+            raw = f.read()
+        if os.path.exists(_generation_path(manifest_path, raw)):
+            return
+    path = _generation_path(manifest_path, raw)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(raw)
+    os.replace(path + '.tmp', path)   # also makes a rebuilt generation the newest
+
+
+def _prune_generations(app, dist_dir):
+    """
+    Delete manifest generations beyond ASSET_RETENTION_GENERATIONS, newest
+    first, and every dist/ file (with its .br/.gz siblings) none of the
+    remaining ones references.
+
+    Returns:
+        int: number of files removed
+    """
+    keep = max(1, app.config.get('ASSET_RETENTION_GENERATIONS', 3))
+    root, ext = os.path.splitext(MANIFEST_NAME)
+    generations = sorted(glob.glob(os.path.join(dist_dir, f'{root}.*{ext}')),
+                         key=lambda path: os.stat(path).st_mtime_ns, reverse=True)
+    referenced = set()
+    for path in generations[:keep]:
+        with open(path, encoding='utf-8') as f:
+            referenced.update(json.load(f).values())
+    for path in generations[keep:]:
+        os.remove(path)
+
+    static_dir = app.static_folder
+    removed = 0
+    for dirpath, _dirs, files in os.walk(dist_dir, topdown=False):
+        for name in files:
+            path = os.path.join(dirpath, name)
+            if dirpath == dist_dir and name.startswith(root + '.') and name.endswith(ext):
+                continue   # manifest.json and the retained generations
+            rel_path = os.path.relpath(path, static_dir).replace(os.sep, '/')
+            if rel_path.endswith(('.br', '.gz')):
+                rel_path = rel_path[:-3]
+            if rel_path not in referenced:
+                os.remove(path)
+                removed += 1
+        if dirpath != dist_dir and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+    return removed
+
+
+def init_fingerprints(app):
+    """
+    Load the asset manifest once and resolve url_for('static') through it.
+
+    Skipped in debug mode and when ASSET_FINGERPRINTING is off, so edited
+    files show up without rebuilding.
+    """
+    app.extensions['asset_manifest'] = {}
+    app.extensions['asset_manifest_version'] = ''
+    if app.debug or not app.config.get('ASSET_FINGERPRINTING', True):
+        return
+    path = os.path.join(app.static_folder, DIST_DIR, MANIFEST_NAME)
+    if not os.path.exists(path):
+        app.logger.warning('Asset manifest %s is missing; run `flask fingerprint-assets`. '
+                           'Static URLs are not versioned.', path)
+        return
+    with open(path, 'rb') as f:
+        raw = f.read()
+    manifest = json.loads(raw)
+    app.extensions['asset_manifest'] = manifest
+    # Part of cache keys for rendered HTML that embeds static URLs (see base.html fragments)
+    app.extensions['asset_manifest_version'] = hashlib.sha256(raw).hexdigest()[:8]
+
+    @app.url_defaults
+    def fingerprint_static_url(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    app.logger.info('Loaded asset manifest with %d fingerprinted files.', len(manifest))
+
+
+def is_fingerprinted(app, filename):
+    """True if `filename` (relative to static/) has a content hash in its name."""
+    from app.images import VARIANTS_DIR
+    if filename.startswith(VARIANTS_DIR + '/'):
+        return True   # named after the hash of their source and settings
+    return filename.startswith(DIST_DIR + '/') and bool(app.extensions.get('asset_manifest'))
@@ -19,6 +19,10 @@ def login():
         if user is None or not user.check_password(form.password.data):
             flash('Invalid username or password.', 'danger')
             return redirect(url_for('auth.login'))
+        if user.password_needs_rehash():
+            # Upgrade hashes made with older PASSWORD_HASH_METHOD parameters
+            user.set_password(form.password.data)
+            db.session.commit()
         login_user(user, remember=form.remember_me.data)
         next_page = request.args.get('next')
         return redirect(next_page or url_for('main.index'))
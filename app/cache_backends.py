@@ -0,0 +1,605 @@
+"""
+Flask Sing App - Custom Flask-Caching Backends
+
+MmapCache stores entries in a memory-mapped file, so every gunicorn worker
+on a host shares one cache without running Redis.
+
+    CACHE_TYPE=app.cache_backends.MmapCache
+
+LayeredCache puts a small in-process LRU (L1) in front of any other backend
+(L2, e.g. Redis), so hot keys are served without a network round trip.
+
+    CACHE_TYPE=app.cache_backends.LayeredCache
+    CACHE_L2_TYPE=RedisCache
+
+Layout: a small header followed by CACHE_MMAP_SLOTS fixed-size slots,
+grouped into sets of CACHE_MMAP_WAYS. A key hashes to one set and may live
+in any slot of it. When a set is full, the least recently used (or an
+expired) slot is overwritten, so the file never grows: total size is
+slots × CACHE_MMAP_SLOT_SIZE, and values that do not fit in a slot are not
+cached.
+
+Reads take no lock: every slot starts with a sequence number that writers
+make odd while they modify the slot and bump again when done (a seqlock).
+A reader retries if the number changed or was odd. Writers serialize with
+a thread lock plus an fcntl.flock() on the file. flock is unavailable on
+Windows, where the backend is only safe within a single process.
+
+Entries are unpickled, so whoever can write the file can run code in the
+app: it lives in the instance folder by default, and a file that is not
+owned by the app's user or is writable by group/others is refused. A file
+made with different slots/slot size/ways is refused too, since other
+processes may still have it mapped; stop every worker and delete it (or
+point CACHE_MMAP_PATH elsewhere) to change the geometry.
+"""
+import hashlib
+import mmap
+import os
+import pickle
+import stat
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask_caching.backends.base import BaseCache
+from werkzeug.utils import import_string
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+
+_MAGIC = b'SINGMMC1'
+_HEADER = struct.Struct('<8sIII')           # magic, slots, slot_size, ways
+_HEADER_SIZE = 64
+_SEQ = struct.Struct('<Q')
+_SLOT = struct.Struct('<QQddII')            # seq, key_hash, expires, atime, key_len, value_len
+_ATIME = struct.Struct('<d')
+_ATIME_OFFSET = 24
+_READ_RETRIES = 8
+MMAP_FILE_NAME = 'mmap-cache.bin'
+
+
+class MmapCache(BaseCache):
+    """
+    Host-wide cache in a memory-mapped file, shared by all worker processes.
+
+    :param path: cache file; created (sparse) on first use
+    :param slots: number of entries the file can hold
+    :param slot_size: bytes per entry, including the key and a 40-byte header
+    :param ways: slots per set; higher is closer to true LRU, slower to scan
+    :param default_timeout: see :class:`flask_caching.backends.base.BaseCache`
+    """
+
+    def __init__(self, path, slots=1024, slot_size=65536, ways=8,
+                 default_timeout=300, ignore_delete_many_errors=False):
+        super().__init__(default_timeout=default_timeout,
+                         ignore_delete_many_errors=ignore_delete_many_errors)
+        if slots % ways:
+            raise ValueError('CACHE_MMAP_SLOTS must be a multiple of CACHE_MMAP_WAYS')
+        if slot_size <= _SLOT.size:
+            raise ValueError(f'CACHE_MMAP_SLOT_SIZE must be larger than {_SLOT.size} bytes')
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.ways = ways
+        self.sets = slots // ways
+        self._size = _HEADER_SIZE + slots * slot_size
+        self._lock = threading.Lock()
+        self._pid = None
+        self._file = None
+        self._mm = None
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(
+            path=config.get('CACHE_MMAP_PATH') or os.path.join(app.instance_path, MMAP_FILE_NAME),
+            slots=config.get('CACHE_MMAP_SLOTS', 1024),
+            slot_size=config.get('CACHE_MMAP_SLOT_SIZE', 65536),
+            ways=config.get('CACHE_MMAP_WAYS', 8),
+        )
+        return cls(*args, **kwargs)
+
+    # ── File handling ─────────────────────────────────────────────────────────
+
+    def _mapping(self):
+        """
+        Return the mmap for this process, (re)opening after a fork.
+
+        The file is reopened per process because flock() locks belong to the
+        open file description, which a forked child would share with its parent.
+        """
+        if self._pid == os.getpid():
+            return self._mm
+        with self._lock:
+            if self._pid != os.getpid():
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+                try:
+                    self._check_owner(fd)
+                except BaseException:
+                    os.close(fd)
+                    raise
+                self._file = os.fdopen(fd, 'r+b')
+                try:
+                    with self._file_lock():
+                        self._init_file()
+                except BaseException:
+                    self._file.close()
+                    raise
+                self._mm = mmap.mmap(self._file.fileno(), self._size)
+                self._pid = os.getpid()
+        return self._mm
+
+    def _check_owner(self, fd):
+        """Refuse a cache file another user could have written (its entries are unpickled)."""
+        info = os.fstat(fd)
+        if not stat.S_ISREG(info.st_mode):
+            raise RuntimeError(f'MmapCache: {self.path} is not a regular file')
+        if hasattr(os, 'geteuid') and info.st_uid != os.geteuid():
+            raise RuntimeError(f'MmapCache: {self.path} is owned by uid {info.st_uid}, '
+                               f'not by this process (uid {os.geteuid()})')
+        if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise RuntimeError(f'MmapCache: {self.path} is writable by group or others '
+                               f'(mode {stat.S_IMODE(info.st_mode):o})')
+
+    def _init_file(self):
+        """Size a new file and write its header; refuse one made with another geometry."""
+        self._file.seek(0)
+        header = self._file.read(_HEADER.size)
+        expected = _HEADER.pack(_MAGIC, self.slots, self.slot_size, self.ways)
+        size = os.fstat(self._file.fileno()).st_size
+        if header == expected and size == self._size:
+            return
+        if header.strip(b'\0'):
+            # Other workers may have it mapped: resizing it under them would crash them
+            raise RuntimeError(
+                f'MmapCache: {self.path} was created with a different geometry '
+                f'(CACHE_MMAP_SLOTS, CACHE_MMAP_SLOT_SIZE, CACHE_MMAP_WAYS); stop every '
+                f'worker and delete it, or set CACHE_MMAP_PATH to a new file')
+        if size != self._size:   # new (or never initialized) file
+            self._file.truncate(0)
+            self._file.truncate(self._size)
+        self._file.seek(0)
+        self._file.write(expected)
+        self._file.flush()
+
+    def _file_lock(self):
+        return _FileLock(self._file)
+
+    def _write_lock(self):
+        """Exclusive writer lock across threads and processes."""
+        self._mapping()
+        return _WriterLock(self._lock, self._file)
+
+    # ── Slot access ───────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little') or 1
+
+    def _set_offsets(self, key_hash):
+        first = _HEADER_SIZE + (key_hash % self.sets) * self.ways * self.slot_size
+        return range(first, first + self.ways * self.slot_size, self.slot_size)
+
+    def _read_slot(self, mm, offset, key_hash, key):
+        """
+        Lock-free read of one slot.
+
+        Returns (expires, value_bytes) if the slot holds `key`, else None.
+        """
+        for _ in range(_READ_RETRIES):
+            seq = _SEQ.unpack_from(mm, offset)[0]
+            if seq & 1:
+                continue
+            _, slot_hash, expires, _, key_len, value_len = _SLOT.unpack_from(mm, offset)
+            found = None
+            if slot_hash == key_hash and key_len == len(key):
+                start = offset + _SLOT.size
+                if mm[start:start + key_len] == key:
+                    found = (expires, mm[start + key_len:start + key_len + value_len])
+            if _SEQ.unpack_from(mm, offset)[0] == seq:
+                return found
+        return None
+
+    def _find(self, key):
+        """Return (offset, expires, value_bytes) of a live entry for `key`, or None."""
+        mm = self._mapping()
+        key = key.encode()
+        key_hash = self._hash(key)
+        now = time.time()
+        for offset in self._set_offsets(key_hash):
+            found = self._read_slot(mm, offset, key_hash, key)
+            if found is not None:
+                expires, value = found
+                if expires and expires <= now:
+                    return None
+                return offset, expires, value
+        return None
+
+    def _write_slot(self, mm, offset, key_hash, key, expires, value):
+        seq = _SEQ.unpack_from(mm, offset)[0]
+        _SEQ.pack_into(mm, offset, seq | 1)
+        _SLOT.pack_into(mm, offset, seq | 1, key_hash, expires, time.time(), len(key), len(value))
+        start = offset + _SLOT.size
+        mm[start:start + len(key) + len(value)] = key + value
+        _SEQ.pack_into(mm, offset, (seq | 1) + 1)
+
+    def _clear_slot(self, mm, offset):
+        seq = _SEQ.unpack_from(mm, offset)[0]
+        _SEQ.pack_into(mm, offset, seq | 1)
+        _SLOT.pack_into(mm, offset, seq | 1, 0, 0.0, 0.0, 0, 0)
+        _SEQ.pack_into(mm, offset, (seq | 1) + 1)
+
+    def _store(self, key, value, timeout, only_if_missing=False):
+        """Serialize, then write an entry under the writer lock. Returns False if not stored."""
+        key, payload, expires = self._prepare(key, value, timeout)
+        if _SLOT.size + len(key) + len(payload) > self.slot_size:
+            return False
+        with self._write_lock():
+            return self._store_locked(key, payload, expires, only_if_missing)
+
+    def _prepare(self, key, value, timeout):
+        timeout = self._normalize_timeout(timeout)
+        expires = time.time() + timeout if timeout else 0.0
+        return key.encode(), pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires
+
+    def _store_locked(self, key, payload, expires, only_if_missing=False):
+        mm = self._mm
+        now = time.time()
+        key_hash = self._hash(key)
+        target, victim, victim_atime = None, None, None
+        for offset in self._set_offsets(key_hash):
+            _, slot_hash, slot_expires, atime, key_len, _ = _SLOT.unpack_from(mm, offset)
+            start = offset + _SLOT.size
+            if slot_hash == key_hash and mm[start:start + key_len] == key:
+                if only_if_missing and not (slot_expires and slot_expires <= now):
+                    return False
+                target = offset
+                break
+            if slot_hash == 0 or (slot_expires and slot_expires <= now):
+                atime = -1.0   # free slots are preferred victims
+            if victim_atime is None or atime < victim_atime:
+                victim, victim_atime = offset, atime
+        self._write_slot(mm, target if target is not None else victim,
+                         key_hash, key, expires, payload)
+        return True
+
+    # ── Cache API ─────────────────────────────────────────────────────────────
+
+    def get(self, key):
+        found = self._find(key)
+        if found is None:
+            return None
+        offset, _, value = found
+        # Approximate LRU: refresh the access time without taking the lock
+        _ATIME.pack_into(self._mm, offset + _ATIME_OFFSET, time.time())
+        try:
+            return pickle.loads(value)
+        except Exception:
+            return None
+
+    def has(self, key):
+        return self._find(key) is not None
+
+    def set(self, key, value, timeout=None):
+        return self._store(key, value, timeout)
+
+    def add(self, key, value, timeout=None):
+        return self._store(key, value, timeout, only_if_missing=True)
+
+    def delete(self, key):
+        encoded = key.encode()
+        key_hash = self._hash(encoded)
+        with self._write_lock():
+            for offset in self._set_offsets(key_hash):
+                if self._read_slot(self._mm, offset, key_hash, encoded) is not None:
+                    self._clear_slot(self._mm, offset)
+                    return True
+        return False
+
+    def clear(self):
+        with self._write_lock():
+            for offset in range(_HEADER_SIZE, self._size, self.slot_size):
+                if _SLOT.unpack_from(self._mm, offset)[1]:
+                    self._clear_slot(self._mm, offset)
+        return True
+
+    def inc(self, key, delta=1):
+        with self._write_lock():
+            found = self._find(key)
+            if found is None:
+                value, timeout = delta, None
+            else:
+                _, expires, payload = found
+                value = pickle.loads(payload) + delta
+                # Keep the entry's remaining lifetime (0 = never expires)
+                timeout = max(1, int(expires - time.time())) if expires else 0
+            key_bytes, payload, expires = self._prepare(key, value, timeout)
+            if not self._store_locked(key_bytes, payload, expires):
+                return None
+        return value
+
+    def dec(self, key, delta=1):
+        return self.inc(key, delta=-delta)
+
+
+class _FileLock:
+    """Context manager for an exclusive flock() on `file` (no-op without fcntl)."""
+
+    def __init__(self, file):
+        self.file = file
+
+    def __enter__(self):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+
+
+class _WriterLock(_FileLock):
+    """Thread lock plus file lock, acquired in that order."""
+
+    def __init__(self, thread_lock, file):
+        super().__init__(file)
+        self.thread_lock = thread_lock
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        try:
+            super().__enter__()
+        except BaseException:
+            self.thread_lock.release()
+            raise
+
+    def __exit__(self, *exc):
+        try:
+            super().__exit__(*exc)
+        finally:
+            self.thread_lock.release()
+
+
+class LayeredCache(BaseCache):
+    """
+    Two-tier cache: a bounded per-process LRU (L1) in front of a shared backend (L2).
+
+    Reads try L1 first and fall back to L2, copying hits into L1 for at most
+    `l1_timeout` seconds. Writes go to L2 and are announced on an invalidation
+    log kept in L2 itself (a sequence counter plus one short-lived message per
+    changed key), so this works with any backend. Every `sync_interval`
+    seconds, on its next read, a worker replays new messages and drops the
+    named keys from its L1. If messages are missing (expired, evicted, or the
+    log was reset by clear()) the whole L1 is dropped instead, so a worker
+    never serves an entry more than `l1_timeout` + `sync_interval` seconds
+    behind L2.
+
+    L1 keeps values pickled, like SimpleCache, so callers that mutate a
+    returned object do not change the cached copy. Keys starting with one of
+    `l1_exclude_prefixes` never enter L1: they are read from and written to
+    L2 only, so a delete takes effect in every worker at once (the login
+    identity cache relies on this).
+
+    :param l2: the shared backend instance
+    :param l1_max_entries: L1 capacity; least recently used entries are evicted
+    :param l1_timeout: seconds an entry may live in L1
+    :param sync_interval: seconds between invalidation log checks (0 = every read)
+    :param l1_exclude_prefixes: key prefixes that bypass L1
+    :param default_timeout: see :class:`flask_caching.backends.base.BaseCache`
+    """
+
+    _LOG_PREFIX = '_layered'
+    _MAX_REPLAY = 1000
+
+    def __init__(self, l2, l1_max_entries=1024, l1_timeout=5, sync_interval=1.0,
+                 l1_exclude_prefixes=(), default_timeout=300, ignore_delete_many_errors=False):
+        super().__init__(default_timeout=default_timeout,
+                         ignore_delete_many_errors=ignore_delete_many_errors)
+        self.l2 = l2
+        self.l1_max_entries = l1_max_entries
+        self.l1_timeout = l1_timeout
+        self.sync_interval = sync_interval
+        self.l1_exclude_prefixes = tuple(l1_exclude_prefixes)
+        self._l1 = OrderedDict()                # key -> (expires, pickled value)
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(('l1_hits', 'l1_misses', 'l2_hits', 'l2_misses'), 0)
+        self._epoch = None
+        self._seen = 0
+        self._own = set()                       # sequence numbers this process published
+        self._next_sync = 0.0
+        self._seq_key = f'{self._LOG_PREFIX}/seq'
+        self._epoch_key = f'{self._LOG_PREFIX}/epoch'
+        # Messages must outlive the longest gap between two syncs of a busy worker
+        self._message_timeout = max(60, 2 * (l1_timeout + sync_interval))
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        import_me = config.get('CACHE_L2_TYPE') or 'RedisCache'
+        if '.' not in import_me:
+            import_me = 'flask_caching.backends.' + import_me
+        backend = import_string(import_me)
+        if isinstance(backend, type) and issubclass(backend, BaseCache):
+            backend = backend.factory
+        l2 = backend(app, {**config, 'CACHE_TYPE': import_me}, list(args), dict(kwargs))
+        return cls(
+            l2,
+            l1_max_entries=config.get('CACHE_L1_MAX_ENTRIES', 1024),
+            l1_timeout=config.get('CACHE_L1_TIMEOUT', 5),
+            sync_interval=config.get('CACHE_L1_SYNC_INTERVAL', 1.0),
+            l1_exclude_prefixes=[prefix.strip() for prefix in
+                                 config.get('CACHE_L1_EXCLUDE_PREFIXES', '').split(',') if prefix.strip()],
+            **kwargs,
+        )
+
+    def stats(self):
+        """Return this process's hit/miss counters per tier and the L1 size."""
+        with self._lock:
+            return {**self._counters, 'l1_size': len(self._l1)}
+
+    # ── L1 ────────────────────────────────────────────────────────────────────
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _in_l1(self, key):
+        """False for keys that bypass L1 (l1_exclude_prefixes)."""
+        return not (self.l1_exclude_prefixes and key.startswith(self.l1_exclude_prefixes))
+
+    def _l1_get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is not None and entry[0] > now:
+                self._l1.move_to_end(key)
+                self._counters['l1_hits'] += 1
+                return entry[1]
+            if entry is not None:
+                del self._l1[key]
+            self._counters['l1_misses'] += 1
+        return None
+
+    def _l1_put(self, key, value, timeout=None):
+        timeout = self._normalize_timeout(timeout)
+        ttl = min(timeout, self.l1_timeout) if timeout else self.l1_timeout
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._l1[key] = (time.time() + ttl, payload)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_discard(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._l1.pop(key, None)
+
+    # ── Invalidation log ──────────────────────────────────────────────────────
+
+    def _publish(self, key):
+        """Announce that `key` changed (None = everything) to other workers."""
+        while True:
+            seq = self.l2.inc(self._seq_key)
+            if seq is None:
+                return
+            if seq == 1:
+                # The log was (re)started, e.g. after clear(): make everyone drop L1
+                self.l2.set(self._epoch_key, uuid.uuid4().hex, timeout=0)
+            # inc() is not atomic on every backend; add() detects a duplicate number
+            if self.l2.add(f'{self._LOG_PREFIX}/msg/{seq}', key or '*',
+                           timeout=self._message_timeout):
+                break
+        with self._lock:
+            self._own.add(seq)
+
+    def _sync(self):
+        """Replay invalidation messages from other workers, at most once per sync_interval."""
+        now = time.time()
+        if now < self._next_sync:
+            return
+        self._next_sync = now + self.sync_interval
+
+        epoch, seq = self.l2.get_many(self._epoch_key, self._seq_key)
+        if epoch is None:
+            self.l2.add(self._epoch_key, uuid.uuid4().hex, timeout=0)
+            epoch = self.l2.get(self._epoch_key)
+        seq = seq or 0
+        if epoch != self._epoch or seq < self._seen or seq - self._seen > self._MAX_REPLAY:
+            self._reset(epoch, seq)
+            return
+        if seq == self._seen:
+            return
+
+        numbers = range(self._seen + 1, seq + 1)
+        messages = self.l2.get_many(*(f'{self._LOG_PREFIX}/msg/{n}' for n in numbers))
+        with self._lock:
+            own, self._own = self._own, set()
+        stale = []
+        for number, key in zip(numbers, messages):
+            if number in own:
+                continue
+            if key is None or key == '*':
+                self._reset(epoch, seq)
+                return
+            stale.append(key)
+        self._l1_discard(*stale)
+        self._seen = seq
+
+    def _reset(self, epoch, seq):
+        with self._lock:
+            self._l1.clear()
+            self._own.clear()
+        self._epoch, self._seen = epoch, seq
+
+    # ── Cache API ─────────────────────────────────────────────────────────────
+
+    def get(self, key):
+        if not self._in_l1(key):
+            return self.l2.get(key)
+        self._sync()
+        payload = self._l1_get(key)
+        if payload is not None:
+            return pickle.loads(payload)
+        value = self.l2.get(key)
+        if value is None:
+            self._count('l2_misses')
+            return None
+        self._count('l2_hits')
+        self._l1_put(key, value)
+        return value
+
+    def has(self, key):
+        if not self._in_l1(key):
+            return self.l2.has(key)
+        self._sync()
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is not None and entry[0] > time.time():
+                return True
+        return self.l2.has(key)
+
+    def set(self, key, value, timeout=None):
+        if not self._in_l1(key):
+            return self.l2.set(key, value, timeout=timeout)
+        result = self.l2.set(key, value, timeout=timeout)
+        self._publish(key)
+        if result:
+            self._l1_put(key, value, timeout)
+        else:
+            self._l1_discard(key)
+        return result
+
+    def add(self, key, value, timeout=None):
+        result = self.l2.add(key, value, timeout=timeout)
+        if result and self._in_l1(key):
+            self._publish(key)
+            self._l1_put(key, value, timeout)
+        return result
+
+    def delete(self, key):
+        result = self.l2.delete(key)
+        if not self._in_l1(key):
+            return result
+        self._l1_discard(key)
+        self._publish(key)
+        return result
+
+    def clear(self):
+        result = self.l2.clear()
+        self._reset(None, 0)
+        self._publish(None)
+        return result
+
+    def inc(self, key, delta=1):
+        value = self.l2.inc(key, delta=delta)
+        if not self._in_l1(key):
+            return value
+        self._l1_discard(key)
+        self._publish(key)
+        return value
+
+    def dec(self, key, delta=1):
+        return self.inc(key, delta=-delta)
@@ -0,0 +1,133 @@
+"""
+Flask Sing App - Caching Helpers
+
+Stampede-protected caching on top of app.extensions.cache.
+
+When a popular @cache.cached entry expires, every concurrent request misses
+at once and recomputes it. cached_view() and single_flight() avoid that:
+
+- Entries are kept for `stale_ttl` seconds past their freshness window.
+- On a stale hit, one caller (whoever wins cache.add() on a lock key)
+  recomputes, and everyone else keeps serving the stale value.
+- On a cold miss, losers poll for up to `wait` seconds for the winner's
+  value before computing it themselves.
+- Optional probabilistic early refresh ("XFetch"): a fresh entry is
+  recomputed early with a probability that rises as expiry approaches,
+  scaled by how long the value took to compute and by `early_refresh`
+  (0 disables it).
+
+Only get/set/add/delete are used, so this works with any Flask-Caching
+backend (SimpleCache, MmapCache, Redis, ...).
+"""
+import math
+import random
+import time
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+from app.extensions import cache
+
+_POLL_INTERVAL = 0.05
+
+
+def single_flight(key, compute, timeout=300, stale_ttl=60, lock_timeout=10,
+                  wait=2.0, early_refresh=1.0):
+    """
+    Return the cached value for `key`, recomputing it with `compute()` at most
+    once at a time across all workers sharing the cache backend.
+
+    Args:
+        key: Cache key
+        compute: Zero-argument callable producing the value
+        timeout: Seconds the value is considered fresh
+        stale_ttl: Extra seconds a stale value may be served while it is recomputed
+        lock_timeout: Seconds before an abandoned recompute lock expires
+        wait: Seconds a cold-miss caller waits for another worker's result
+        early_refresh: XFetch beta; 0 disables probabilistic early refresh
+
+    Returns:
+        The cached or freshly computed value
+    """
+    lock_key = f'{key}/lock'
+
+    def recompute():
+        started = time.time()
+        try:
+            value = compute()
+            entry = {'value': value, 'fresh_until': time.time() + timeout,
+                     'delta': time.time() - started}
+            cache.set(key, entry, timeout=timeout + stale_ttl)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    entry = cache.get(key)
+    if entry is not None:
+        remaining = entry['fresh_until'] - time.time()
+        early = -entry['delta'] * early_refresh * math.log(1.0 - random.random())
+        if remaining > early:
+            return entry['value']
+        # Stale (or picked for early refresh): one caller recomputes, the rest serve it as-is
+        if cache.add(lock_key, True, timeout=lock_timeout):
+            return recompute()
+        return entry['value']
+
+    if cache.add(lock_key, True, timeout=lock_timeout):
+        return recompute()
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        time.sleep(_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['value']
+    # The recomputing worker is slow or died; don't make this request wait any longer
+    return compute()
+
+
+def cached_view(timeout=300, unless=None, **single_flight_options):
+    """
+    Cache a view's response like @cache.cached, with stampede protection.
+
+    Only 200 responses without cookies are stored. The key is the request
+    path, matching Flask-Caching's default view key.
+
+    Usage:
+        @main_bp.route('/')
+        @cached_view(timeout=300, unless=lambda: current_user.is_authenticated)
+        def index():
+            ...
+
+    Args:
+        timeout: Seconds the response is considered fresh
+        unless: Optional callable; when it returns True the cache is bypassed
+        **single_flight_options: stale_ttl, lock_timeout, wait, early_refresh
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if unless is not None and unless():
+                return f(*args, **kwargs)
+
+            uncacheable = []
+
+            def compute():
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200 or 'Set-Cookie' in response.headers \
+                        or response.is_streamed:
+                    uncacheable.append(response)
+                    raise _Uncacheable()
+                return response.get_data(), response.status_code, list(response.headers)
+
+            try:
+                data, status, headers = single_flight(
+                    f'view/{request.path}', compute, timeout=timeout, **single_flight_options)
+            except _Uncacheable:
+                return uncacheable[0]
+            return current_app.response_class(data, status=status, headers=headers)
+        return decorated_function
+    return decorator
+
+
+class _Uncacheable(Exception):
+    """Raised inside cached_view() to pass a non-cacheable response through."""
@@ -0,0 +1,524 @@
+"""
+Flask Sing App - Purged and Critical CSS
+
+Every page links the whole theme (css/application.min.css, ~730 KB, plus
+the stylesheets it @imports) although a page uses a small part of it.
+`flask purge-css` renders each argument-free GET page through the test
+client and collects the words it can use as selectors: the rendered HTML,
+the source of the templates behind it (so classes inside {% if %} branches
+count too) and the scripts the page loads (classes added at runtime).
+
+Pages are grouped by blueprint, and the examples blueprint by section
+(/examples/charts/... -> `examples-charts`). For each group it writes
+
+    css/purged.<group>.css           rules any page of the group can match
+    css/purged.<group>.critical.css  rules matched by the markup above the
+                                     fold (navbar, sidebar and the start of
+                                     <main>)
+    css/purged.json                  the group index and a size report
+
+At startup the critical CSS is loaded into memory; base.html inlines it in
+a <style> and loads the group stylesheet without blocking rendering. Pages
+whose group was not built (or error pages) keep the full stylesheets.
+
+Matching is by name, like PurgeCSS: a selector is kept when each class, id
+and element in it occurs somewhere in that text. Pseudo-classes and
+attribute conditions are not evaluated, so state rules (:hover, .show,
+[data-theme=dark]) survive as long as their names are used. Classes that
+are only ever built from variables in templates go in CSS_PURGE_SAFELIST.
+"""
+import gzip
+import json
+import os
+import posixpath
+import re
+import time
+from collections import namedtuple
+
+from flask import current_app, request, template_rendered
+from jinja2 import meta
+from markupsafe import Markup
+
+from app.assets import _CSS_URL
+
+PURGED_INDEX = 'css/purged.json'
+_PURGED_CSS = 'css/purged.{}.css'
+_CRITICAL_CSS = 'css/purged.{}.critical.css'
+# The theme stylesheets, in the order base.html links them; a group is purged
+# from the ones its pages link (auth_base.html has no singapp-custom.css)
+SOURCE_STYLESHEETS = ('css/application.min.css', 'css/singapp-custom.css')
+# Blocks whose children are purged like top-level rules
+_GROUPING_RULES = ('@media', '@supports', '@document', '@-moz-document')
+_ALWAYS_KEPT = {'*', 'html', 'body', 'root'}
+
+_SCAN = re.compile(r'''["'{};]|/\*''')
+_IMPORT = re.compile(r'''@import\s+(?:url\(\s*)?(['"]?)([^'")\s;]+)\1\s*\)?\s*;''')
+_WORD = re.compile(r'[\w-]+')
+_SIMPLE_SELECTOR = re.compile(r'([.#]?)(-?[_a-zA-Z][\w-]*)')
+_PARENS = re.compile(r'\([^()]*\)')
+_ATTRIBUTE = re.compile(r'\[[^\]]*\]')
+_PSEUDO = re.compile(r'::?[\w-]+')
+_SCRIPT_SRC = re.compile(r'<script[^>]+src="(/[^"]+\.js)"')
+
+PageStyles = namedtuple('PageStyles', 'group critical href')
+
+
+# -- Parsing -----------------------------------------------------------------
+
+def _skip_string(css, pos):
+    """Index just past the string literal starting at `pos`."""
+    quote = css[pos]
+    pos += 1
+    while pos < len(css):
+        if css[pos] == '\\':
+            pos += 2
+        elif css[pos] == quote:
+            return pos + 1
+        else:
+            pos += 1
+    return pos
+
+
+def _block_end(css, pos):
+    """Index of the '}' closing the block whose '{' is at `pos - 1`."""
+    depth = 1
+    while True:
+        match = _SCAN.search(css, pos)
+        if match is None:
+            return len(css)
+        pos = match.start()
+        token = match.group(0)
+        if token in '"\'':
+            pos = _skip_string(css, pos)
+        elif token == '/*':
+            end = css.find('*/', pos + 2)
+            pos = len(css) if end < 0 else end + 2
+        else:
+            if token == '{':
+                depth += 1
+            elif token == '}':
+                depth -= 1
+                if depth == 0:
+                    return pos
+            pos += 1
+
+
+def parse_css(css, pos=0, nested=False):
+    """
+    Split a stylesheet into rules. Comments between rules are dropped.
+
+    Returns:
+        tuple: ([(prelude, body)], end position), where body is the
+        declaration text, a list of child rules (@media and friends), or
+        None for statements such as @import and @charset
+    """
+    rules = []
+    start = pos
+    while True:
+        match = _SCAN.search(css, pos)
+        if match is None:
+            return rules, len(css)
+        pos = match.start()
+        token = match.group(0)
+        if token in '"\'':
+            pos = _skip_string(css, pos)
+        elif token == '/*':
+            end = css.find('*/', pos + 2)
+            end = len(css) if end < 0 else end + 2
+            if not css[start:pos].strip():
+                start = end
+            pos = end
+        elif token == ';':
+            pos += 1
+            if css[start:pos].lstrip()[:1] == '@':
+                rules.append((css[start:pos - 1].strip(), None))
+                start = pos
+            # Otherwise a stray declaration: browsers read on to the next '{' as a selector
+        elif token == '{':
+            prelude = css[start:pos].strip()
+            if prelude[:1] == '@' and prelude.split(None, 1)[0].lower() in _GROUPING_RULES:
+                children, pos = parse_css(css, pos + 1, nested=True)
+                rules.append((prelude, children))
+            else:
+                end = _block_end(css, pos + 1)
+                # A selector swallowing stray text is invalid; browsers drop the rule
+                if not (';' in prelude or '}' in prelude) or prelude[:1] == '@':
+                    rules.append((prelude, css[pos + 1:end]))
+                pos = end + 1
+            start = pos
+        elif nested:   # '}' closing the grouping rule
+            return rules, pos + 1
+        else:
+            pos += 1
+
+
+def serialize_css(rules):
+    parts = []
+    for prelude, body in rules:
+        if body is None:
+            parts.append(prelude + ';')
+        elif isinstance(body, list):
+            parts.append(prelude + '{' + serialize_css(body) + '}')
+        else:
+            parts.append(prelude + '{' + body + '}')
+    return ''.join(parts)
+
+
+def _rebase_urls(css, from_dir, to_dir):
+    """Rewrite relative url()s of CSS moved from `from_dir` to `to_dir` (static-relative)."""
+    def replace(match):
+        quote, ref = match.groups()
+        if re.match(r'^([a-z][a-z0-9+.-]*:|/|#)', ref, re.I):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(from_dir, ref))
+        return f'url({quote}{posixpath.relpath(target, to_dir or ".")}{quote})'
+    return _CSS_URL.sub(replace, css)
+
+
+def load_stylesheet(static_dir, rel_path, seen=None):
+    """
+    Read a static stylesheet with its local @imports inlined.
+
+    url()s of imported files are rebased so they resolve from `rel_path`'s
+    directory. Remote imports are left as statements.
+    """
+    seen = set() if seen is None else seen
+    seen.add(rel_path)
+    with open(os.path.join(static_dir, *rel_path.split('/')), encoding='utf-8') as f:
+        css = f.read()
+    base = posixpath.dirname(rel_path)
+
+    def inline(match):
+        ref = match.group(2)
+        if re.match(r'^([a-z][a-z0-9+.-]*:|/)', ref, re.I):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(base, ref))
+        if target in seen:
+            return ''
+        if not os.path.isfile(os.path.join(static_dir, *target.split('/'))):
+            return match.group(0)
+        return _rebase_urls(load_stylesheet(static_dir, target, seen), posixpath.dirname(target), base)
+
+    return _IMPORT.sub(inline, css)
+
+
+# -- Purging -----------------------------------------------------------------
+
+def selector_used(selector, words):
+    """True if every class, id and element name in `selector` is in `words`."""
+    if '\\' in selector:
+        return True   # escaped names (.sm\:hidden) can't be compared by word
+    previous = None
+    while previous != selector:
+        previous, selector = selector, _PARENS.sub(' ', selector)
+    selector = _PSEUDO.sub(' ', _ATTRIBUTE.sub(' ', selector))
+    for prefix, name in _SIMPLE_SELECTOR.findall(selector):
+        name = name if prefix else name.lower()
+        if name not in words and name not in _ALWAYS_KEPT:
+            return False
+    return True
+
+
+def _split_selectors(prelude):
+    """Split a selector list on top-level commas."""
+    selectors, depth, start = [], 0, 0
+    for i, char in enumerate(prelude):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(prelude[start:i])
+            start = i + 1
+    selectors.append(prelude[start:])
+    return [s.strip() for s in selectors if s.strip()]
+
+
+def _purge_rules(rules, words, critical):
+    kept = []
+    for prelude, body in rules:
+        at_rule = prelude.split(None, 1)[0].lower() if prelude.startswith('@') else None
+        if body is None:
+            if not (critical and at_rule == '@import'):
+                kept.append((prelude, body))
+        elif isinstance(body, list):
+            if critical and at_rule == '@media' and re.search(r'\bprint\b', prelude) \
+                    and not re.search(r'\bscreen\b|\ball\b', prelude):
+                continue
+            children = _purge_rules(body, words, critical)
+            if children:
+                kept.append((prelude, children))
+        elif at_rule:
+            if not (critical and at_rule in ('@page', '@-ms-viewport')):
+                kept.append((prelude, body))
+        else:
+            selectors = [s for s in _split_selectors(prelude) if selector_used(s, words)]
+            if selectors:
+                kept.append((','.join(selectors), body))
+    return kept
+
+
+def _declarations(rules):
+    for prelude, body in rules:
+        if isinstance(body, list):
+            yield from _declarations(body)
+        elif body is not None and not prelude.startswith('@'):
+            yield body
+
+
+def _drop_unused_at_rules(rules, used):
+    """Remove @keyframes and @font-face that no kept declaration refers to."""
+    kept = []
+    for prelude, body in rules:
+        at_rule = prelude.split(None, 1)[0].lower() if prelude.startswith('@') else ''
+        if isinstance(body, list):
+            children = _drop_unused_at_rules(body, used)
+            if children:
+                kept.append((prelude, children))
+            continue
+        if at_rule.endswith('keyframes'):
+            name = prelude.split(None, 1)[1].strip().strip('"\'') if ' ' in prelude else ''
+            if not re.search(r'(?<![\w-])' + re.escape(name) + r'(?![\w-])', used):
+                continue
+        elif at_rule == '@font-face':
+            family = re.search(r'font-family\s*:\s*([^;]+)', body)
+            if family and family.group(1).strip().strip('"\'').lower() not in used.lower():
+                continue
+        kept.append((prelude, body))
+    return kept
+
+
+def purge(rules, words, critical=False):
+    """
+    Keep the rules (and the selectors within them) whose names all occur in `words`.
+
+    Args:
+        rules: parse_css() output
+        words: set of words the page(s) can use
+        critical: also drop @import, print-only @media, @page and
+            @-ms-viewport (CSS inlined in <head>)
+
+    Returns:
+        str: the purged stylesheet
+    """
+    kept = _purge_rules(rules, words, critical)
+    kept = _drop_unused_at_rules(kept, '\n'.join(_declarations(kept)))
+    return serialize_css(kept)
+
+
+# -- Page content --------------------------------------------------------------
+
+def page_group(rule):
+    """
+    Group name of a URL rule: its blueprint, or `examples-<section>` for the
+    examples blueprint. None for endpoints outside a blueprint.
+    """
+    if '.' not in rule.endpoint:
+        return None
+    blueprint = rule.endpoint.rsplit('.', 1)[0]
+    if blueprint == 'examples':
+        section = rule.rule.strip('/').split('/')[1:2]
+        if section and '<' not in section[0]:
+            return f'examples-{section[0]}'
+    return blueprint
+
+
+def _template_sources(env, names, seen):
+    """Source text of templates `names` and everything they extend, include or import."""
+    sources = []
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        try:
+            source = env.loader.get_source(env, name)[0]
+        except Exception:   # dynamic or missing names
+            continue
+        sources.append(source)
+        pending.extend(n for n in meta.find_referenced_templates(env.parse(source)) if n)
+    return sources
+
+
+def _fold(html, fold_bytes):
+    """The markup a visitor sees before scrolling: up to <main plus `fold_bytes` of it."""
+    main = html.find('<main')
+    if main < 0:
+        main = max(html.find('<body'), 0)
+    return html[:main + fold_bytes]
+
+
+def _safelist(app):
+    return {w.strip() for w in str(app.config.get('CSS_PURGE_SAFELIST', '')).split(',') if w.strip()}
+
+
+def collect_pages(app):
+    """
+    Render every argument-free GET page and gather the words it can use.
+
+    Returns:
+        dict: endpoint -> {'path', 'group', 'stylesheets' (the SOURCE_STYLESHEETS
+        it links), 'words' (set), 'critical_words' (set)}
+    """
+    client = app.test_client()
+    env = app.jinja_env
+    manifest = app.extensions.get('asset_manifest') or {}
+    safelist = _safelist(app)
+    scripts = {}
+    rendered = []
+
+    def record(sender, template, context, **extra):
+        rendered.append(template.name)
+
+    # Render the full-CSS layout: inlined critical CSS would count as page words
+    app.extensions['purged_css'] = {}
+    pages = {}
+    with template_rendered.connected_to(record, app):
+        for rule in app.url_map.iter_rules():
+            if rule.arguments or 'GET' not in rule.methods or rule.endpoint == 'static':
+                continue
+            group = page_group(rule)
+            if group is None:
+                continue
+            del rendered[:]
+            response = client.get(rule.rule)
+            if response.status_code != 200 or response.mimetype != 'text/html':
+                continue
+            html = response.get_data(as_text=True)
+            text = [html] + _template_sources(env, rendered, set())
+            for src in _SCRIPT_SRC.findall(html):
+                if src not in scripts:
+                    script = client.get(src)
+                    scripts[src] = script.get_data(as_text=True) if script.status_code == 200 else ''
+                    script.close()
+                text.append(scripts[src])
+            pages[rule.endpoint] = {
+                'path': rule.rule,
+                'group': group,
+                'stylesheets': tuple(path for path in SOURCE_STYLESHEETS if manifest.get(path, path) in html),
+                'words': set(_WORD.findall('\n'.join(text))) | safelist,
+                'critical_words': set(_WORD.findall(_fold(html, app.config.get('CRITICAL_CSS_FOLD_BYTES', 4096))))
+                                  | safelist,
+            }
+    return pages
+
+
+def _sizes(css):
+    data = css.encode('utf-8')
+    return [len(data), len(gzip.compress(data, 9))]
+
+
+def build_purged_css(app):
+    """
+    Write the purged and critical stylesheet of every page group and the index.
+
+    Returns:
+        dict: the index written to css/purged.json: 'groups' (group ->
+        files and sizes), 'routes' (endpoint -> path, group, sizes),
+        'full' (size of the unpurged stylesheets) and 'seconds'
+    """
+    started = time.perf_counter()
+    static_dir = app.static_folder
+    # The stylesheets live in css/, so their url()s stay valid in css/purged.*.css
+    sources = {path: load_stylesheet(static_dir, path) for path in SOURCE_STYLESHEETS}
+    parsed = {}
+
+    pages = collect_pages(app)
+    groups = {}
+    for page in pages.values():
+        group = groups.setdefault(page['group'], {'stylesheets': set(), 'words': set(), 'critical_words': set()})
+        group['stylesheets'].update(page['stylesheets'])
+        group['words'] |= page['words']
+        group['critical_words'] |= page['critical_words']
+
+    for stale in os.listdir(os.path.join(static_dir, 'css')):
+        if stale.startswith('purged.'):
+            os.remove(os.path.join(static_dir, 'css', stale))
+
+    index = {'full': _sizes(''.join(sources.values())), 'groups': {}, 'routes': {}}
+    for name, group in sorted(groups.items()):
+        stylesheets = tuple(path for path in SOURCE_STYLESHEETS if path in group['stylesheets'])
+        if not stylesheets:
+            continue
+        if stylesheets not in parsed:
+            parsed[stylesheets] = parse_css(''.join(sources[path] for path in stylesheets))[0]
+        rules = parsed[stylesheets]
+        entry = {'stylesheets': list(stylesheets)}
+        for kind, pattern, words, critical in (('css', _PURGED_CSS, group['words'], False),
+                                               ('critical', _CRITICAL_CSS, group['critical_words'], True)):
+            css = purge(rules, words, critical)
+            filename = pattern.format(name)
+            with open(os.path.join(static_dir, *filename.split('/')), 'w', encoding='utf-8') as f:
+                f.write(css)
+            entry[kind] = filename
+            entry[kind + '_bytes'] = _sizes(css)
+        index['groups'][name] = entry
+    for endpoint, page in sorted(pages.items()):
+        entry = index['groups'].get(page['group'])
+        if entry is None:
+            continue
+        index['routes'][endpoint] = {'path': page['path'], 'group': page['group'],
+                                     'critical_bytes': entry['critical_bytes'], 'css_bytes': entry['css_bytes']}
+    index['seconds'] = round(time.perf_counter() - started, 2)
+    with open(os.path.join(static_dir, *PURGED_INDEX.split('/')), 'w') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    return index
+
+
+# -- Runtime -----------------------------------------------------------------
+
+def _absolute_urls(app, css, base):
+    """Make url()s of CSS from static/`base` absolute, so it can be inlined in any page."""
+    manifest = app.extensions.get('asset_manifest') or {}
+    prefix = app.static_url_path.rstrip('/') + '/'
+
+    def replace(match):
+        quote, ref = match.groups()
+        if re.match(r'^([a-z][a-z0-9+.-]*:|/|#)', ref, re.I):
+            return match.group(0)
+        target, suffix = re.match(r'^([^?#]*)(.*)$', ref).groups()
+        path = posixpath.normpath(posixpath.join(base, target))
+        if path.startswith('../'):
+            url = posixpath.normpath(posixpath.join(prefix, path))   # e.g. /node_modules/...
+        else:
+            url = prefix + manifest.get(path, path)
+        return f'url({quote}{url}{suffix}{quote})'
+
+    return _CSS_URL.sub(replace, css)
+
+
+def page_styles():
+    """
+    Critical CSS and the purged stylesheet for the current page (template global).
+
+    Returns:
+        PageStyles or None: None when the page's group has no purged CSS
+        (not built, CSS_PURGE off, debug mode, error pages)
+    """
+    styles = current_app.extensions.get('purged_css')
+    rule = request.url_rule if styles else None
+    if rule is None:
+        return None
+    return styles.get(page_group(rule))
+
+
+def init_critical_css(app):
+    """Load the critical CSS of every page group once at startup."""
+    app.extensions['purged_css'] = {}
+    app.add_template_global(page_styles)
+    if app.debug or not app.config.get('CSS_PURGE', True):
+        return
+    path = os.path.join(app.static_folder, *PURGED_INDEX.split('/'))
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        index = json.load(f)
+    styles = {}
+    for group, entry in index['groups'].items():
+        with open(os.path.join(app.static_folder, *entry['critical'].split('/')), encoding='utf-8') as f:
+            critical = _absolute_urls(app, f.read(), posixpath.dirname(entry['critical']))
+        # Inlined in <style>; a '</' can't occur in the theme CSS, but never let it end the element
+        styles[group] = PageStyles(group, Markup(critical.replace('</', '<\\/')), entry['css'])
+    app.extensions['purged_css'] = styles
+    app.logger.info('Loaded critical CSS for %d page groups.', len(styles))
@@ -20,5 +20,15 @@ def require_login_if_configured():
         return redirect(url_for('auth.login', next=request.url))
 
 
+@examples_bp.before_request
+def serve_prerendered_page():
+    """
+    Serve the page from its `flask prerender` snapshot when PRERENDER_EXAMPLES=true.
+    Falls through to the normal view for dynamic pages and logged-in users.
+    """
+    from app.examples.snapshots import serve_snapshot
+    return serve_snapshot()
+
+
 # Import routes after blueprint creation to avoid circular imports
 from app.examples import routes  # noqa: E402, F401
@@ -6,6 +6,8 @@ Routes are organized by category.
 """
 from flask import render_template, current_app, redirect, url_for
 from app.examples import examples_bp
+from app.examples.snapshots import dynamic
+from app.streaming import render_page
 
 
 # UI Components
@@ -89,7 +91,7 @@ def examples_index():
 @examples_bp.route('/dashboard/analytics')
 def dashboard_analytics():
     """Dashboard Analytics page"""
-    return render_template('examples/dashboard/analytics.html',
+    return render_page('examples/dashboard/analytics.html',
         title='Dashboard - Analytics',
         active_page='dashboard_analytics')
 
@@ -97,7 +99,7 @@ def dashboard_analytics():
 @examples_bp.route('/dashboard/visits')
 def dashboard_visits():
     """Dashboard Visits page"""
-    return render_template('examples/dashboard/visits.html',
+    return render_page('examples/dashboard/visits.html',
         title='Dashboard - Visits',
         active_page='dashboard_visits')
 
@@ -105,7 +107,7 @@ def dashboard_visits():
 @examples_bp.route('/dashboard/widgets')
 def dashboard_widgets():
     """Dashboard Widgets page"""
-    return render_template('examples/dashboard/widgets.html',
+    return render_page('examples/dashboard/widgets.html',
         title='Dashboard - Widgets',
         active_page='dashboard_widgets')
 
@@ -241,7 +243,7 @@ def tables_basic():
 @examples_bp.route('/tables/dynamic')
 def tables_dynamic():
     """Dynamic Tables page"""
-    return render_template('examples/tables/dynamic.html',
+    return render_page('examples/tables/dynamic.html',
         title='Tables Dynamic',
         active_page='tables_dynamic')
 
@@ -251,6 +253,7 @@ def tables_dynamic():
 # =============================================================================
 
 @examples_bp.route('/maps/google')
+@dynamic   # API key comes from config at request time; never pre-rendered
 def maps_google():
     """Google Maps page"""
     google_maps_key = current_app.config.get('GOOGLE_MAPS_API_KEY', '')
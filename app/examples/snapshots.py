@@ -0,0 +1,155 @@
+"""
+Flask Sing App - Pre-rendered Example Snapshots
+
+Almost every examples view renders a fixed template with constant arguments,
+so its HTML only changes when the code does. `flask prerender` renders those
+pages once per deploy and writes them (plus gzip/brotli variants) to
+PRERENDER_DIR. With PRERENDER_EXAMPLES=true the app loads the snapshots into
+memory at startup and serves anonymous GET requests from them directly,
+skipping Jinja entirely.
+
+A page is left dynamic when its view is marked with @dynamic, or when it
+looks request-dependent at build time: a non-200 status, a Set-Cookie
+(e.g. a CSRF token stored in the session), or different bytes across two
+independent renders.
+"""
+import gzip
+import hashlib
+import json
+import os
+
+from flask import current_app, request, session
+from flask_login import current_user
+
+try:
+    import brotli
+except ImportError:   # brotli variants are skipped
+    brotli = None
+
+MANIFEST = 'manifest.json'
+
+
+def dynamic(view):
+    """Mark an examples view as per-request; it is never pre-rendered."""
+    view.snapshot_dynamic = True
+    return view
+
+
+def snapshot_dir(app):
+    return app.config.get('PRERENDER_DIR') or os.path.join(app.instance_path, 'prerender')
+
+
+def _candidate_urls(app):
+    """Yield (endpoint, url) for argument-free GET routes of the examples blueprint."""
+    for rule in app.url_map.iter_rules():
+        if not rule.endpoint.startswith('examples.') or rule.arguments:
+            continue
+        if 'GET' not in rule.methods:
+            continue
+        if getattr(app.view_functions[rule.endpoint], 'snapshot_dynamic', False):
+            yield rule.endpoint, None
+            continue
+        yield rule.endpoint, rule.rule
+
+
+def build_snapshots(app):
+    """
+    Render every static examples page and write it to snapshot_dir(app).
+
+    Returns:
+        tuple: (list of snapshotted endpoints, dict of skipped endpoint -> reason)
+    """
+    out_dir = snapshot_dir(app)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest, skipped = {}, {}
+
+    for endpoint, url in sorted(_candidate_urls(app)):
+        if url is None:
+            skipped[endpoint] = 'marked @dynamic'
+            continue
+        # Two independent anonymous clients: any per-request state shows up as a difference.
+        # buffered: streamed pages (app.streaming) are read to the end before the next request
+        first = app.test_client().get(url, buffered=True)
+        second = app.test_client().get(url, buffered=True)
+        if first.status_code != 200:
+            skipped[endpoint] = f'status {first.status_code}'
+            continue
+        if 'Set-Cookie' in first.headers:
+            skipped[endpoint] = 'sets a cookie (session/CSRF state)'
+            continue
+        if first.data != second.data:
+            skipped[endpoint] = 'output differs between renders'
+            continue
+
+        body = first.data
+        variants = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(body, quality=11)
+        files = {}
+        for encoding, data in variants.items():
+            filename = endpoint + {'identity': '.html', 'gzip': '.html.gz', 'br': '.html.br'}[encoding]
+            with open(os.path.join(out_dir, filename), 'wb') as f:
+                f.write(data)
+            files[encoding] = filename
+        manifest[endpoint] = {
+            'etag': hashlib.sha256(body).hexdigest()[:32],
+            'mimetype': first.mimetype,
+            'files': files,
+        }
+
+    with open(os.path.join(out_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return sorted(manifest), skipped
+
+
+def init_snapshots(app):
+    """Load pre-rendered pages into memory when PRERENDER_EXAMPLES is enabled."""
+    if not app.config.get('PRERENDER_EXAMPLES'):
+        return
+    path = os.path.join(snapshot_dir(app), MANIFEST)
+    if not os.path.exists(path):
+        app.logger.warning('PRERENDER_EXAMPLES is set but %s is missing; run `flask prerender`.', path)
+        return
+    with open(path) as f:
+        manifest = json.load(f)
+    snapshots = {}
+    for endpoint, entry in manifest.items():
+        variants = {}
+        for encoding, filename in entry['files'].items():
+            with open(os.path.join(snapshot_dir(app), filename), 'rb') as f:
+                variants[encoding] = f.read()
+        snapshots[endpoint] = {'etag': entry['etag'], 'mimetype': entry['mimetype'],
+                               'variants': variants}
+    app.extensions['example_snapshots'] = snapshots
+    app.logger.info('Serving %d pre-rendered example pages.', len(snapshots))
+
+
+def serve_snapshot():
+    """
+    Return the pre-rendered response for this request, or None to render normally.
+
+    Only anonymous GET/HEAD requests without pending flash messages are
+    served, because the snapshots were rendered for an anonymous visitor.
+    """
+    snapshots = current_app.extensions.get('example_snapshots')
+    if not snapshots or request.method not in ('GET', 'HEAD'):
+        return None
+    snapshot = snapshots.get(request.endpoint)
+    if snapshot is None or current_user.is_authenticated or session.get('_flashes'):
+        return None
+
+    variants = snapshot['variants']
+    encoding = 'identity'
+    for candidate in ('br', 'gzip'):
+        if candidate in variants and request.accept_encodings[candidate]:
+            encoding = candidate
+            break
+
+    response = current_app.response_class(variants[encoding], mimetype=snapshot['mimetype'])
+    # Same per-coding ETag convention as Flask-Compress ("abc" -> "abc:gzip")
+    response.set_etag(snapshot['etag'] if encoding == 'identity'
+                      else f"{snapshot['etag']}:{encoding}")
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response.make_conditional(request)
@@ -1,11 +1,20 @@
 """
 Flask Sing App - Extensions
 """
+import zlib
+
+from flask import current_app, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from flask_caching import Cache
-from flask_compress import Compress
+from flask_compress import Compress as _Compress
+from flask_compress.flask_compress import _choose_algorithm
+
+try:
+    import brotli
+except ImportError:   # streamed pages fall back to gzip
+    brotli = None
 
 # Initialize SQLAlchemy
 db = SQLAlchemy()
@@ -19,6 +28,70 @@ migrate = Migrate()
 # Initialize Flask-Caching
 cache = Cache()
 
+class Compress(_Compress):
+    """
+    Flask-Compress that skips responses marked `skip_compression` (see
+    app.static_files) and flushes streams marked `flush_chunks` (see
+    app.streaming) chunk by chunk.
+    """
+
+    def after_request(self, response):
+        if getattr(response, 'skip_compression', False):
+            return response
+        if response.is_streamed and getattr(response, 'flush_chunks', False):
+            return self._compress_flushed(response)
+        return super().after_request(response)
+
+    def _compress_flushed(self, response):
+        """
+        Compress a stream, flushing the compressor after every chunk.
+
+        Flask-Compress streams let zlib/brotli hold output back until their
+        buffers fill, which would delay an early-flushed <head> until most of
+        the page is rendered.
+        """
+        app = self.app or current_app
+        vary = response.headers.get('Vary')
+        if not vary:
+            response.headers['Vary'] = 'Accept-Encoding'
+        elif 'accept-encoding' not in vary.lower():
+            response.headers['Vary'] = f'{vary}, Accept-Encoding'
+        algorithms = tuple(a for a in self.streaming_algorithms if a in ('br', 'gzip', 'deflate')
+                           and (a != 'br' or brotli is not None))
+        algorithm = _choose_algorithm(algorithms, request.headers.get('Accept-Encoding', ''))
+        if (algorithm is None or not app.config['COMPRESS_STREAMS']
+                or response.mimetype not in self.compress_mimetypes_set
+                or not 200 <= response.status_code < 300
+                or 'Content-Encoding' in response.headers):
+            return response
+
+        if algorithm == 'br':
+            compressor = brotli.Compressor(mode=app.config['COMPRESS_BR_MODE'],
+                                           quality=app.config['COMPRESS_BR_LEVEL'],
+                                           lgwin=app.config['COMPRESS_BR_WINDOW'],
+                                           lgblock=app.config['COMPRESS_BR_BLOCK'])
+            compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+        else:
+            if algorithm == 'gzip':
+                compressor = zlib.compressobj(app.config['COMPRESS_LEVEL'], zlib.DEFLATED, zlib.MAX_WBITS + 16)
+            else:
+                compressor = zlib.compressobj(app.config['COMPRESS_DEFLATE_LEVEL'])
+            compress, finish = compressor.compress, compressor.flush
+            flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+
+        def generate(chunks):
+            for chunk in chunks:
+                if chunk:
+                    yield compress(chunk) + flush()
+            yield finish()
+
+        response.direct_passthrough = False
+        response.headers['Content-Encoding'] = algorithm
+        response.headers.pop('Content-Length', None)
+        response.response = generate(response.iter_encoded())
+        return response
+
+
 # Initialize Flask-Compress
 compress = Compress()
 
@@ -94,3 +167,18 @@ def _apply_security(app):
             app.logger.info('Secure headers applied (SECURITY_LEVEL=production).')
         except ImportError:
             app.logger.warning('Flask-Talisman not installed; secure headers skipped.')
+
+
+def reset_after_fork(app):
+    """
+    Drop the database connections a worker inherited from the master.
+
+    With gunicorn's preload_app the app, and its engine's connection pool
+    (create_all() in demo mode already opened one), is created in the master
+    before the fork. Sharing those sockets between workers corrupts them, so
+    every worker starts a fresh pool; close=False leaves the master's
+    connections untouched. Called from post_fork in gunicorn.conf.py.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,218 @@
+"""
+Flask Sing App - Font Subsetting
+
+The icon fonts carry every glyph of their sets (Font Awesome 6 Solid alone
+is 150 KB) although the templates use a few hundred icons. `flask
+subset-fonts` scans templates/, the Python views (icons returned by the
+API, e.g. 'fa-solid fa-upload' in /api/notifications) and the app's own
+scripts for the words they use, and keeps in each icon font only the
+glyphs whose icon rules (`.fa-upload:before{content:"\\f093"}`) those words
+can match. Text fonts keep the characters found in templates plus a base
+range for user content (FONT_SUBSET_TEXT_UNICODES).
+
+Subsets are written as WOFF2 to static/subsets/ under the original path,
+
+    css/webfonts/fa-solid-900.woff2 -> subsets/css/webfonts/fa-solid-900.woff2
+
+and never replace the originals. `flask fingerprint-assets` then publishes
+the subset under the original name, so every @font-face reference, in the
+theme, the purged stylesheets and the inlined critical CSS, resolves to it
+through the asset manifest. With FONT_SUBSETTING off (or without a
+manifest) the full fonts are served.
+
+FONT_SUBSETTING is a build setting: the font files, and the stylesheets
+that reference them by hashed name, are fixed when fingerprint-assets
+runs. The running app only follows the manifest, so after changing the
+flag re-run fingerprint-assets and precompress-assets, then restart.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+
+from app.critical_css import load_stylesheet, parse_css, selector_used
+
+try:
+    from fontTools import subset as ft_subset
+    from fontTools.ttLib import TTFont
+except ImportError:   # `flask subset-fonts` needs fonttools (and brotli for WOFF2)
+    ft_subset = None
+
+SUBSETS_DIR = 'subsets'
+INDEX_NAME = 'index.json'
+
+# Fonts to subset (path under static/) -> stylesheet with their icon rules,
+# or None for a text font. Only WOFF2 sources: browsers that take WOFF2 never
+# fetch the other formats listed after it. (No text font is served locally
+# today; the theme takes Montserrat from Google Fonts.)
+FONT_SUBSETS = {
+    'css/webfonts/fa-solid-900.woff2': 'css/vendor/font-awesome.min.css',
+    'css/webfonts/fa-regular-400.woff2': 'css/vendor/font-awesome.min.css',
+    'css/webfonts/fa-brands-400.woff2': 'css/vendor/font-awesome.min.css',
+    'fonts/glyphicons-halflings-regular.woff2': 'css/application.min.css',
+}
+
+_WORD = re.compile(r'[\w-]+')
+_CONTENT = re.compile(r'''content\s*:\s*(['"])(.*?)\1''')
+_CSS_ESCAPE = re.compile(r'\\([0-9a-fA-F]{1,6})\s?|\\(.)')
+_TAG = re.compile(r'<[^>]*>|{[{%#].*?[}%#]}', re.S)
+_ENTITY = re.compile(r'&#(x[0-9a-fA-F]+|\d+);')
+
+
+def _sources(app):
+    """Yield (path, text) for the templates, Python modules and app scripts."""
+    roots = (os.path.join(app.root_path, app.template_folder), app.root_path,
+             os.path.join(app.static_folder, 'js'))
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d not in ('vendor', '__pycache__')]
+            for name in filenames:
+                if name.endswith(('.html', '.py', '.js')):
+                    path = os.path.join(dirpath, name)
+                    with open(path, encoding='utf-8', errors='replace') as f:
+                        yield path, f.read()
+
+
+def _content_codepoints(value):
+    """Code points of a CSS `content` string ('\\f093' -> {0xf093})."""
+    def unescape(match):
+        return chr(int(match.group(1), 16)) if match.group(1) else match.group(2)
+    return {ord(char) for char in _CSS_ESCAPE.sub(unescape, value)}
+
+
+def _icon_codepoints(rules, words):
+    """Code points of the `content` of every rule whose selector `words` can match."""
+    codepoints = set()
+    for prelude, body in rules:
+        if isinstance(body, list):
+            codepoints |= _icon_codepoints(body, words)
+        elif body and not prelude.startswith('@'):
+            content = _CONTENT.search(body)
+            if content and any(selector_used(s.strip(), words) for s in prelude.split(',')):
+                codepoints |= _content_codepoints(content.group(2))
+    return codepoints
+
+
+def parse_unicodes(spec):
+    """'U+0020-007E,U+00A0' -> set of code points."""
+    codepoints = set()
+    for part in str(spec or '').split(','):
+        part = part.strip().upper().replace('U+', '')
+        if not part:
+            continue
+        start, _, end = part.partition('-')
+        codepoints.update(range(int(start, 16), int(end or start, 16) + 1))
+    return codepoints
+
+
+def _subset(source, target, unicodes):
+    """Write the glyphs of `unicodes` in `source` to `target` as WOFF2; returns glyph count."""
+    options = ft_subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    options.name_IDs = ['*']
+    options.notdef_outline = True
+    font = TTFont(source)
+    subsetter = ft_subset.Subsetter(options)
+    subsetter.populate(unicodes=unicodes)
+    subsetter.subset(font)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    ft_subset.save_font(font, target + '.tmp', options)
+    os.replace(target + '.tmp', target)
+    return len(font.getGlyphOrder())
+
+
+def build_font_subsets(app):
+    """
+    Subset every font in FONT_SUBSETS to the icons and characters in use.
+
+    Returns:
+        dict: the index written to static/subsets/index.json, font path ->
+        {'subset', 'key', 'unicodes', 'glyphs', 'bytes', 'source_bytes',
+        'status' ('written' or 'cached')}
+    """
+    if ft_subset is None:
+        raise RuntimeError('fonttools is not installed; `pip install fonttools brotli` to subset fonts.')
+    # fontTools logs every table it drops or can't parse strictly
+    logging.getLogger('fontTools').setLevel(logging.ERROR)
+    static_dir = app.static_folder
+    subsets_dir = os.path.join(static_dir, SUBSETS_DIR)
+    index_path = os.path.join(subsets_dir, INDEX_NAME)
+    try:
+        with open(index_path) as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+
+    words, characters = set(), set()
+    for path, text in _sources(app):
+        words.update(_WORD.findall(text))
+        if path.endswith('.html'):
+            text = _ENTITY.sub(lambda m: chr(int('0' + m.group(1), 0) if m.group(1)[0] == 'x'
+                                             else int(m.group(1))), _TAG.sub(' ', text))
+            characters.update(ord(char) for char in text if ord(char) >= 0x20)
+    text_base = parse_unicodes(app.config.get('FONT_SUBSET_TEXT_UNICODES'))
+
+    icon_codepoints = {}
+    index = {}
+    for font_path, stylesheet in FONT_SUBSETS.items():
+        source = os.path.join(static_dir, *font_path.split('/'))
+        if not os.path.isfile(source):
+            continue
+        if stylesheet is None:
+            unicodes = characters | text_base
+        else:
+            if stylesheet not in icon_codepoints:
+                rules = parse_css(load_stylesheet(static_dir, stylesheet))[0]
+                icon_codepoints[stylesheet] = _icon_codepoints(rules, words)
+            # Icon characters typed into templates directly (&#xf093;) count too
+            unicodes = icon_codepoints[stylesheet] | {c for c in characters if 0xe000 <= c <= 0xf8ff}
+        with open(source, 'rb') as f:
+            key = hashlib.sha256(f.read() + ','.join(map(str, sorted(unicodes))).encode()).hexdigest()[:12]
+        subset = f'{SUBSETS_DIR}/{font_path}'
+        target = os.path.join(static_dir, *subset.split('/'))
+        entry = previous.get(font_path)
+        if entry and entry['key'] == key and os.path.exists(target):
+            entry['status'] = 'cached'
+        else:
+            try:
+                glyphs = _subset(source, target, unicodes)
+            except Exception as e:   # fontTools raises TTLibError, AssertionError, ... on damaged files
+                app.logger.warning('Skipping %s, the full font stays in use: %s', font_path, e)
+                continue
+            entry = {'subset': subset, 'key': key, 'unicodes': len(unicodes), 'glyphs': glyphs,
+                     'status': 'written'}
+        entry.update(bytes=os.path.getsize(target), source_bytes=os.path.getsize(source))
+        index[font_path] = entry
+
+    for dirpath, _dirnames, filenames in os.walk(subsets_dir):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            rel_path = os.path.relpath(path, subsets_dir).replace(os.sep, '/')
+            if rel_path != INDEX_NAME and rel_path not in index:
+                os.remove(path)
+    os.makedirs(subsets_dir, exist_ok=True)
+    with open(index_path, 'w') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    return index
+
+
+def font_subsets(app):
+    """
+    {font path: subset file} for `flask fingerprint-assets`; empty when
+    FONT_SUBSETTING is off or no subsets were built.
+    """
+    if not app.config.get('FONT_SUBSETTING', True):
+        return {}
+    try:
+        with open(os.path.join(app.static_folder, SUBSETS_DIR, INDEX_NAME)) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    subsets = {}
+    for font_path, entry in index.items():
+        path = os.path.join(app.static_folder, *entry['subset'].split('/'))
+        if os.path.isfile(path):
+            subsets[font_path] = path
+    return subsets
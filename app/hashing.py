@@ -0,0 +1,316 @@
+"""
+Flask Sing App - Password Hashing
+
+Pluggable password hashing service. Hashing is CPU-bound (hundreds of
+milliseconds per call with production parameters), so the number of hashes
+running at once is bounded for the whole host, not per worker process:
+with gunicorn's 2 x CPUs + 1 workers a login burst would otherwise put
+every worker on a hash and stall /health. Once the bound and its queue are
+full, callers get a fast 503.
+
+Backends:
+    host     (default) hashes in the calling thread while holding one of
+             PASSWORD_HASH_WORKERS slots shared by every process on the host
+             (byte-range locks on PASSWORD_HASH_SLOTS_FILE). A sync worker
+             waits for its own request either way, so this adds no pool
+             processes; hashlib releases the GIL, so threads run in parallel.
+             The kernel drops the locks of a worker that dies mid-hash.
+             hash_many() (bulk import) runs up to PASSWORD_HASH_WORKERS
+             threads, each hash holding its own slot.
+    process  per-process pool of PASSWORD_HASH_WORKERS processes, for a
+             single multi-threaded server process. Under several worker
+             processes every one gets its own pool.
+    inline   no bound (tests)
+
+Configuration (see config.py):
+    PASSWORD_HASH_BACKEND        'host' (default), 'process', 'inline', or an import path
+    PASSWORD_HASH_METHOD         werkzeug method string, e.g. 'scrypt:32768:8:1'
+    PASSWORD_HASH_WORKERS        hashes running at once (host: per host; process: pool size)
+    PASSWORD_HASH_QUEUE_SIZE     callers allowed to wait for a slot
+    PASSWORD_HASH_QUEUE_TIMEOUT  seconds to wait before HashingBusy
+    PASSWORD_HASH_SLOTS_FILE     host backend lock file (default: instance/password-hash.slots)
+
+Stored hashes carry their method, so hashes made with outdated parameters
+are detected by needs_rehash() and upgraded on the next successful login.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from flask import current_app, jsonify, request
+from werkzeug.security import check_password_hash, generate_password_hash
+from werkzeug.utils import import_string
+
+try:
+    import fcntl
+except ImportError:   # Windows: the host backend bounds each process on its own
+    fcntl = None
+
+SLOTS_FILE_NAME = 'password-hash.slots'
+_SLOT_POLL_INTERVAL = 0.005
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full; rendered as 503 Service Unavailable."""
+
+
+def _hash_many(passwords, method):
+    """Hash a list of passwords (runs inside pool processes, so module-level)."""
+    return [generate_password_hash(p, method=method) for p in passwords]
+
+
+class InlineHasher:
+    """Hashes in the calling thread. Used by TestingConfig and single-process setups."""
+
+    def __init__(self, app):
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self._method_prefix = None
+
+    def hash(self, password):
+        return generate_password_hash(password, method=self.method)
+
+    def hash_many(self, passwords):
+        return _hash_many(passwords, self.method)
+
+    def verify(self, pwhash, password):
+        return check_password_hash(pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """
+        True if `pwhash` was not made with the current method and parameters.
+
+        Short method names such as 'scrypt' or 'pbkdf2' expand to werkzeug's
+        current defaults, so the expected "method:params" prefix is learned
+        from one throwaway hash per process.
+        """
+        if self._method_prefix is None:
+            self._method_prefix = generate_password_hash('', method=self.method).split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._method_prefix
+
+
+class ProcessPoolHasher(InlineHasher):
+    """
+    Hashes on a process pool shared by all threads of this process.
+
+    The bound is per process; under several worker processes use the host
+    backend instead.
+
+    At most PASSWORD_HASH_WORKERS jobs run and PASSWORD_HASH_QUEUE_SIZE more
+    wait; further callers block for up to PASSWORD_HASH_QUEUE_TIMEOUT seconds
+    and then get HashingBusy.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.workers = max(1, app.config['PASSWORD_HASH_WORKERS'])
+        self.timeout = app.config['PASSWORD_HASH_QUEUE_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(
+            self.workers + app.config['PASSWORD_HASH_QUEUE_SIZE'])
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+
+    def _get_pool(self):
+        """Return this process's pool, creating it on first use (never inherited across fork)."""
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _submit(self, fn, *args):
+        """Submit a job once a queue slot is free; the slot is released when the job ends."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HashingBusy()
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password):
+        return self._submit(generate_password_hash, password, self.method).result()
+
+    def hash_many(self, passwords):
+        # One job per worker, so a bulk import holds at most `workers` queue slots
+        size = -(-len(passwords) // self.workers)
+        futures = [self._submit(_hash_many, passwords[i:i + size], self.method)
+                   for i in range(0, len(passwords), size)]
+        return [pwhash for future in futures for pwhash in future.result()]
+
+    def verify(self, pwhash, password):
+        return self._submit(check_password_hash, pwhash, password).result()
+
+
+class HostSlotsHasher(InlineHasher):
+    """
+    Hashes in the calling thread inside one of PASSWORD_HASH_WORKERS host-wide slots.
+
+    The slots file has one byte per slot: bytes [0, workers) are running
+    slots, the next workers + queue_size bytes admission slots. A caller
+    takes an admission byte (none free: HashingBusy at once), then waits up
+    to PASSWORD_HASH_QUEUE_TIMEOUT for a running byte (HashingBusy after).
+    fcntl locks belong to the process, so a thread lock and the set of
+    bytes held in this process keep its threads apart.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.workers = max(1, app.config['PASSWORD_HASH_WORKERS'])
+        self.queue_size = max(0, app.config['PASSWORD_HASH_QUEUE_SIZE'])
+        self.timeout = app.config['PASSWORD_HASH_QUEUE_TIMEOUT']
+        self.path = app.config.get('PASSWORD_HASH_SLOTS_FILE') or os.path.join(
+            app.instance_path, SLOTS_FILE_NAME)
+        self._lock = threading.Lock()
+        self._held = set()
+        self._fd = None
+        self._fd_pid = None
+        if fcntl is None:
+            self._admitted = threading.BoundedSemaphore(self.workers + self.queue_size)
+            self._running = threading.BoundedSemaphore(self.workers)
+
+    def _file(self):
+        """This process's descriptor of the slots file (closing a shared one would drop every lock)."""
+        if self._fd_pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._fd_pid = os.getpid()
+        return self._fd
+
+    def _try_lock(self, first, count):
+        """Lock a free byte in [first, first + count); returns it, or None if all are taken."""
+        with self._lock:
+            fd = self._file()
+            for slot in range(first, first + count):
+                if slot in self._held:
+                    continue
+                try:
+                    fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, slot)
+                except OSError:
+                    continue
+                self._held.add(slot)
+                return slot
+        return None
+
+    def _unlock(self, slot):
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, slot)
+            self._held.discard(slot)
+
+    def _run(self, fn, *args):
+        """Run fn(*args) once a running slot is free; HashingBusy when the queue is full or on timeout."""
+        if fcntl is None:
+            if not self._admitted.acquire(blocking=False):
+                raise HashingBusy()
+            try:
+                if not self._running.acquire(timeout=self.timeout):
+                    raise HashingBusy()
+                try:
+                    return fn(*args)
+                finally:
+                    self._running.release()
+            finally:
+                self._admitted.release()
+
+        admitted = self._try_lock(self.workers, self.workers + self.queue_size)
+        if admitted is None:
+            raise HashingBusy()
+        try:
+            deadline = time.monotonic() + self.timeout
+            running = self._try_lock(0, self.workers)
+            while running is None:
+                if time.monotonic() >= deadline:
+                    raise HashingBusy()
+                time.sleep(_SLOT_POLL_INTERVAL)
+                running = self._try_lock(0, self.workers)
+            try:
+                return fn(*args)
+            finally:
+                self._unlock(running)
+        finally:
+            self._unlock(admitted)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def hash_many(self, passwords):
+        # One slot per password, so logins interleave with a bulk import; up to
+        # `workers` threads take slots at once (hashlib releases the GIL)
+        threads = min(self.workers, len(passwords))
+        if threads <= 1:
+            return [self.hash(password) for password in passwords]
+        pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='hash')
+        try:
+            return list(pool.map(self.hash, passwords))
+        finally:
+            pool.shutdown(cancel_futures=True)   # after HashingBusy, drop the rest of the batch
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+
+BACKENDS = {
+    'inline': InlineHasher,
+    'host': HostSlotsHasher,
+    'process': ProcessPoolHasher,
+}
+
+
+def init_hashing(app):
+    """Create the configured hashing backend and register the 503 handler."""
+    backend = app.config.get('PASSWORD_HASH_BACKEND', 'host')
+    backend_cls = BACKENDS.get(backend) or import_string(backend)
+    app.extensions['password_hasher'] = backend_cls(app)
+
+    @app.errorhandler(HashingBusy)
+    def hashing_busy(e):
+        """Shed load instead of queueing indefinitely behind the hashing pool."""
+        if request.path.startswith('/api/'):
+            response = jsonify(error='Service Unavailable', message='Try again shortly.')
+        else:
+            response = current_app.response_class('Server busy, please retry.', mimetype='text/plain')
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+
+
+def _hasher():
+    """The backend created by init_hashing() for the current app."""
+    return current_app.extensions['password_hasher']
+
+
+def hash_password(password):
+    """Hash one password with the configured method."""
+    return _hasher().hash(password)
+
+
+def hash_passwords(passwords):
+    """
+    Hash a list of plain text passwords, preserving order.
+
+    Args:
+        passwords: List of plain text passwords
+
+    Returns:
+        list: Password hashes in the same order as `passwords`
+    """
+    if not passwords:
+        return []
+    return _hasher().hash_many(list(passwords))
+
+
+def verify_password(pwhash, password):
+    """Check `password` against a stored hash. Users without a hash never match."""
+    if not pwhash:
+        return False
+    return _hasher().verify(pwhash, password)
+
+
+def needs_rehash(pwhash):
+    """True if `pwhash` was not made with the current PASSWORD_HASH_METHOD parameters."""
+    if not pwhash:
+        return False
+    return _hasher().needs_rehash(pwhash)
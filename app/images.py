@@ -0,0 +1,206 @@
+"""
+Flask Sing App - Responsive Images
+
+`flask build-images` writes resized AVIF/WebP variants of the JPEG and PNG
+files under static/demo/img/ and static/img/ to static/variants/, plus an
+index (static/variants/index.json) of what was generated. Variant names
+contain a hash of the source file and the encoder settings,
+
+    demo/img/people/a3.jpg -> variants/demo/img/people/a3.1f0c9e2ab4d7.320.webp
+
+so the variants directory is also the cache: an unchanged source is never
+re-encoded, and variants whose source changed or disappeared are deleted.
+Run `flask fingerprint-assets` afterwards so variant URLs are versioned
+like every other static file.
+
+Templates use the `responsive_image` global instead of a bare <img>:
+
+    {{ responsive_image('demo/img/pictures/1.jpg', 'Project Design',
+                        sizes='(min-width: 992px) 25vw, 50vw') }}
+
+which renders a <picture> with one srcset per format and a lazy-loaded
+<img> fallback, or just the <img> when the file has no variants.
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, url_for
+from markupsafe import Markup
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:   # `flask build-images` needs Pillow; templates fall back to the originals
+    Image = None
+
+VARIANTS_DIR = 'variants'
+INDEX_NAME = 'index.json'
+# Folders under static/ whose images get variants
+IMAGE_SOURCE_DIRS = ('demo/img', 'img')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+
+
+def _settings(app):
+    widths = sorted({int(w) for w in str(app.config.get('IMAGE_VARIANT_WIDTHS', '')).split(',') if w.strip()})
+    formats = [f.strip() for f in str(app.config.get('IMAGE_VARIANT_FORMATS', '')).split(',') if f.strip()]
+    unknown = set(formats) - set(MIME_TYPES)
+    if unknown:
+        raise ValueError(f'IMAGE_VARIANT_FORMATS: unsupported formats {sorted(unknown)}')
+    return widths, formats, int(app.config.get('IMAGE_VARIANT_QUALITY', 70))
+
+
+def _target_widths(source_width, widths):
+    """Configured widths narrower than the source, plus the source's own width if no wider one is configured."""
+    targets = [w for w in widths if w < source_width]
+    if widths and source_width <= widths[-1]:
+        targets.append(source_width)
+    return targets
+
+
+def _encode(source_path, target_path, width, fmt, quality):
+    """Resize `source_path` to `width` and save it as `fmt`; returns bytes written."""
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.width != width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        temp_path = target_path + '.tmp'
+        image.save(temp_path, format=fmt.upper(), quality=quality)
+    os.replace(temp_path, target_path)
+    return os.path.getsize(target_path)
+
+
+def build_images(app):
+    """
+    Generate missing variants, delete stale ones and write the index.
+
+    Returns:
+        dict with counts (images, generated, cached, removed) and byte
+        totals (source_bytes; variant_bytes, the largest variant of each
+        image in the first configured format)
+    """
+    if Image is None:
+        raise RuntimeError('Pillow is not installed; `pip install Pillow` to build image variants.')
+    widths, formats, quality = _settings(app)
+    if 'avif' in formats and not features.check('avif'):
+        app.logger.warning('This Pillow build cannot write AVIF; only %s variants are built.',
+                           ', '.join(f for f in formats if f != 'avif') or 'no')
+        formats = [f for f in formats if f != 'avif']
+
+    static_dir = app.static_folder
+    variants_dir = os.path.join(static_dir, VARIANTS_DIR)
+    settings_key = f'{widths}:{formats}:{quality}'.encode()
+    index, jobs, keep = {}, [], {os.path.join(variants_dir, INDEX_NAME)}
+    stats = {'images': 0, 'generated': 0, 'cached': 0, 'removed': 0, 'source_bytes': 0, 'variant_bytes': 0}
+
+    for source_dir in IMAGE_SOURCE_DIRS:
+        for root, _dirs, files in os.walk(os.path.join(static_dir, *source_dir.split('/'))):
+            for name in sorted(files):
+                if not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                rel_path = os.path.relpath(path, static_dir).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    data = f.read()
+                key = hashlib.sha256(data + settings_key).hexdigest()[:12]
+                try:
+                    with Image.open(path) as image:
+                        width, height = ImageOps.exif_transpose(image).size
+                except OSError as e:
+                    app.logger.warning('Skipping %s: %s', rel_path, e)
+                    continue
+                stem = os.path.splitext(rel_path)[0]
+                entry = {'width': width, 'height': height, 'variants': {}}
+                for fmt in formats:
+                    entry['variants'][fmt] = []
+                    for target_width in _target_widths(width, widths):
+                        variant = f'{VARIANTS_DIR}/{stem}.{key}.{target_width}.{fmt}'
+                        target = os.path.join(static_dir, *variant.split('/'))
+                        keep.add(target)
+                        entry['variants'][fmt].append([target_width, variant])
+                        if os.path.exists(target):
+                            stats['cached'] += 1
+                        else:
+                            jobs.append((path, target, target_width, fmt, quality))
+                index[rel_path] = entry
+                stats['images'] += 1
+                stats['source_bytes'] += len(data)
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:   # Pillow releases the GIL
+        stats['generated'] = len(list(pool.map(lambda job: _encode(*job), jobs)))
+
+    for entry in index.values():
+        # Largest variant in the preferred (first) format, to compare with the original
+        variants = next(iter(entry['variants'].values()), None)
+        if variants:
+            stats['variant_bytes'] += os.path.getsize(os.path.join(static_dir, *variants[-1][1].split('/')))
+    for root, _dirs, files in os.walk(variants_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            if path not in keep:
+                os.remove(path)
+                stats['removed'] += 1
+
+    os.makedirs(variants_dir, exist_ok=True)
+    with open(os.path.join(variants_dir, INDEX_NAME), 'w') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    return stats
+
+
+def responsive_image(filename, alt='', sizes='100vw', lazy=True, **attrs):
+    """
+    <picture> markup for a static image with AVIF/WebP srcsets (template global).
+
+    Args:
+        filename: Image path relative to static/, as for url_for('static')
+        alt: Alternative text
+        sizes: The `sizes` attribute: the displayed width per media condition
+        lazy: Add loading="lazy" (turn off for images above the fold)
+        **attrs: Extra <img> attributes; use class_ for class
+
+    Returns:
+        Markup: <picture> when variants exist, otherwise a single <img>
+    """
+    entry = current_app.extensions.get('image_variants', {}).get(filename)
+    img_attrs = {'src': url_for('static', filename=filename), 'alt': alt}
+    if lazy:
+        img_attrs['loading'] = 'lazy'
+    img_attrs['decoding'] = 'async'
+    img_attrs.update((name.rstrip('_'), value) for name, value in attrs.items())
+    img = Markup('<img{}>').format(
+        Markup('').join(Markup(' {}="{}"').format(name, value) for name, value in img_attrs.items()))
+    if not entry:
+        return img
+
+    sources = [Markup('<source type="{}" srcset="{}" sizes="{}">').format(MIME_TYPES[fmt], image_srcset(filename, fmt), sizes)
+               for fmt, variants in entry['variants'].items() if variants]
+    # .responsive-image is display: contents, so the <img> keeps its layout (percent heights)
+    return Markup('<picture class="responsive-image">{}{}</picture>').format(Markup('').join(sources), img)
+
+
+def image_srcset(filename, fmt='webp'):
+    """The srcset string for one format of a static image, or '' when it has no variants (JSON APIs)."""
+    entry = current_app.extensions.get('image_variants', {}).get(filename)
+    variants = entry['variants'].get(fmt) if entry else None
+    if not variants:
+        return ''
+    return ', '.join(f"{url_for('static', filename=path)} {width}w" for width, path in variants)
+
+
+def init_images(app):
+    """Load the variant index once at startup and register the `responsive_image` global."""
+    app.extensions['image_variants'] = {}
+    app.add_template_global(responsive_image)
+    if not app.config.get('RESPONSIVE_IMAGES', True):
+        return
+    path = os.path.join(app.static_folder, VARIANTS_DIR, INDEX_NAME)
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        app.extensions['image_variants'] = json.load(f)
+    app.logger.info('Loaded %d responsive image entries.', len(app.extensions['image_variants']))
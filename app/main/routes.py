@@ -4,19 +4,20 @@ Flask Sing App - Main Blueprint Routes
 from flask import render_template
 from flask_login import current_user
 from app.main import main_bp
-from app.extensions import cache
+from app.caching import cached_view
 from app.utils import conditional_login_required
 
 
 @main_bp.route('/')
 @conditional_login_required
-@cache.cached(timeout=300, unless=lambda: current_user.is_authenticated)
+@cached_view(timeout=300, unless=lambda: current_user.is_authenticated)
 def index():
     """
     Main dashboard - Analytics page.
     
     This is the core page that is always enabled regardless of ENABLE_EXAMPLES.
-    Cached for 5 minutes for anonymous visitors (demo mode).
+    Cached for 5 minutes for anonymous visitors (demo mode); on expiry one
+    request re-renders while concurrent ones get the stale copy.
     Not cached for authenticated users so personalised data can be added later.
     """
     return render_template('main/index.html',
@@ -2,9 +2,17 @@
 Flask Sing App - Database Models
 """
 from datetime import datetime, timezone
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import current_app, g, has_app_context
 from flask_login import UserMixin
-from app.extensions import db, login_manager
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+from app import hashing
+from app.extensions import db, login_manager, cache
+
+
+def _utcnow():
+    """Naive UTC timestamp, matching how existing DateTime columns are stored."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 
 class User(UserMixin, db.Model):
@@ -17,18 +25,23 @@ class User(UserMixin, db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False, index=True)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(256))
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    created_at = db.Column(db.DateTime, default=_utcnow)
+    updated_at = db.Column(db.DateTime, default=_utcnow, onupdate=_utcnow, index=True)
     is_active = db.Column(db.Boolean, default=True)
     is_admin = db.Column(db.Boolean, default=False)
+    # Row version, bumped by the ORM on every UPDATE; used for API ETags
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    __mapper_args__ = {'version_id_col': version}
     
     def set_password(self, password):
         """
-        Set the user's password using secure hashing.
+        Set the user's password using the configured hashing service.
         
         Args:
             password: Plain text password
         """
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hashing.hash_password(password)
     
     def check_password(self, password):
         """
@@ -40,29 +53,133 @@ class User(UserMixin, db.Model):
         Returns:
             bool: True if password matches
         """
-        return check_password_hash(self.password_hash, password)
+        return hashing.verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """
+        Check whether the stored hash uses outdated hashing parameters.
+        
+        Returns:
+            bool: True if set_password() should be called again
+        """
+        return hashing.needs_rehash(self.password_hash)
     
-    def to_dict(self):
+    #: Fields exposed by to_dict() and the users API, in output order
+    SERIALIZABLE_FIELDS = ('id', 'username', 'email', 'is_admin', 'is_active', 'created_at')
+
+    def to_dict(self, fields=SERIALIZABLE_FIELDS):
         """
         Convert user to dictionary for JSON serialization.
         
+        Args:
+            fields: Names from SERIALIZABLE_FIELDS to include (default: all)
+            
         Returns:
             dict: User data as dictionary
         """
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'is_admin': self.is_admin,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-        }
+        return {field: self.serialize_value(getattr(self, field)) for field in fields}
+
+    @staticmethod
+    def serialize_value(value):
+        """Return a column value in its JSON-ready form (datetimes as ISO 8601)."""
+        return value.isoformat() if isinstance(value, datetime) else value
     
     def __repr__(self):
         return f'<User {self.username}>'
 
 
+# ── Identity cache for Flask-Login ────────────────────────────────────────────
+
+# Columns kept in the shared identity cache (the password hash never is;
+# it is lazy-loaded on the rare request that needs it)
+_IDENTITY_COLUMNS = ('id', 'username', 'email', 'created_at', 'updated_at',
+                     'is_active', 'is_admin', 'version')
+
+
+def _identity_key(user_id):
+    return f'user-identity/{user_id}'
+
+
+def _is_shared(backend):
+    """True if every worker process sees the same entries in `backend`."""
+    from flask_caching.backends import NullCache, SimpleCache
+    from app.cache_backends import LayeredCache
+    if isinstance(backend, LayeredCache):
+        return _is_shared(backend.l2)
+    return not isinstance(backend, (NullCache, SimpleCache))
+
+
+def _identity_cache_enabled():
+    """
+    The identity cache is only used with a cache shared by all workers.
+
+    A commit deletes the entry from the cache; with a per-process backend
+    (SimpleCache) the other workers would keep serving the old is_active /
+    is_admin until the entry expires.
+    """
+    extensions = current_app.extensions
+    if 'user_identity_cache' not in extensions:
+        extensions['user_identity_cache'] = _is_shared(cache.cache)
+    return extensions['user_identity_cache']
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    """Load user by ID for Flask-Login."""
-    return User.query.get(int(user_id))
+    """
+    Load user by ID for Flask-Login.
+
+    Memoized per request in flask.g and, when the cache backend is shared by
+    all workers, cached across requests in app.extensions.cache for
+    USER_IDENTITY_CACHE_TIMEOUT seconds, so most authenticated requests skip
+    the users query. Entries are dropped as soon as an update or delete of
+    the user is committed (see below), so deactivation and admin demotion
+    apply on the next request in every worker. LayeredCache keeps these keys
+    out of its per-worker tier (CACHE_L1_EXCLUDE_PREFIXES).
+    """
+    user_id = int(user_id)
+    memo = g.setdefault('_loaded_users', {})
+    if user_id in memo:
+        return memo[user_id]
+
+    shared = _identity_cache_enabled()
+    state = cache.get(_identity_key(user_id)) if shared else None
+    if state is not None:
+        # Attach as a clean persistent object without querying the database
+        user = User(**state)
+        make_transient_to_detached(user)
+        user = db.session.merge(user, load=False)
+    else:
+        user = db.session.get(User, user_id)
+        if user is not None and shared:
+            cache.set(_identity_key(user_id),
+                      {column: getattr(user, column) for column in _IDENTITY_COLUMNS},
+                      timeout=current_app.config.get('USER_IDENTITY_CACHE_TIMEOUT', 60))
+
+    memo[user_id] = user
+    return user
+
+
+def invalidate_user_identity(user_id):
+    """Drop the cached identity for `user_id` (shared cache and this request's memo)."""
+    cache.delete(_identity_key(user_id))
+    g.get('_loaded_users', {}).pop(user_id, None)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _mark_identity_stale(mapper, connection, target):
+    """Remember users changed in this transaction; invalidated once it commits."""
+    object_session(target).info.setdefault('stale_user_identities', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_stale_identities(session):
+    stale = session.info.pop('stale_user_identities', ())
+    if stale and has_app_context():
+        for user_id in stale:
+            invalidate_user_identity(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_stale_identities(session):
+    session.info.pop('stale_user_identities', None)
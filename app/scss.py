@@ -0,0 +1,269 @@
+"""
+Flask Sing App - Incremental SCSS Builds
+
+`flask compile-assets` compiles the SCSS bundles declared in
+app/assets.py (SCSS_BUNDLES). Every build records the dependency graph of
+each bundle in a state file (instance/scss-build.json by default): for
+each source file its size, mtime, SHA-256 and resolved @imports.
+
+The next build only stats the files in that graph. A file whose size or
+mtime moved is re-hashed, and re-parsed if its content changed; a bundle
+is recompiled only when one of its inputs hashes differently or its output
+is missing. Stale bundles compile in parallel in a process pool, each
+with a source map next to its CSS (SCSS_SOURCE_MAPS).
+"""
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import sass
+
+STATE_NAME = 'scss-build.json'
+_STATE_VERSION = 2
+_COMMENT = re.compile(r'/\*.*?\*/|(?<![:\w])//[^\n]*', re.S)
+_IMPORT = re.compile(r'@(?:import|use|forward)\s+([^;]+);')
+_QUOTED = re.compile(r"""(['"])(.+?)\1""")
+
+
+def state_path(app):
+    return app.config.get('SCSS_BUILD_STATE') or os.path.join(app.instance_path, STATE_NAME)
+
+
+def _candidates(target):
+    """Files libsass tries, in order, for `@import "target"`."""
+    directory, name = os.path.split(target)
+    if os.path.splitext(name)[1] in ('.scss', '.sass'):
+        names = ['_' + name, name]
+    else:
+        names = [prefix + name + ext for ext in ('.scss', '.sass', '.css') for prefix in ('_', '')]
+        names += [os.path.join(name, prefix + 'index' + ext) for ext in ('.scss', '.sass') for prefix in ('_', '')]
+    return [os.path.join(directory, n) for n in names]
+
+
+def parse_imports(source, base_dir, include_paths=()):
+    """
+    Resolve the Sass imports in `source` to absolute paths.
+
+    Plain CSS imports (url(), .css, remote) stay in the output and are not
+    dependencies. Every candidate tried before the file that resolves the
+    import is listed too, and all candidates of an unresolvable import
+    (libsass reports it): they are recorded as missing inputs, so creating
+    one of them, which fixes the import or shadows the file it resolved
+    to, invalidates the bundle.
+    """
+    imports = []
+    for statement in _IMPORT.findall(_COMMENT.sub('', source)):
+        if 'url(' in statement:
+            continue
+        for _quote, target in _QUOTED.findall(statement):
+            if target.endswith('.css') or '//' in target:
+                continue
+            tried = []
+            for root in (base_dir, *include_paths):
+                for candidate in _candidates(target):
+                    path = os.path.normpath(os.path.join(root, candidate))
+                    tried.append(path)
+                    if os.path.isfile(path):
+                        break
+                else:
+                    continue
+                break
+            imports.extend(tried)
+    return imports
+
+
+class DependencyGraph:
+    """
+    Source file nodes for one build, reusing the previous build's nodes.
+
+    Args:
+        previous: {path: node} from the state file
+        include_paths: extra libsass include paths
+    """
+
+    def __init__(self, previous, include_paths=()):
+        self.previous = previous
+        self.include_paths = list(include_paths)
+        self.nodes = {}
+        self.hashed = 0   # files read this build (changed or new)
+
+    def node(self, path):
+        """Return {'size', 'mtime_ns', 'sha256', 'imports'} for `path`."""
+        if path in self.nodes:
+            return self.nodes[path]
+        stat = os.stat(path)
+        node = self.previous.get(path)
+        if node is None or node['size'] != stat.st_size or node['mtime_ns'] != stat.st_mtime_ns:
+            with open(path, 'rb') as f:
+                data = f.read()
+            self.hashed += 1
+            sha256 = hashlib.sha256(data).hexdigest()
+            if node is not None and node['sha256'] == sha256:
+                imports = node['imports']   # touched, not changed
+            elif path.endswith(('.scss', '.sass')):
+                imports = parse_imports(data.decode('utf-8', 'replace'), os.path.dirname(path),
+                                        self.include_paths)
+            else:
+                imports = []
+            node = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                    'sha256': sha256, 'imports': imports}
+        self.nodes[path] = node
+        return node
+
+    def inputs(self, entry):
+        """Return {path: sha256} for `entry` and everything it imports (None = missing)."""
+        inputs = {}
+        pending = [entry]
+        while pending:
+            path = pending.pop()
+            if path in inputs:
+                continue
+            try:
+                node = self.node(path)
+            except FileNotFoundError:
+                inputs[path] = None
+                continue
+            inputs[path] = node['sha256']
+            pending.extend(node['imports'])
+        return inputs
+
+
+def compile_bundle(source, output, output_style='nested', source_map=True, include_paths=()):
+    """
+    Compile one SCSS entry point to `output` (and `output`.map). Runs in pool workers.
+
+    Returns:
+        tuple: (bytes of CSS written, seconds spent)
+    """
+    started = time.perf_counter()
+    options = {'filename': source, 'output_style': output_style, 'include_paths': list(include_paths)}
+    if source_map:
+        css, source_map_json = sass.compile(source_map_filename=output + '.map',
+                                            output_filename_hint=output,
+                                            source_map_contents=True, **options)
+    else:
+        css = sass.compile(**options)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    # Replace rather than rewrite: dist/ may hold hard links to these files
+    with open(output + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(css)
+    os.replace(output + '.tmp', output)
+    if source_map:
+        with open(output + '.map.tmp', 'w', encoding='utf-8') as f:
+            f.write(source_map_json)
+        os.replace(output + '.map.tmp', output + '.map')
+    elif os.path.exists(output + '.map'):
+        os.remove(output + '.map')
+    return len(css.encode('utf-8')), time.perf_counter() - started
+
+
+def _load_state(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if state.get('version') == _STATE_VERSION else None
+
+
+def build_scss(app, force=False):
+    """
+    Compile the SCSS bundles whose inputs changed since the last build.
+
+    Args:
+        app: Flask application
+        force: ignore the stored graph and rebuild every bundle (cold build)
+
+    Returns:
+        dict with:
+            cold: True when no usable state existed (or `force`)
+            seconds: wall time of the whole build
+            hashed: source files read this build
+            bundles: name -> {'output', 'status' ('compiled', 'up to date' or
+                'failed'), 'bytes', 'seconds', 'error'}
+    """
+    from app.assets import SCSS_BUNDLES
+
+    started = time.perf_counter()
+    static_dir = app.static_folder
+    path = state_path(app)
+    state = None if force else _load_state(path)
+    cold = state is None
+    state = state or {'version': _STATE_VERSION, 'files': {}, 'bundles': {}}
+    include_paths = list(app.config.get('LIBSASS_INCLUDES') or ())
+    options = {
+        'output_style': app.config.get('LIBSASS_STYLE') or 'nested',
+        'source_map': app.config.get('SCSS_SOURCE_MAPS', True),
+        'include_paths': include_paths,
+    }
+    graph = DependencyGraph(state['files'], include_paths)
+
+    results, stale = {}, {}
+    for name, (source, output) in SCSS_BUNDLES.items():
+        source = os.path.normpath(os.path.join(static_dir, source))
+        output = os.path.normpath(os.path.join(static_dir, output))
+        inputs = graph.inputs(source)
+        previous = state['bundles'].get(name)
+        results[name] = {'output': output, 'status': 'up to date', 'bytes': 0, 'seconds': 0.0, 'error': None}
+        unchanged = (not cold and previous is not None and previous['inputs'] == inputs
+                     and previous['options'] == options)
+        if unchanged and previous.get('error'):
+            # Same inputs fail the same way; don't recompile until a file changes
+            results[name].update(status='failed', error=previous['error'])
+        elif not unchanged or not os.path.exists(output):
+            stale[name] = (source, output, inputs)
+
+    workers = min(len(stale), app.config.get('SCSS_BUILD_WORKERS') or os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {name: pool.submit(compile_bundle, source, output, **options)
+                       for name, (source, output, _inputs) in stale.items()}
+            outcomes = {}
+            for name, future in futures.items():
+                try:
+                    outcomes[name] = future.result()
+                except Exception as e:   # sass.CompileError, OSError
+                    outcomes[name] = e
+    else:
+        outcomes = {}
+        for name, (source, output, _inputs) in stale.items():
+            try:
+                outcomes[name] = compile_bundle(source, output, **options)
+            except Exception as e:
+                outcomes[name] = e
+
+    for name, outcome in outcomes.items():
+        if isinstance(outcome, Exception):
+            error = str(outcome).strip()
+            state['bundles'][name] = {'inputs': stale[name][2], 'options': options, 'error': error}
+            results[name].update(status='failed', error=error)
+        else:
+            state['bundles'][name] = {'inputs': stale[name][2], 'options': options}
+            results[name].update(status='compiled', bytes=outcome[0], seconds=outcome[1])
+
+    state['files'] = graph.nodes
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+    return {'cold': cold, 'seconds': time.perf_counter() - started,
+            'hashed': graph.hashed, 'bundles': results}
+
+
+def watch_scss(app, interval=1.0, report=print):
+    """
+    Rebuild on every change until interrupted (development).
+
+    Each poll is a warm build that only stats the known inputs; `report` is
+    called with the result of the first build and of every build that read
+    a changed file.
+    """
+    report(build_scss(app))
+    while True:
+        time.sleep(interval)
+        result = build_scss(app)
+        if result['hashed']:
+            report(result)
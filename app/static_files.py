@@ -0,0 +1,439 @@
+"""
+Flask Sing App - Static File Serving
+
+Precompressed assets: `flask precompress-assets` writes .br and .gz siblings
+next to every compressible file under static/ (including the fingerprinted
+copies in static/dist/). The static endpoint then picks the best sibling the
+client accepts and sends it as-is with Content-Encoding and Vary headers, so
+Flask-Compress never compresses a static file per request.
+
+Static index: outside debug mode, StaticFilesMiddleware sits in front of
+the Flask app. At startup it scans static/ (and static/node_modules/, served
+at /node_modules/) into an index of path -> size, mtime, ETag, mimetype and
+Cache-Control, and answers GET/HEAD requests for indexed files itself:
+conditional requests (304), single byte ranges (206), precompressed
+variants, small files from memory and large ones through wsgi.file_wrapper
+(sendfile under gunicorn). Anything it does not know goes on to Flask.
+Files added or changed after startup are picked up on restart.
+
+Offload: with FILE_OFFLOAD set, static files, /node_modules/ and any
+download sent through send_offloadable_file() get an empty body plus an
+X-Sendfile (Apache, lighttpd) or X-Accel-Redirect (nginx) header, so the
+front-end server transfers the file. For nginx, map the internal URIs:
+
+    location /_offload/static/   { internal; alias /srv/sing-app-flask/static/; }
+    location /_offload/instance/ { internal; alias /srv/sing-app-flask/instance/; }
+
+The front-end server then handles ranges, validators and precompressed
+siblings (gzip_static / brotli_static); Content-Type and Cache-Control from
+the app are kept.
+"""
+import gzip
+import mimetypes
+import os
+import threading
+from datetime import datetime, timezone
+from urllib.parse import quote
+from zlib import adler32
+
+from flask import current_app, request, send_from_directory
+from werkzeug.http import (http_date, is_resource_modified, parse_accept_header,
+                           parse_if_range_header, parse_range_header)
+from werkzeug.security import safe_join
+from werkzeug.utils import get_content_type
+from werkzeug.wsgi import wrap_file
+
+try:
+    import brotli
+except ImportError:   # only .gz siblings are written
+    brotli = None
+
+# Text formats worth compressing; images, WOFF/WOFF2 fonts and archives already are
+PRECOMPRESS_EXTENSIONS = {'.css', '.js', '.mjs', '.map', '.json', '.svg', '.html', '.txt',
+                          '.xml', '.ttf', '.otf', '.eot'}
+# Preferred first when the client accepts both with equal quality
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+OFFLOAD_MODES = ('x-sendfile', 'x-accel-redirect')
+
+
+def _compress(encoding, data):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def precompress_static(app):
+    """
+    Write .br/.gz siblings for compressible static files; remove orphaned ones.
+
+    Siblings newer than their source are left alone, so re-runs only
+    compress what changed. A sibling is only kept when it is smaller than
+    the source.
+
+    Returns:
+        dict: counts of 'written', 'unchanged' and 'removed' files, plus
+        'bytes_in' (sources compressed this run) and 'bytes_out' (their siblings)
+    """
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+    encodings = [(name, suffix) for name, suffix in ENCODINGS if name != 'br' or brotli is not None]
+    stats = dict.fromkeys(('written', 'unchanged', 'removed', 'bytes_in', 'bytes_out'), 0)
+
+    for root, _dirs, files in os.walk(app.static_folder):
+        present = set(files)
+        for name in files:
+            path = os.path.join(root, name)
+            source, suffix = os.path.splitext(name)
+            if suffix in ('.br', '.gz'):
+                if os.path.splitext(source)[1] in PRECOMPRESS_EXTENSIONS and source not in present:
+                    os.remove(path)
+                    stats['removed'] += 1
+                continue
+            if suffix not in PRECOMPRESS_EXTENSIONS or os.path.getsize(path) < min_size:
+                continue
+
+            mtime = os.path.getmtime(path)
+            data = None
+            for encoding, sibling_suffix in encodings:
+                sibling = path + sibling_suffix
+                if os.path.exists(sibling) and os.path.getmtime(sibling) >= mtime:
+                    stats['unchanged'] += 1
+                    continue
+                if data is None:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                compressed = _compress(encoding, data)
+                if len(compressed) >= len(data):
+                    if os.path.exists(sibling):
+                        os.remove(sibling)
+                    continue
+                with open(sibling, 'wb') as f:
+                    f.write(compressed)
+                stats['written'] += 1
+                stats['bytes_in'] += len(data)
+                stats['bytes_out'] += len(compressed)
+    return stats
+
+
+def _choose_encoding(path):
+    """Return (encoding, sibling suffix) of the best precompressed variant the client accepts."""
+    accepted = request.accept_encodings
+    best, best_quality = None, 0
+    for encoding, suffix in ENCODINGS:
+        quality = accepted[encoding]
+        if quality > best_quality and os.path.isfile(path + suffix):
+            best, best_quality = (encoding, suffix), quality
+    return best
+
+
+def serve_static(filename):
+    """
+    Static endpoint that serves precompressed siblings when available.
+
+    Responses for files that have siblings are marked `skip_compression` so
+    Flask-Compress leaves them alone, including the uncompressed variant
+    sent to clients that accept neither encoding.
+    """
+    app = current_app
+    static_folder = app.static_folder
+    if app.config.get('FILE_OFFLOAD'):
+        return send_offloadable_file(static_folder, filename,
+                                     max_age=app.get_send_file_max_age(filename))
+    path = safe_join(static_folder, filename)
+    if path is None or not any(os.path.isfile(path + suffix) for _, suffix in ENCODINGS):
+        return app.send_static_file(filename)
+
+    chosen = _choose_encoding(path)
+    max_age = app.get_send_file_max_age(filename)
+    if chosen is None:
+        response = send_from_directory(static_folder, filename, max_age=max_age)
+    else:
+        encoding, suffix = chosen
+        response = send_from_directory(static_folder, filename + suffix, max_age=max_age,
+                                       mimetype=mimetypes.guess_type(filename)[0])
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.skip_compression = True
+    return response
+
+
+def offload_header(app, path):
+    """
+    Return the (header, value) that hands `path` to the front-end server, or None.
+
+    None means offloading is off, or (X-Accel-Redirect) that `path` is
+    outside every mapped directory.
+    """
+    mode = app.config.get('FILE_OFFLOAD')
+    if not mode:
+        return None
+    path = os.path.realpath(path)
+    if mode == 'x-sendfile':
+        return 'X-Sendfile', path
+    for root, uri in app.extensions['file_offload_locations']:
+        if path.startswith(root + os.sep):
+            return 'X-Accel-Redirect', quote(uri + os.path.relpath(path, root).replace(os.sep, '/'))
+    return None
+
+
+def send_offloadable_file(directory, filename, **kwargs):
+    """
+    send_from_directory() that lets the front-end server send the body when
+    FILE_OFFLOAD is set. Use it for file downloads (exports, attachments).
+
+    Args:
+        directory: Directory the file must be inside
+        filename: Path relative to `directory` (untrusted input is fine)
+        **kwargs: send_from_directory() options (mimetype, as_attachment,
+            download_name, max_age, ...)
+    """
+    app = current_app
+    path = safe_join(directory, filename)
+    header = offload_header(app, path) if path is not None and os.path.isfile(path) else None
+    if header is None:
+        return send_from_directory(directory, filename, **kwargs)
+
+    download_name = kwargs.get('download_name') or os.path.basename(path)
+    mimetype = kwargs.get('mimetype') or mimetypes.guess_type(download_name)[0] \
+        or 'application/octet-stream'
+    response = app.response_class(mimetype=mimetype)
+    response.headers[header[0]] = header[1]
+    if kwargs.get('as_attachment'):
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    max_age = kwargs.get('max_age')
+    if max_age:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    response.skip_compression = True   # the body is sent (and compressed) by the front-end server
+    return response
+
+
+def unversioned_cache_control(app):
+    """Cache-Control for static URLs that may change in place (not fingerprinted)."""
+    max_age = app.config.get('STATIC_UNVERSIONED_MAX_AGE', 0)
+    return f'public, max-age={max_age}' if max_age else 'public, no-cache'
+
+
+class _StaticFile:
+    """Index entry: everything needed to answer a request without touching the disk."""
+
+    __slots__ = ('path', 'size', 'etag', 'last_modified', 'mtime', 'content_type',
+                 'cache_control', 'variants', 'compressible', 'data')
+
+    def __init__(self, path, stat, content_type, cache_control, compressible=False):
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+        self.last_modified = http_date(self.mtime)
+        # Same ETag as send_file, so validators stay valid whichever layer serves the file
+        self.etag = f'"{stat.st_mtime}-{stat.st_size}-{adler32(path.encode()) & 0xFFFFFFFF}"'
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.variants = {}          # encoding -> _StaticFile of the .br/.gz sibling
+        self.compressible = compressible
+        self.data = None            # bytes once loaded into memory
+
+
+class StaticFilesMiddleware:
+    """
+    WSGI middleware serving indexed static files before Flask routing.
+
+    :param wsgi_app: the wrapped application (Flask's wsgi_app)
+    :param mounts: URL prefix -> directory, e.g. {'/static/': 'static'}
+    :param cache_control: callable(url_prefix, relative_path) -> Cache-Control value
+    :param memory_max_file_size: files up to this size are kept in memory after first use
+    :param memory_budget: total bytes of file data kept in memory
+    :param compress_min_size: compressible files this large without a precompressed
+        sibling are passed to Flask so Flask-Compress can compress them
+    :param offload: optional callable(path) -> (header, value) or None; when it
+        returns a header, the body is left to the front-end server
+    """
+
+    def __init__(self, wsgi_app, mounts, cache_control, memory_max_file_size=256 * 1024,
+                 memory_budget=32 * 1024 * 1024, compress_min_size=500, offload=None):
+        self.wsgi_app = wsgi_app
+        self.offload = offload
+        self.memory_max_file_size = memory_max_file_size
+        self.memory_budget = memory_budget
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self.index = {}
+        for prefix, directory in mounts.items():
+            self._scan(prefix, directory, cache_control, compress_min_size)
+
+    def _scan(self, prefix, directory, cache_control, compress_min_size):
+        if not os.path.isdir(directory):
+            return
+        for root, _dirs, files in os.walk(directory):
+            for name in files:
+                if name.endswith(('.br', '.gz')) and name[:-3] in files:
+                    continue   # precompressed sibling, attached to its source below
+                path = os.path.join(root, name)
+                rel_path = os.path.relpath(path, directory).replace(os.sep, '/')
+                stat = os.stat(path)
+                mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+                content_type = get_content_type(mimetype, 'utf-8')
+                entry = _StaticFile(path, stat, content_type, cache_control(prefix, rel_path),
+                                    os.path.splitext(name)[1] in PRECOMPRESS_EXTENSIONS
+                                    and stat.st_size >= compress_min_size)
+                for encoding, suffix in ENCODINGS:
+                    if name + suffix in files:
+                        entry.variants[encoding] = _StaticFile(
+                            path + suffix, os.stat(path + suffix), content_type, entry.cache_control)
+                self.index[prefix + rel_path] = entry
+
+    def __call__(self, environ, start_response):
+        entry = None
+        if environ['REQUEST_METHOD'] in ('GET', 'HEAD'):
+            entry = self.index.get(environ.get('PATH_INFO', ''))
+        if entry is None or (entry.compressible and not entry.variants and self.offload is None):
+            return self.wsgi_app(environ, start_response)
+        try:
+            return self._serve(entry, environ, start_response)
+        except FileNotFoundError:
+            # Deleted since startup: let Flask answer (404)
+            return self.wsgi_app(environ, start_response)
+
+    def _choose(self, entry, environ):
+        """Return (file to send, Content-Encoding or None)."""
+        if not entry.variants:
+            return entry, None
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING'))
+        best, best_quality = (entry, None), 0
+        for encoding, _suffix in ENCODINGS:
+            variant = entry.variants.get(encoding)
+            if variant is not None and accepted[encoding] > best_quality:
+                best, best_quality = (variant, encoding), accepted[encoding]
+        return best
+
+    def _serve(self, entry, environ, start_response):
+        header = self.offload(entry.path) if self.offload is not None else None
+        if header is not None:
+            # Validators, ranges and encodings are the front-end server's job
+            start_response('200 OK', [('Content-Type', entry.content_type),
+                                      ('Cache-Control', entry.cache_control),
+                                      ('Content-Length', '0'), header])
+            return []
+
+        selected, encoding = self._choose(entry, environ)
+        headers = [
+            ('Content-Type', selected.content_type),
+            ('ETag', selected.etag),
+            ('Last-Modified', selected.last_modified),
+            ('Cache-Control', selected.cache_control),
+            ('Accept-Ranges', 'bytes'),
+        ]
+        if entry.variants:
+            headers.append(('Vary', 'Accept-Encoding'))
+        if encoding is not None:
+            headers.append(('Content-Encoding', encoding))
+
+        if not is_resource_modified(environ, etag=selected.etag, last_modified=selected.mtime):
+            start_response('304 Not Modified', [h for h in headers if h[0] != 'Content-Type'])
+            return []
+
+        start, stop = 0, selected.size
+        status = '200 OK'
+        byte_range = parse_range_header(environ.get('HTTP_RANGE'))
+        if byte_range is not None and self._if_range_matches(environ, selected):
+            bounds = byte_range.range_for_length(selected.size)
+            if bounds is None:
+                start_response('416 Range Not Satisfiable',
+                               headers + [('Content-Range', f'bytes */{selected.size}'),
+                                          ('Content-Length', '0')])
+                return []
+            start, stop = bounds
+            status = '206 Partial Content'
+            headers.append(('Content-Range', f'bytes {start}-{stop - 1}/{selected.size}'))
+
+        headers.append(('Content-Length', str(stop - start)))
+        start_response(status, headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        data = self._load(selected)
+        if data is not None:
+            return [data[start:stop]]
+        f = open(selected.path, 'rb')
+        if start == 0 and stop == selected.size:
+            # Zero-copy under gunicorn (sendfile); chunked reads elsewhere
+            return wrap_file(environ, f)
+        f.seek(start)
+        return _read_range(f, stop - start)
+
+    @staticmethod
+    def _if_range_matches(environ, selected):
+        if_range = parse_if_range_header(environ.get('HTTP_IF_RANGE'))
+        if if_range.etag is not None:
+            return if_range.etag == selected.etag.strip('"')
+        if if_range.date is not None:
+            return selected.mtime <= if_range.date
+        return True
+
+    def _load(self, selected):
+        """Return the file's bytes if it is (or can now be) kept in memory, else None."""
+        if selected.data is not None or selected.size > self.memory_max_file_size:
+            return selected.data
+        with self._lock:
+            if selected.data is None and self._memory_used + selected.size <= self.memory_budget:
+                with open(selected.path, 'rb') as f:
+                    selected.data = f.read()
+                self._memory_used += selected.size
+        return selected.data
+
+
+def _read_range(f, length, chunk_size=64 * 1024):
+    try:
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def init_static_files(app):
+    """
+    Route the static endpoint through serve_static() when STATIC_PRECOMPRESSED
+    or FILE_OFFLOAD is on, and put StaticFilesMiddleware in front of the app
+    when STATIC_INDEX is on.
+    """
+    mode = app.config.get('FILE_OFFLOAD')
+    if mode and mode not in OFFLOAD_MODES:
+        raise ValueError(f'FILE_OFFLOAD must be one of {OFFLOAD_MODES} or empty, not {mode!r}')
+    prefix = app.config.get('FILE_OFFLOAD_ACCEL_PREFIX', '/_offload/').rstrip('/') + '/'
+    app.extensions['file_offload_locations'] = [
+        (os.path.realpath(app.static_folder), prefix + 'static/'),
+        (os.path.realpath(app.instance_path), prefix + 'instance/'),
+    ]
+    if mode:
+        app.logger.info('File offload: %s.', mode)
+
+    if (app.config.get('STATIC_PRECOMPRESSED', True) or mode) and app.has_static_folder:
+        app.view_functions['static'] = serve_static
+
+    if app.debug or not app.config.get('STATIC_INDEX', True) or not app.has_static_folder:
+        return
+    from app.assets import is_fingerprinted
+
+    static_prefix = app.static_url_path.rstrip('/') + '/'
+    unversioned = unversioned_cache_control(app)
+
+    def cache_control(prefix, rel_path):
+        if prefix == static_prefix and is_fingerprinted(app, rel_path):
+            return 'public, max-age=31536000, immutable'
+        return unversioned
+
+    app.wsgi_app = StaticFilesMiddleware(
+        app.wsgi_app,
+        {
+            static_prefix: app.static_folder,
+            '/node_modules/': os.path.join(app.static_folder, 'node_modules'),
+        },
+        cache_control,
+        memory_max_file_size=app.config.get('STATIC_MEMORY_MAX_FILE_SIZE', 256 * 1024),
+        memory_budget=app.config.get('STATIC_MEMORY_BUDGET', 32 * 1024 * 1024),
+        compress_min_size=app.config.get('COMPRESS_MIN_SIZE', 500),
+        offload=(lambda path: offload_header(app, path)) if mode else None,
+    )
+    app.logger.info('Static file index: %d files.', len(app.wsgi_app.index))
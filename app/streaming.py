@@ -0,0 +1,65 @@
+"""
+Flask Sing App - Streamed Page Rendering
+
+render_template() returns only after the whole page is rendered, so the
+time to first byte of a heavy page is its full render time. render_page()
+renders through flask.stream_template() instead: everything up to and
+including </head> (critical CSS, stylesheet and preload links) is sent as
+soon as it is rendered, so the browser fetches assets while the body is
+still rendering. The rest goes out in STREAM_CHUNK_SIZE pieces.
+
+Streamed responses go through the app's Compress subclass, which flushes
+the compressor after every chunk (see app.extensions), and through
+add_cache_headers like any other page.
+
+Headers, including the session cookie, are sent before the body renders,
+so anything the template would write to the session must happen first:
+render_page() reads the flashed messages up front (the template gets the
+same list), and creates the CSRF token when asked to with `csrf=True`.
+An exception while the body renders truncates the page instead of
+returning a 500.
+"""
+from flask import current_app, get_flashed_messages, render_template, stream_template
+
+
+def _chunks(events, chunk_size):
+    """Join template events into chunks; the first ends right after </head>."""
+    buffer, size, head_sent = [], 0, False
+    for event in events:
+        buffer.append(event)
+        size += len(event)
+        if (not head_sent and '</head>' in event) or size >= chunk_size:
+            head_sent = head_sent or '</head>' in event
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def render_page(template_name, csrf=False, **context):
+    """
+    Render a page template, streamed when STREAM_TEMPLATES is on.
+
+    Args:
+        template_name: Template to render
+        csrf: The page renders CSRF tokens (form_csrf()); the token is created
+            before the headers are sent so its session cookie is included
+        **context: Template context
+
+    Returns:
+        Response (streamed) or str (STREAM_TEMPLATES off)
+    """
+    app = current_app._get_current_object()
+    if not app.config.get('STREAM_TEMPLATES', True):
+        return render_template(template_name, **context)
+
+    get_flashed_messages()   # pops the flashes from the session now; the template reads the cached list
+    if csrf:
+        from flask_wtf.csrf import generate_csrf
+        generate_csrf()
+
+    response = app.response_class(_chunks(stream_template(template_name, **context),
+                                          app.config.get('STREAM_CHUNK_SIZE', 16384)),
+                                  mimetype='text/html')
+    response.flush_chunks = True   # compress chunk by chunk (app.extensions.Compress)
+    return response
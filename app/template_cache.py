@@ -0,0 +1,80 @@
+"""
+Flask Sing App - Template Bytecode Cache
+
+Jinja compiles a template to Python source and then to bytecode the first
+time each process renders it. With a FileSystemBytecodeCache on the app's
+environment the bytecode is written to TEMPLATE_CACHE_DIR
+(instance/jinja-cache/ by default) and shared by every worker and every
+restart. Each entry stores a checksum of the template source and is only
+used while the source still matches, so an edited template is recompiled
+and its entry replaced; entries are written atomically (temp file + rename).
+
+`flask precompile-templates` fills the cache at build time. With
+TEMPLATE_EAGER_LOAD every template is also loaded into the environment
+while the app is created, before the worker accepts traffic (with
+gunicorn's preload_app, once in the master for all workers).
+"""
+import os
+import time
+
+from jinja2 import FileSystemBytecodeCache, TemplateError
+
+CACHE_DIR_NAME = 'jinja-cache'
+TEMPLATE_EXTENSIONS = ('.html', '.txt', '.xml')
+
+
+def cache_dir(app):
+    return app.config.get('TEMPLATE_CACHE_DIR') or os.path.join(app.instance_path, CACHE_DIR_NAME)
+
+
+def precompile_templates(app):
+    """
+    Compile every template of the app and its blueprints, through the bytecode cache.
+
+    Templates also stay loaded in the environment's in-memory cache, so
+    calling this during startup is the eager-load mode.
+
+    Returns:
+        dict with templates, compiled (cache misses, now written), cached
+        (cache hits), errors ({name: message}) and seconds
+    """
+    started = time.perf_counter()
+    env = app.jinja_env
+    bytecode_cache = env.bytecode_cache
+    stats = {'templates': 0, 'compiled': 0, 'cached': 0, 'errors': {}, 'seconds': 0.0}
+    for name in env.list_templates(filter_func=lambda n: n.endswith(TEMPLATE_EXTENSIONS)):
+        stats['templates'] += 1
+        try:
+            if bytecode_cache is not None:
+                source, filename, _uptodate = env.loader.get_source(env, name)
+                hit = bytecode_cache.get_bucket(env, name, filename, source).code is not None
+                stats['cached' if hit else 'compiled'] += 1
+            else:
+                stats['compiled'] += 1
+            env.get_template(name)
+        except TemplateError as e:
+            stats['errors'][name] = str(e)
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+
+def init_template_cache(app):
+    """Attach the filesystem bytecode cache to the app's Jinja environment (TEMPLATE_BYTECODE_CACHE)."""
+    if not app.config.get('TEMPLATE_BYTECODE_CACHE', True):
+        return
+    directory = cache_dir(app)
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError as e:   # read-only filesystem: compile per process as before
+        app.logger.warning('Template bytecode cache disabled, %s is not writable: %s', directory, e)
+        return
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+
+def eager_load_templates(app):
+    """Compile and load every template now instead of on its first request (TEMPLATE_EAGER_LOAD)."""
+    stats = precompile_templates(app)
+    for name, error in stats['errors'].items():
+        app.logger.error('Template %s failed to compile: %s', name, error)
+    app.logger.info('Loaded %d templates in %.2fs (%d from bytecode cache).',
+                    stats['templates'], stats['seconds'], stats['cached'])
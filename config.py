@@ -23,6 +23,14 @@ class Config:
 
     # Asset configuration
     ASSETS_DEBUG = False
+    # `flask compile-assets`: source maps next to the CSS, pool size, dependency graph file
+    SCSS_SOURCE_MAPS = os.environ.get('SCSS_SOURCE_MAPS', 'true').lower() == 'true'
+    SCSS_BUILD_WORKERS = int(os.environ.get('SCSS_BUILD_WORKERS', os.cpu_count() or 1))
+    SCSS_BUILD_STATE = os.environ.get('SCSS_BUILD_STATE', '')   # default: instance/scss-build.json
+
+    # Serve static example pages from `flask prerender` snapshots (re-run it on every deploy)
+    PRERENDER_EXAMPLES = os.environ.get('PRERENDER_EXAMPLES', 'false').lower() == 'true'
+    PRERENDER_DIR = os.environ.get('PRERENDER_DIR', '')   # default: instance/prerender
 
     # --- NEW: Authentication toggles ---
     # false = demo mode (no login required); true = enforce login on all pages
@@ -42,6 +50,26 @@ class Config:
     CACHE_TYPE = os.environ.get('CACHE_TYPE', 'SimpleCache')
     CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT', 300))  # seconds
     CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', '')
+    # Multi-worker without Redis: CACHE_TYPE=app.cache_backends.MmapCache shares one
+    # memory-mapped file between all workers on a host (size = SLOTS x SLOT_SIZE bytes)
+    CACHE_MMAP_PATH = os.environ.get('CACHE_MMAP_PATH', '')   # default: instance/mmap-cache.bin
+    CACHE_MMAP_SLOTS = int(os.environ.get('CACHE_MMAP_SLOTS', 1024))
+    CACHE_MMAP_SLOT_SIZE = int(os.environ.get('CACHE_MMAP_SLOT_SIZE', 65536))  # bytes, largest entry
+    CACHE_MMAP_WAYS = int(os.environ.get('CACHE_MMAP_WAYS', 8))
+    # Two tiers: CACHE_TYPE=app.cache_backends.LayeredCache keeps hot keys in a per-worker
+    # LRU in front of CACHE_L2_TYPE (any Flask-Caching backend, e.g. RedisCache)
+    CACHE_L2_TYPE = os.environ.get('CACHE_L2_TYPE', 'RedisCache')
+    CACHE_DIR = os.environ.get('CACHE_DIR')   # FileSystemCache directory (offline L2 stand-in)
+    CACHE_L1_MAX_ENTRIES = int(os.environ.get('CACHE_L1_MAX_ENTRIES', 1024))
+    CACHE_L1_TIMEOUT = int(os.environ.get('CACHE_L1_TIMEOUT', 5))  # seconds, max L1 staleness
+    CACHE_L1_SYNC_INTERVAL = float(os.environ.get('CACHE_L1_SYNC_INTERVAL', 1.0))  # seconds
+    # Key prefixes kept out of L1 (read and deleted in L2 only, so changes apply in every worker at once)
+    CACHE_L1_EXCLUDE_PREFIXES = os.environ.get('CACHE_L1_EXCLUDE_PREFIXES', 'user-identity/')
+    # Seconds the {% cache %} fragments of base.html (sidebar, asset tags) are kept
+    LAYOUT_FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('LAYOUT_FRAGMENT_CACHE_TIMEOUT', 3600))
+    # Flask-Login user_loader identity cache (entries are also dropped on every user update/delete).
+    # Only used with a cache shared by all workers; off with SimpleCache/NullCache
+    USER_IDENTITY_CACHE_TIMEOUT = int(os.environ.get('USER_IDENTITY_CACHE_TIMEOUT', 60))  # seconds
 
     # --- NEW: Compression ---
     COMPRESS_MIMETYPES = [
@@ -53,6 +81,75 @@ class Config:
     ]
     COMPRESS_LEVEL = 6       # gzip compression level (1=fast, 9=best)
     COMPRESS_MIN_SIZE = 500  # bytes — skip compression for tiny responses
+    # Streamed responses (render_page, exports): gzip included, zstd can't be flushed per chunk here
+    COMPRESS_ALGORITHM_STREAMING = ['br', 'gzip', 'deflate']
+    # Stream heavy pages (app.streaming.render_page): <head> first, then STREAM_CHUNK_SIZE pieces
+    STREAM_TEMPLATES = os.environ.get('STREAM_TEMPLATES', 'true').lower() == 'true'
+    STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 16384))  # characters
+    # Serve .br/.gz siblings written by `flask precompress-assets` instead of compressing static files
+    STATIC_PRECOMPRESSED = os.environ.get('STATIC_PRECOMPRESSED', 'true').lower() == 'true'
+    # Serve /static/ and /node_modules/ from an index built at startup, before Flask routing
+    # (ignored in debug). Small files are kept in memory after first use, up to the budget.
+    STATIC_INDEX = os.environ.get('STATIC_INDEX', 'true').lower() == 'true'
+    STATIC_MEMORY_MAX_FILE_SIZE = int(os.environ.get('STATIC_MEMORY_MAX_FILE_SIZE', 256 * 1024))  # bytes
+    STATIC_MEMORY_BUDGET = int(os.environ.get('STATIC_MEMORY_BUDGET', 32 * 1024 * 1024))  # bytes
+    # Responsive images (flask build-images): <picture> srcsets from static/variants/index.json
+    RESPONSIVE_IMAGES = os.environ.get('RESPONSIVE_IMAGES', 'true').lower() == 'true'
+    IMAGE_VARIANT_WIDTHS = os.environ.get('IMAGE_VARIANT_WIDTHS', '96,320,640,1280')
+    IMAGE_VARIANT_FORMATS = os.environ.get('IMAGE_VARIANT_FORMATS', 'avif,webp')
+    IMAGE_VARIANT_QUALITY = int(os.environ.get('IMAGE_VARIANT_QUALITY', 70))
+    # Purged per-page-group CSS with inlined critical rules (flask purge-css)
+    CSS_PURGE = os.environ.get('CSS_PURGE', 'true').lower() == 'true'
+    CRITICAL_CSS_FOLD_BYTES = int(os.environ.get('CRITICAL_CSS_FOLD_BYTES', 4096))  # of <main> markup
+    # Classes only ever built from template variables (alert-{{ category }})
+    CSS_PURGE_SAFELIST = os.environ.get('CSS_PURGE_SAFELIST', 'alert-success,alert-danger,alert-warning,alert-info')
+    # Jinja bytecode cache shared by workers and restarts ('' dir = instance/jinja-cache/;
+    # warm it with flask precompile-templates); eager load compiles all templates at startup
+    TEMPLATE_BYTECODE_CACHE = os.environ.get('TEMPLATE_BYTECODE_CACHE', 'true').lower() == 'true'
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR', '')
+    TEMPLATE_EAGER_LOAD = os.environ.get('TEMPLATE_EAGER_LOAD', 'false').lower() == 'true'
+    # Build-time setting, read only by flask fingerprint-assets: publish the font subsets of
+    # flask subset-fonts (off = full fonts). Changing it does nothing at runtime; re-run
+    # fingerprint-assets and precompress-assets, then restart the app
+    FONT_SUBSETTING = os.environ.get('FONT_SUBSETTING', 'true').lower() == 'true'
+    # Characters text fonts always keep, for user content (Basic Latin, Latin-1, punctuation)
+    FONT_SUBSET_TEXT_UNICODES = os.environ.get('FONT_SUBSET_TEXT_UNICODES',
+                                               'U+0020-007E,U+00A0-00FF,U+2013-2014,U+2018-201E,U+2022,U+2026,U+20AC')
+    # Let the front-end server send static files and downloads: '' (off), 'x-sendfile'
+    # (Apache/lighttpd) or 'x-accel-redirect' (nginx, internal locations under the prefix)
+    FILE_OFFLOAD = os.environ.get('FILE_OFFLOAD', '').lower()
+    FILE_OFFLOAD_ACCEL_PREFIX = os.environ.get('FILE_OFFLOAD_ACCEL_PREFIX', '/_offload/')
+    # Cache-Control max-age for static URLs that are not fingerprinted (0 = always revalidate)
+    STATIC_UNVERSIONED_MAX_AGE = int(os.environ.get('STATIC_UNVERSIONED_MAX_AGE', 0))
+
+    # --- Static asset bundles and fingerprinting (flask build-bundles, flask fingerprint-assets) ---
+    # Resolve url_for('static') through static/dist/manifest.json when it exists (ignored in debug)
+    ASSET_FINGERPRINTING = os.environ.get('ASSET_FINGERPRINTING', 'true').lower() == 'true'
+    # Manifest generations whose hashed files stay in static/dist/ for workers and caches still using them
+    ASSET_RETENTION_GENERATIONS = int(os.environ.get('ASSET_RETENTION_GENERATIONS', 3))
+    # Load only the JS/CSS libraries a page declares (false = every library on every page)
+    ASSET_PAGE_BUNDLES = os.environ.get('ASSET_PAGE_BUNDLES', 'true').lower() == 'true'
+
+    # --- Bulk user import (POST /api/users/bulk) ---
+    # Rows per duplicate-check query / executemany INSERT / commit
+    BULK_IMPORT_BATCH_SIZE = int(os.environ.get('BULK_IMPORT_BATCH_SIZE', 500))
+    # Largest JSON-array body (parsed in memory); NDJSON bodies are streamed and not capped here
+    BULK_IMPORT_JSON_MAX_BYTES = int(os.environ.get('BULK_IMPORT_JSON_MAX_BYTES', 10 * 1024 * 1024))
+
+    # --- Password hashing (app/hashing.py) ---
+    # host    = at most PASSWORD_HASH_WORKERS hashes at once across all worker processes (default)
+    # process = per-process pool, for one multi-threaded server process
+    # inline  = hash in the request thread, unbounded
+    PASSWORD_HASH_BACKEND = os.environ.get('PASSWORD_HASH_BACKEND', 'host')
+    # werkzeug method string; older hashes are upgraded on the next login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # Hashes running at once: for the whole host (host backend) or the pool size (process)
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    # Callers allowed to wait for a slot (more get 503 at once); seconds they wait before a 503.
+    # A waiting sync worker serves nothing else: workers + queue stays below gunicorn's 2 x CPUs + 1
+    PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', os.cpu_count() or 1))
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5))
+    PASSWORD_HASH_SLOTS_FILE = os.environ.get('PASSWORD_HASH_SLOTS_FILE', '')   # default: instance/password-hash.slots
 
     # CSRF always enabled (Flask-WTF); only disabling in tests
     WTF_CSRF_ENABLED = True
@@ -94,6 +191,9 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    # Cheap hashes keep tests fast
+    PASSWORD_HASH_BACKEND = 'inline'
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
 
 
 # Configuration dictionary
@@ -0,0 +1,97 @@
+"""
+Flask Sing App - gunicorn Configuration
+
+gunicorn reads this file from the working directory:
+
+    gunicorn wsgi:app
+    gunicorn wsgi:app --config gunicorn.conf.py --workers 4
+
+With preload_app the master imports wsgi.py and runs create_app() once
+(extension setup, asset environments, blueprint imports, create_all() in
+demo mode, TEMPLATE_EAGER_LOAD) and forks the workers from it, so they
+start ready to serve and share the app's memory copy-on-write. Keeping it
+shared takes two hooks:
+
+- gc: every collection writes to the header of each object it visits, which
+  copies the page into the worker. The garbage collector stays off while
+  the app loads (no freed holes in the shared pages) and gc.freeze() moves
+  everything loaded so far out of its reach before each fork.
+- post_fork: the workers drop the database connections they inherited from
+  the master (app.extensions.reset_after_fork).
+
+A preloaded app is not re-imported on `kill -HUP`; restart the master to
+deploy new code. GUNICORN_PRELOAD=false starts each worker with its own
+create_app() as before.
+"""
+import gc
+import math
+import os
+import time
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def _cpu_quota():
+    """CPUs granted by the cgroup CPU quota (v2 cpu.max, v1 cfs_quota_us), or None if unlimited."""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+    except (OSError, ValueError):
+        try:
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                quota = f.read().strip()
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = f.read().strip()
+        except OSError:   # not Linux, or no cpu controller
+            return None
+    if quota in ('max', '-1'):
+        return None
+    return max(1, math.ceil(int(quota) / int(period)))
+
+
+def _cpu_count():
+    """
+    CPUs this process may use: its affinity mask (taskset, cpuset), capped by
+    the cgroup CPU quota that container runtimes set for --cpus / CPU limits.
+    """
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:   # macOS, Windows
+        count = os.cpu_count() or 1
+    return min(count, _cpu_quota() or count)
+
+
+# WEB_CONCURRENCY (set by Heroku/Render from the dyno size) or --workers wins;
+# otherwise gunicorn's (2 x CPUs) + 1 for sync workers, which spend part of
+# each request waiting on the database
+workers = int(os.environ.get('WEB_CONCURRENCY', 0)) or _cpu_count() * 2 + 1
+
+if preload_app:
+    # Until the fork: objects allocated and freed while the app loads would leave holes
+    # in pages the workers share, and a collection would touch every object header
+    gc.disable()
+
+
+def pre_fork(server, worker):
+    """Master, before each fork: freeze the loaded app out of the garbage collector's reach."""
+    if preload_app:
+        gc.freeze()
+        gc.enable()   # new objects in the master are collected as usual
+    worker.forked_at = time.perf_counter()
+
+
+def post_fork(server, worker):
+    """Worker, right after the fork: start a fresh database pool."""
+    app = server.app.callable   # None without preload_app; the worker loads its own app
+    if app is not None:
+        from app.extensions import reset_after_fork
+        reset_after_fork(app)
+
+
+def post_worker_init(worker):
+    """Worker, app loaded: log how long it took from the fork to serving."""
+    worker.log.info('Worker %s ready in %.3fs (preload_app=%s)', worker.pid,
+                    time.perf_counter() - worker.forked_at, preload_app)
@@ -0,0 +1,34 @@
+"""add updated_at and version to users
+
+Revision ID: 3b9c1e7d4a52
+Revises: ef36d2af462f
+Create Date: 2026-10-18 09:14:22.518304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9c1e7d4a52'
+down_revision = 'ef36d2af462f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False,
+                                      server_default=sa.text('1')))
+        batch_op.create_index(batch_op.f('ix_users_updated_at'), ['updated_at'], unique=False)
+
+    # Existing rows have never been updated; start them at their creation time
+    op.execute('UPDATE users SET updated_at = created_at')
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_updated_at'))
+        batch_op.drop_column('version')
+        batch_op.drop_column('updated_at')
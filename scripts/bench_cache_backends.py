@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+Cache Backend Benchmark
+
+Compares SimpleCache, FileSystemCache, MmapCache and LayeredCache (an
+in-process LRU in front of FileSystemCache, standing in for Redis) from
+app/cache_backends.py:
+
+1. Single-process get/set throughput for a small value and a ~30 KB value
+   (about the size of a cached dashboard page).
+2. Multi-process hit rate: several forked "workers" each look up the same
+   keys, computing and storing a value on every miss, like N gunicorn workers
+   sharing @cache.cached views. Per-process caches miss once per worker.
+
+Usage:
+    python scripts/bench_cache_backends.py
+    python scripts/bench_cache_backends.py --ops 20000 --workers 4 --keys 50
+"""
+
+import argparse
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from flask_caching.backends import FileSystemCache, SimpleCache  # noqa: E402
+
+from app.cache_backends import LayeredCache, MmapCache  # noqa: E402
+
+
+def make_backends(tmp: Path) -> dict:
+    return {
+        'SimpleCache': lambda: SimpleCache(threshold=10_000),
+        'FileSystemCache': lambda: FileSystemCache(str(tmp / 'fs'), threshold=10_000),
+        'MmapCache': lambda: MmapCache(str(tmp / 'mmap.cache'), slots=4096, slot_size=65536),
+        'Layered+FS': lambda: LayeredCache(FileSystemCache(str(tmp / 'l2'), threshold=10_000)),
+    }
+
+
+def throughput(cache, value, ops: int) -> tuple:
+    """Return (sets/s, gets/s) for `ops` operations over 100 keys."""
+    started = time.perf_counter()
+    for i in range(ops):
+        cache.set(f'key{i % 100}', value)
+    set_rate = ops / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for i in range(ops):
+        cache.get(f'key{i % 100}')
+    get_rate = ops / (time.perf_counter() - started)
+    return set_rate, get_rate
+
+
+def worker(index: int, factory, keys: int, rounds: int, misses):
+    # Stagger start-up so this measures sharing, not a simultaneous-miss stampede
+    time.sleep(index * keys * 0.003)
+    cache = factory()
+    for _ in range(rounds):
+        for k in range(keys):
+            if cache.get(f'page{k}') is None:
+                time.sleep(0.002)   # "render" the page
+                cache.set(f'page{k}', 'x' * 30_000)
+                with misses.get_lock():
+                    misses.value += 1
+
+
+def shared_misses(factory, workers: int, keys: int, rounds: int) -> int:
+    """Run `workers` forked processes over the same keys; return total misses."""
+    ctx = multiprocessing.get_context('fork')
+    misses = ctx.Value('i', 0)
+    procs = [ctx.Process(target=worker, args=(index, factory, keys, rounds, misses))
+             for index in range(workers)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    return misses.value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ops', type=int, default=10_000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--keys', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix='bench-cache-'))
+    try:
+        backends = make_backends(tmp)
+
+        print(f"Single process, {args.ops:,} ops each")
+        print(f"{'backend':<16} {'value':>6} {'sets/s':>10} {'gets/s':>10}")
+        print("-" * 45)
+        for name, factory in backends.items():
+            for label, value in (('64 B', 'x' * 64), ('30 KB', 'x' * 30_000)):
+                cache = factory()
+                cache.clear()
+                set_rate, get_rate = throughput(cache, value, args.ops)
+                print(f"{name:<16} {label:>6} {set_rate:>10,.0f} {get_rate:>10,.0f}")
+                if isinstance(cache, LayeredCache):
+                    stats = cache.stats()
+                    print(f"{'':<16} {'':>6} L1 {stats['l1_hits']:,} hits / {stats['l1_misses']:,} misses, "
+                          f"L2 {stats['l2_hits']:,} hits / {stats['l2_misses']:,} misses")
+
+        print()
+        print(f"{args.workers} worker processes x {args.keys} keys x {args.rounds} rounds "
+              f"(ideal: {args.keys} misses)")
+        print(f"{'backend':<16} {'misses':>8} {'hit rate':>9}")
+        print("-" * 35)
+        lookups = args.workers * args.keys * args.rounds
+        for name, factory in backends.items():
+            factory().clear()
+            misses = shared_misses(factory, args.workers, args.keys, args.rounds)
+            print(f"{name:<16} {misses:>8} {1 - misses / lookups:>9.1%}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
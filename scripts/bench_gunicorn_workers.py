@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+gunicorn Worker Memory and Cold-Start Benchmark
+
+Starts gunicorn with gunicorn.conf.py twice, GUNICORN_PRELOAD=false (every
+worker runs create_app()) and GUNICORN_PRELOAD=true (the master does, the
+workers are forked from it), and reports for each:
+
+- ready s:   launch until every worker logged "ready" (cold start)
+- worker s:  mean time from a worker's fork to serving (post_worker_init)
+- RSS / PSS / private per worker, from /proc/<pid>/smaps_rollup after
+  --requests page loads (PSS splits shared pages between the processes
+  that share them; private is what each extra worker really costs)
+
+Linux only (/proc).
+
+Usage:
+    python scripts/bench_gunicorn_workers.py
+    python scripts/bench_gunicorn_workers.py --workers 4 --requests 400
+"""
+
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+PAGES = ('/', '/admin/users', '/examples/dashboard/analytics', '/examples/tables/dynamic',
+         '/examples/dashboard/widgets', '/auth/login')
+READY = re.compile(r'Worker (\d+) ready in ([\d.]+)s')
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _memory_kb(pid):
+    """{'Rss', 'Pss', 'Private'} in kB from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[name] = int(value.split()[0])
+    return {'Rss': fields['Rss'], 'Pss': fields['Pss'],
+            'Private': fields['Private_Clean'] + fields['Private_Dirty']}
+
+
+def run(preload: bool, args) -> dict:
+    port = _free_port()
+    log = tempfile.NamedTemporaryFile(mode='w+', suffix='.log')
+    env = {**os.environ, 'GUNICORN_PRELOAD': str(preload).lower(), 'GUNICORN_ACCESS_LOG': '',
+           'PORT': str(port), 'FLASK_CONFIG': args.config}
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'wsgi:app', '--config', 'gunicorn.conf.py',
+         '--workers', str(args.workers), '--error-logfile', log.name],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        ready = {}
+        while len(ready) < args.workers:
+            if server.poll() is not None or time.perf_counter() - started > 120:
+                log.seek(0)
+                raise RuntimeError('gunicorn did not start:\n' + log.read()[-2000:])
+            time.sleep(0.02)
+            log.seek(0)
+            ready = {int(pid): float(seconds) for pid, seconds in READY.findall(log.read())}
+        startup = time.perf_counter() - started
+
+        for i in range(args.requests):
+            url = f'http://127.0.0.1:{port}{PAGES[i % len(PAGES)]}'
+            with urllib.request.urlopen(url) as response:
+                response.read()
+
+        memory = [_memory_kb(pid) for pid in ready]
+        return {
+            'startup': startup,
+            'worker': sum(ready.values()) / len(ready),
+            'master': _memory_kb(server.pid)['Rss'],
+            **{key: sum(m[key] for m in memory) / len(memory) for key in ('Rss', 'Pss', 'Private')},
+        }
+    finally:
+        server.terminate()
+        server.wait()
+        log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--requests', type=int, default=120, help='page loads before measuring memory')
+    parser.add_argument('--config', default='demo', help='FLASK_CONFIG for the app')
+    args = parser.parse_args()
+
+    print(f"{'preload':<8} {'ready s':>8} {'worker s':>9} {'RSS MB':>7} {'PSS MB':>7} "
+          f"{'private MB':>11} {'master MB':>10}   (per worker, {args.workers} workers)")
+    for preload in (False, True):
+        r = run(preload, args)
+        print(f"{str(preload).lower():<8} {r['startup']:>8.2f} {r['worker']:>9.3f} {r['Rss'] / 1024:>7.1f} "
+              f"{r['Pss'] / 1024:>7.1f} {r['Private'] / 1024:>11.1f} {r['master'] / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
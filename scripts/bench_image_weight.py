@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Image Weight Report
+
+Renders every argument-free GET page and adds up the image bytes a browser
+downloads for it: the original JPEG/PNG files (RESPONSIVE_IMAGES off)
+against the variant it picks from the responsive_image() srcsets.
+
+The pick follows the browser rules for a given viewport and device pixel
+ratio: the first <source> whose format is accepted, the slot width from
+`sizes`, and the narrowest candidate at least slot width x DPR wide.
+Lazy images are counted too, as if the visitor scrolled the whole page.
+
+Run `flask build-images` first; without variants both columns are equal.
+
+Usage:
+    python scripts/bench_image_weight.py
+    python scripts/bench_image_weight.py --viewport 390 --dpr 3 --accept webp
+"""
+
+import argparse
+import re
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+
+PICTURE = re.compile(r'<picture[^>]*>(.*?)</picture>', re.S)
+SOURCE = re.compile(r'<source type="image/(\w+)" srcset="([^"]+)" sizes="([^"]+)">')
+IMG_SRC = re.compile(r'<img[^>]+src="(/static/[^"]+)"')
+MEDIA = re.compile(r'\(min-width:\s*(\d+)px\)\s*(.+)')
+
+
+def slot_width(sizes: str, viewport: int) -> float:
+    """Evaluate a `sizes` attribute (min-width conditions, px and vw lengths)."""
+    for candidate in sizes.split(','):
+        candidate = candidate.strip()
+        match = MEDIA.match(candidate)
+        if match:
+            if viewport < int(match.group(1)):
+                continue
+            candidate = match.group(2).strip()
+        if candidate.endswith('vw'):
+            return viewport * float(candidate[:-2]) / 100
+        return float(candidate.rstrip('px'))
+    return viewport
+
+
+def pick(srcset: str, width: float) -> str:
+    candidates = sorted((int(w.rstrip('w')), url) for url, w in (c.split() for c in srcset.split(',')))
+    return next((url for w, url in candidates if w >= width), candidates[-1][1])
+
+
+def page_images(html: str, viewport: int, dpr: float, accept) -> list:
+    urls = []
+    for picture in PICTURE.findall(html):
+        chosen = None
+        for fmt, srcset, sizes in SOURCE.findall(picture):
+            if fmt in accept:
+                chosen = pick(srcset, slot_width(sizes, viewport) * dpr)
+                break
+        urls.append(chosen or IMG_SRC.search(picture).group(1))
+    urls.extend(IMG_SRC.findall(PICTURE.sub('', html)))
+    return [url for url in urls if not url.endswith('.svg')]
+
+
+def measure(responsive: bool, args) -> dict:
+    """Return {endpoint: (images, bytes)} for pages with images."""
+    app = create_app('testing')
+    if not responsive:
+        app.extensions['image_variants'] = {}
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    sizes = {}
+    results = {}
+    for rule in app.url_map.iter_rules():
+        if rule.arguments or 'GET' not in rule.methods or rule.endpoint == 'static':
+            continue
+        response = client.get(rule.rule)
+        if response.status_code != 200 or response.mimetype != 'text/html':
+            continue
+        urls = page_images(response.get_data(as_text=True), args.viewport, args.dpr, args.accept)
+        if not urls:
+            continue
+        for url in urls:
+            if url not in sizes:
+                sizes[url] = len(client.get(url).data)
+        results[rule.endpoint] = (len(urls), sum(sizes[url] for url in urls))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--viewport', type=int, default=1280, help='CSS pixels')
+    parser.add_argument('--dpr', type=float, default=1.0, help='device pixel ratio')
+    parser.add_argument('--accept', default='avif,webp', help='image formats the browser accepts')
+    args = parser.parse_args()
+    args.accept = set(args.accept.split(','))
+
+    before = measure(False, args)
+    after = measure(True, args)
+
+    print(f"viewport {args.viewport}px, DPR {args.dpr:g}, accepts {', '.join(sorted(args.accept))}")
+    print(f"{'page':<36} {'images':>6} {'before KB':>10} {'after KB':>10} {'saved':>7}")
+    print("-" * 73)
+    total_before = total_after = 0
+    for endpoint in sorted(before):
+        count, b = before[endpoint]
+        a = after.get(endpoint, before[endpoint])[1]
+        total_before += b
+        total_after += a
+        print(f"{endpoint:<36} {count:>6} {b / 1024:>10,.0f} {a / 1024:>10,.0f} {1 - a / b:>6.0%}")
+    print("-" * 73)
+    if total_before:
+        print(f"{'total':<36} {'':>6} {total_before / 1024:>10,.0f} {total_after / 1024:>10,.0f} "
+              f"{1 - total_after / total_before:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+"""
+Login Throughput Benchmark
+
+Starts gunicorn with gunicorn.conf.py (sync workers, 2 x CPUs + 1 unless
+--workers is given) once per hashing backend (app/hashing.py) and hammers
+POST /auth/login from --clients threads while another thread polls
+/health, as a login burst against the real deployment would.
+
+Reports successful logins per second, 503 (shed) responses, the /health
+latency seen during the burst and the peak number of processes in the
+gunicorn tree (master + workers + any hashing pools).
+
+Linux only (/proc).
+
+Usage:
+    python scripts/bench_login_throughput.py
+    python scripts/bench_login_throughput.py --clients 16 --seconds 10 --method scrypt:32768:8:1
+"""
+
+import argparse
+import http.client
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_CSRF = re.compile(rb'name="csrf_token"[^>]*value="([^"]+)"')
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _tree_size(root_pid):
+    """Processes in the tree under `root_pid`, itself included."""
+    children = {}
+    for name in os.listdir('/proc'):
+        if name.isdigit():
+            try:
+                with open(f'/proc/{name}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(name))
+    pending, count = [root_pid], 0
+    while pending:
+        count += 1
+        pending.extend(children.get(pending.pop(), []))
+    return count
+
+
+def _login(port):
+    """GET the form for a session and CSRF token, then POST it. Returns the POST status."""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        conn.request('GET', '/auth/login')
+        response = conn.getresponse()
+        token = _CSRF.search(response.read()).group(1).decode()
+        cookie = response.getheader('Set-Cookie', '').split(';', 1)[0]
+        body = urllib.parse.urlencode({'username': 'bench', 'password': 'bench-password',
+                                       'csrf_token': token})
+        conn.request('POST', '/auth/login', body, {
+            'Content-Type': 'application/x-www-form-urlencoded', 'Cookie': cookie})
+        response = conn.getresponse()
+        response.read()
+        if response.status == 302 and '/auth/login' in response.getheader('Location', ''):
+            return 401   # redirected back to the form: wrong password
+        return response.status
+    finally:
+        conn.close()
+
+
+def _seed(env):
+    """Create the database and the bench user with the configured hash method."""
+    subprocess.run([sys.executable, '-c', (
+        'from app import create_app\n'
+        'from app.extensions import db\n'
+        'from app.models import User\n'
+        'app = create_app("demo")\n'
+        'with app.app_context():\n'
+        '    user = User(username="bench", email="bench@example.com")\n'
+        '    user.set_password("bench-password")\n'
+        '    db.session.add(user)\n'
+        '    db.session.commit()\n'
+    )], cwd=PROJECT_ROOT, env=env, check=True, capture_output=True)
+
+
+def run(backend: str, args) -> dict:
+    """Run one login burst against gunicorn using `backend`."""
+    workdir = tempfile.mkdtemp(prefix='bench-login-')
+    port = _free_port()
+    env = {**os.environ, 'FLASK_CONFIG': 'demo', 'PORT': str(port), 'GUNICORN_ACCESS_LOG': '',
+           'DATABASE_URL': f'sqlite:///{workdir}/bench.db', 'PRERENDER_EXAMPLES': 'false',
+           'PASSWORD_HASH_BACKEND': backend, 'PASSWORD_HASH_METHOD': args.method,
+           'PASSWORD_HASH_SLOTS_FILE': f'{workdir}/password-hash.slots'}
+    for name, value in (('PASSWORD_HASH_WORKERS', args.hash_workers),
+                        ('PASSWORD_HASH_QUEUE_SIZE', args.queue_size),
+                        ('PASSWORD_HASH_QUEUE_TIMEOUT', args.queue_timeout)):
+        if value is not None:
+            env[name] = str(value)
+    if args.workers:
+        env['WEB_CONCURRENCY'] = str(args.workers)
+    _seed(env)
+
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'wsgi:app', '--config', 'gunicorn.conf.py'],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(600):
+            try:
+                with socket.create_connection(('127.0.0.1', port), timeout=1):
+                    break
+            except OSError:
+                time.sleep(0.05)
+        _login(port)   # first login in some worker: warms the hashing path
+
+        deadline = time.perf_counter() + args.seconds
+        counts = {'ok': 0, 'shed': 0, 'other': 0}
+        health_ms, peak = [], [0]
+        lock = threading.Lock()
+
+        def login_loop():
+            while time.perf_counter() < deadline:
+                status = _login(port)
+                with lock:
+                    counts['ok' if status == 302 else 'shed' if status == 503 else 'other'] += 1
+
+        def health_loop():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                conn.request('GET', '/health')
+                conn.getresponse().read()
+                conn.close()
+                health_ms.append((time.perf_counter() - started) * 1000)
+                peak[0] = max(peak[0], _tree_size(server.pid))
+                time.sleep(0.05)
+
+        threads = [threading.Thread(target=login_loop) for _ in range(args.clients)]
+        threads.append(threading.Thread(target=health_loop))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    health_ms.sort()
+    return {
+        'logins_per_s': counts['ok'] / args.seconds,
+        'shed': counts['shed'],
+        'other': counts['other'],
+        'health_p50': statistics.median(health_ms),
+        'health_p95': health_ms[int(len(health_ms) * 0.95) - 1] if len(health_ms) > 1 else health_ms[0],
+        'processes': peak[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=12, help='concurrent login clients')
+    parser.add_argument('--seconds', type=float, default=8)
+    parser.add_argument('--method', default='scrypt:32768:8:1')
+    parser.add_argument('--workers', type=int, default=0, help='gunicorn workers (default: gunicorn.conf.py)')
+    parser.add_argument('--hash-workers', type=int, help='PASSWORD_HASH_WORKERS (default: config.py)')
+    parser.add_argument('--queue-size', type=int, help='PASSWORD_HASH_QUEUE_SIZE (default: config.py)')
+    parser.add_argument('--queue-timeout', type=float, help='PASSWORD_HASH_QUEUE_TIMEOUT (default: config.py)')
+    parser.add_argument('--backends', default='process,host')
+    args = parser.parse_args()
+
+    print(f"{args.clients} login clients for {args.seconds}s against gunicorn.conf.py, "
+          f"method={args.method}")
+    print()
+    print(f"{'backend':<8} {'logins/s':>9} {'503s':>6} {'/health p50 ms':>15} {'p95 ms':>8} {'processes':>10}")
+    print("-" * 61)
+    for backend in args.backends.split(','):
+        result = run(backend, args)
+        print(f"{backend:<8} {result['logins_per_s']:>9.1f} {result['shed']:>6} "
+              f"{result['health_p50']:>15.2f} {result['health_p95']:>8.2f} {result['processes']:>10}")
+        if result['other']:
+            print(f"         ({result['other']} unexpected responses)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Page Weight Report
+
+Renders every argument-free GET page and adds up the JavaScript and CSS it
+references from /static/, raw and gzip-compressed (what a first-time visitor
+transfers). Compares loading every library on every page (ASSET_PAGE_BUNDLES
+off, the old layout) with per-page bundles.
+
+Run `flask build-bundles` first; without built bundles the per-page column
+counts the individual library files (same bytes, more requests).
+
+Usage:
+    python scripts/bench_page_weight.py
+    python scripts/bench_page_weight.py --only examples.
+"""
+
+import argparse
+import gzip
+import re
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+
+ASSET_URL = re.compile(r'<(?:script[^>]+src|link[^>]+href)="(/static/[^"]+\.(?:js|css))"')
+
+
+def page_urls(app, only):
+    for rule in app.url_map.iter_rules():
+        if rule.arguments or 'GET' not in rule.methods or rule.endpoint == 'static':
+            continue
+        if only and not rule.endpoint.startswith(only):
+            continue
+        yield rule.endpoint, rule.rule
+
+
+def measure(page_bundles: bool, only: str) -> dict:
+    """Return {endpoint: (requests, raw bytes, gzip bytes)} for HTML pages."""
+    app = create_app('testing')
+    app.config['ASSET_PAGE_BUNDLES'] = page_bundles
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    sizes = {}
+    results = {}
+    for endpoint, url in sorted(page_urls(app, only)):
+        response = client.get(url)
+        if response.status_code != 200 or response.mimetype != 'text/html':
+            continue
+        assets = ASSET_URL.findall(response.get_data(as_text=True))
+        if not assets:
+            continue
+        raw = packed = 0
+        for asset in assets:
+            if asset not in sizes:
+                data = client.get(asset).data
+                sizes[asset] = (len(data), len(gzip.compress(data, compresslevel=6)))
+            raw += sizes[asset][0]
+            packed += sizes[asset][1]
+        results[endpoint] = (len(assets), raw, packed)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', default='', help='endpoint prefix, e.g. examples.')
+    args = parser.parse_args()
+
+    before = measure(False, args.only)
+    after = measure(True, args.only)
+
+    print(f"{'page':<36} {'before (req / KB / gz KB)':>26} {'after (req / KB / gz KB)':>26}")
+    print("-" * 90)
+    totals = [0, 0, 0, 0]
+    for endpoint in sorted(after):
+        b, a = before[endpoint], after[endpoint]
+        print(f"{endpoint:<36} {b[0]:>6} {b[1] / 1024:>9,.0f} {b[2] / 1024:>9,.0f} "
+              f"{a[0]:>6} {a[1] / 1024:>9,.0f} {a[2] / 1024:>9,.0f}")
+        totals[0] += b[1]
+        totals[1] += b[2]
+        totals[2] += a[1]
+        totals[3] += a[2]
+    pages = len(after) or 1
+    print("-" * 90)
+    print(f"{'average per page':<36} {'':>6} {totals[0] / pages / 1024:>9,.0f} "
+          f"{totals[1] / pages / 1024:>9,.0f} {'':>6} {totals[2] / pages / 1024:>9,.0f} "
+          f"{totals[3] / pages / 1024:>9,.0f}")
+
+
+if __name__ == "__main__":
+    main()
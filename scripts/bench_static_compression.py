@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Static Compression CPU Benchmark
+
+Measures worker CPU time per static request for a browser-like client
+(Accept-Encoding: gzip, deflate, br) in two modes:
+
+1. runtime       — Flask-Compress compresses every response
+                   (STATIC_PRECOMPRESSED=false, STATIC_INDEX=false)
+2. precompressed — the .br/.gz sibling written by `flask precompress-assets` is sent
+                   as-is, by StaticFilesMiddleware as in production
+
+Run `flask precompress-assets` first; files without siblings fall back to
+runtime compression in both modes.
+
+Usage:
+    python scripts/bench_static_compression.py
+    python scripts/bench_static_compression.py --requests 200 --encoding gzip
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import create_app  # noqa: E402
+from config import config  # noqa: E402
+
+# Flask's own static view behind Flask-Compress; StaticFilesMiddleware would
+# otherwise answer /static/ before the view is reached
+config['bench-runtime-compression'] = type('BenchRuntimeCompressionConfig', (config['testing'],), {
+    'STATIC_PRECOMPRESSED': False,
+    'STATIC_INDEX': False,
+})
+
+FILES = [
+    'css/application.min.css',
+    'css/singapp-custom.css',
+    'js/vendor/jquery.min.js',
+    'js/vendor/bootstrap.min.js',
+    'js/vendor/chart.umd.min.js',
+]
+
+
+def measure(precompressed: bool, filename: str, requests: int, encoding: str) -> tuple:
+    """Return (CPU ms per request, bytes sent, Content-Encoding) for one file."""
+    app = create_app('testing' if precompressed else 'bench-runtime-compression')
+    client = app.test_client()
+    headers = {'Accept-Encoding': encoding}
+    url = f'/static/{filename}'
+    response = client.get(url, headers=headers)   # warm up
+    started = time.process_time()
+    for _ in range(requests):
+        response = client.get(url, headers=headers)
+        response.get_data()
+    cpu_ms = (time.process_time() - started) / requests * 1000
+    return cpu_ms, len(response.get_data()), response.headers.get('Content-Encoding', 'identity')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--encoding', default='gzip, deflate, br', help='Accept-Encoding header')
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests per file, Accept-Encoding: {args.encoding}")
+    print(f"{'file':<28} {'runtime CPU/req':>16} {'bytes':>9} {'precompressed CPU/req':>22} {'bytes':>9}")
+    print("-" * 88)
+    for filename in FILES:
+        run_cpu, run_bytes, run_enc = measure(False, filename, args.requests, args.encoding)
+        pre_cpu, pre_bytes, pre_enc = measure(True, filename, args.requests, args.encoding)
+        print(f"{filename:<28} {run_cpu:>9.2f} ms {run_enc:>4} {run_bytes:>9,} "
+              f"{pre_cpu:>15.2f} ms {pre_enc:>4} {pre_bytes:>9,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Static Serving Benchmark
+
+Compares the time per static request through Flask routing (send_from_directory
+plus after_request hooks) with StaticFilesMiddleware (app/static_files.py),
+which answers from an index built at startup:
+
+- a small file (served from memory by the middleware)
+- application.min.css with Accept-Encoding: br (precompressed sibling)
+- a conditional request answered with 304
+- a byte range of a large image
+
+Usage:
+    python scripts/bench_static_serving.py
+    python scripts/bench_static_serving.py --requests 5000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import create_app  # noqa: E402
+
+CASES = [
+    ('small file', '/static/css/singapp-custom.css', {}),
+    ('css, br', '/static/css/application.min.css', {'Accept-Encoding': 'br'}),
+    ('304', '/static/css/application.min.css', {'Accept-Encoding': 'br', 'If-None-Match': None}),
+    ('range 64 KB', '/static/demo/img/pictures/1.jpg', {'Range': 'bytes=0-65535'}),
+]
+
+
+def per_request_ms(client, url, headers, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get(url, headers=headers).close()
+    return (time.perf_counter() - started) / requests * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    indexed = create_app('testing')
+    flask_only = create_app('testing')
+    flask_only.wsgi_app = flask_only.wsgi_app.wsgi_app   # unwrap StaticFilesMiddleware
+
+    print(f"{args.requests} requests per case (test client, includes its own overhead)")
+    print(f"{'case':<14} {'Flask route':>12} {'middleware':>12} {'speed-up':>9}")
+    print("-" * 50)
+    for label, url, headers in CASES:
+        results = []
+        for app in (flask_only, indexed):
+            client = app.test_client()
+            case_headers = dict(headers)
+            if 'If-None-Match' in case_headers:
+                case_headers['If-None-Match'] = client.get(
+                    url, headers={'Accept-Encoding': 'br'}).headers['ETag']
+            client.get(url, headers=case_headers).close()   # warm up (loads memory cache)
+            results.append(per_request_ms(client, url, case_headers, args.requests))
+        print(f"{label:<14} {results[0]:>9.3f} ms {results[1]:>9.3f} ms {results[0] / results[1]:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
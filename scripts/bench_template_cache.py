@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Template Cold-Start Benchmark
+
+Starts a fresh interpreter per mode, as a new worker would, and times its
+first request to every argument-free GET page (each page's first render
+compiles the templates it uses):
+
+- off:   no bytecode cache, every worker compiles every template
+- cold:  bytecode cache enabled but empty (first deploy)
+- warm:  cache filled by `flask precompile-templates`
+- eager: warm cache plus TEMPLATE_EAGER_LOAD (compiled while the app is
+         created; that time is reported as startup)
+
+Usage:
+    python scripts/bench_template_cache.py
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+WORKER = r'''
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+started = time.perf_counter()
+from app import create_app
+from app.extensions import db
+app = create_app('testing')
+startup = time.perf_counter() - started
+with app.app_context():
+    db.create_all()
+client = app.test_client()
+pages = [rule.rule for rule in app.url_map.iter_rules()
+         if not rule.arguments and 'GET' in rule.methods and rule.endpoint != 'static']
+first = 0.0
+for path in pages:
+    t = time.perf_counter()
+    client.get(path).close()
+    first += time.perf_counter() - t
+print(json.dumps({'startup': startup, 'first': first, 'pages': len(pages)}))
+'''
+
+
+def run(env: dict) -> dict:
+    output = subprocess.run([sys.executable, '-c', WORKER, str(PROJECT_ROOT)], env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3, help='runs per mode (best is reported)')
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix='jinja-cache-')
+    base_env = {**os.environ, 'TEMPLATE_CACHE_DIR': cache_dir, 'PRERENDER_EXAMPLES': 'false'}
+    modes = [
+        ('off', {'TEMPLATE_BYTECODE_CACHE': 'false'}, True),
+        ('cold', {}, True),
+        ('warm', {}, False),
+        ('eager', {'TEMPLATE_EAGER_LOAD': 'true'}, False),
+    ]
+    print(f"{'mode':<8} {'startup s':>10} {'first requests s':>17} {'total s':>8}")
+    try:
+        for name, extra, clear in modes:
+            best = None
+            for _ in range(args.repeat):
+                if clear:
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+                result = run({**base_env, **extra})
+                if best is None or result['startup'] + result['first'] < best['startup'] + best['first']:
+                    best = result
+            print(f"{name:<8} {best['startup']:>10.2f} {best['first']:>17.2f} "
+                  f"{best['startup'] + best['first']:>8.2f}   ({best['pages']} pages)")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Users API Pagination Benchmark
+
+Compares GET /api/users latency on page 1 and page 10,000 for the
+offset mode (?page=&per_page=) and the cursor mode (?after=&limit=).
+
+An in-memory SQLite database is seeded with enough users to reach the
+deepest page, so the script needs no external services.
+
+Usage:
+    python scripts/bench_users_pagination.py
+    python scripts/bench_users_pagination.py --per-page 20 --deep-page 10000 --repeat 20
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.api.routes import _encode_cursor  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import User  # noqa: E402
+
+
+def seed_users(count: int, batch_size: int = 10_000):
+    """Insert `count` active users using executemany batches."""
+    for start in range(0, count, batch_size):
+        rows = [
+            {'username': f'user{i}', 'email': f'user{i}@example.com',
+             'password_hash': 'x', 'is_active': True, 'is_admin': False}
+            for i in range(start, min(start + batch_size, count))
+        ]
+        db.session.execute(insert(User), rows)
+    db.session.commit()
+
+
+def time_request(client, url: str, repeat: int) -> float:
+    """Return the median latency of GET `url` in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, (url, response.status_code)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--per-page', type=int, default=20)
+    parser.add_argument('--deep-page', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    total_users = args.per_page * args.deep_page
+
+    with app.app_context():
+        db.create_all()
+        print(f"Seeding {total_users:,} users...")
+        seed_users(total_users)
+
+        # The cursor for page N is the id of the last user on page N - 1
+        deep_after_id = db.session.execute(
+            db.select(User.id).order_by(User.id)
+            .offset(args.per_page * (args.deep_page - 1) - 1).limit(1)
+        ).scalar_one()
+
+    client = app.test_client()
+    cases = [
+        ('offset', 1, f'/api/users?page=1&per_page={args.per_page}'),
+        ('offset', args.deep_page, f'/api/users?page={args.deep_page}&per_page={args.per_page}'),
+        ('cursor', 1, f'/api/users?after=&limit={args.per_page}'),
+        ('cursor', args.deep_page,
+         f'/api/users?after={_encode_cursor(deep_after_id)}&limit={args.per_page}'),
+    ]
+
+    print()
+    print(f"{'mode':<8} {'page':>8} {'median ms':>10}")
+    print("-" * 28)
+    for mode, page, url in cases:
+        print(f"{mode:<8} {page:>8,} {time_request(client, url, args.repeat):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+File Offload Header Check
+
+Runs the app with FILE_OFFLOAD set to each mode behind a small stand-in for
+the front-end server: it resolves X-Sendfile / X-Accel-Redirect responses to
+a file on disk the way Apache or nginx would (X-Accel-Redirect through the
+same internal locations as the nginx sample in app/static_files.py) and
+checks that:
+
+- the app response has an empty body and exactly one offload header
+- the header resolves to the requested file
+- Content-Type and Cache-Control match what the app sends without offloading
+- an export-style download keeps its Content-Disposition
+
+Covers static files (middleware index and Flask route), fingerprinted files
+when a manifest exists, /node_modules/ when installed, and a download from
+the instance folder. Exits non-zero when any check fails.
+
+Usage:
+    python scripts/check_offload.py
+    python scripts/check_offload.py --mode x-accel-redirect
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+from urllib.parse import unquote
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import create_app  # noqa: E402
+from config import config  # noqa: E402
+from app.static_files import OFFLOAD_MODES, send_offloadable_file  # noqa: E402
+
+EXPORT_NAME = 'check-offload-export.csv'
+
+
+class FrontEndServer:
+    """Resolve offload headers to (path, body) like the front-end server would."""
+
+    def __init__(self, app):
+        self.locations = app.extensions['file_offload_locations']
+
+    def resolve(self, response):
+        if 'X-Sendfile' in response.headers:
+            path = response.headers['X-Sendfile']
+        elif 'X-Accel-Redirect' in response.headers:
+            uri = unquote(response.headers['X-Accel-Redirect'])
+            path = None
+            for root, prefix in self.locations:
+                if uri.startswith(prefix):
+                    path = os.path.join(root, *uri[len(prefix):].split('/'))
+            if path is None:
+                return None, None
+        else:
+            return None, None
+        with open(path, 'rb') as f:
+            return os.path.realpath(path), f.read()
+
+
+def urls(app):
+    """Yield (label, url, file on disk) for the requests to check."""
+    static = app.static_folder
+    yield 'static css (index)', '/static/css/singapp-custom.css', os.path.join(static, 'css', 'singapp-custom.css')
+    yield 'static image', '/static/demo/img/pictures/1.jpg', os.path.join(static, 'demo', 'img', 'pictures', '1.jpg')
+    manifest = app.extensions.get('asset_manifest') or {}
+    if 'css/application.min.css' in manifest:
+        hashed = manifest['css/application.min.css']
+        yield 'fingerprinted css', f'/static/{hashed}', os.path.join(static, *hashed.split('/'))
+    node_modules = os.path.join(static, 'node_modules')
+    for dirpath, _dirnames, filenames in os.walk(node_modules):
+        if filenames:
+            path = os.path.join(dirpath, filenames[0])
+            rel = os.path.relpath(path, node_modules).replace(os.sep, '/')
+            yield 'node_modules', f'/node_modules/{rel}', path
+            break
+
+
+def check_mode(mode: str) -> list:
+    """Return a list of failure messages for one FILE_OFFLOAD mode."""
+    failures = []
+    config['check-offload'] = type('CheckOffloadConfig', (config['testing'],), {'FILE_OFFLOAD': mode})
+    app = create_app('check-offload')
+    reference_client = create_app('testing').test_client()
+    front_end = FrontEndServer(app)
+
+    os.makedirs(app.instance_path, exist_ok=True)
+    export = tempfile.NamedTemporaryFile('w', suffix='.csv', dir=app.instance_path, delete=False)
+    export.write('id,name\n1,demo\n')
+    export.close()
+
+    @app.route('/_check_offload/export')
+    def export_download():
+        return send_offloadable_file(app.instance_path, os.path.basename(export.name),
+                                     as_attachment=True, download_name=EXPORT_NAME)
+
+    try:
+        client = app.test_client()
+        cases = list(urls(app)) + [('export download', '/_check_offload/export', export.name)]
+        for label, url, expected_path in cases:
+            response = client.get(url)
+            body = response.get_data()
+            offload_headers = [name for name in ('X-Sendfile', 'X-Accel-Redirect') if name in response.headers]
+            path, data = front_end.resolve(response)
+            problems = []
+            if response.status_code != 200:
+                problems.append(f'status {response.status_code}')
+            if body:
+                problems.append(f'{len(body)} B body sent by the app')
+            if len(offload_headers) != 1:
+                problems.append(f'offload headers {offload_headers}')
+            if path != os.path.realpath(expected_path):
+                problems.append(f'resolved to {path}')
+            elif data != Path(expected_path).read_bytes():
+                problems.append('resolved file content differs')
+            if url.startswith('/_check_offload/'):
+                if EXPORT_NAME not in response.headers.get('Content-Disposition', ''):
+                    problems.append('missing Content-Disposition')
+            else:
+                reference = reference_client.get(url)
+                for header in ('Content-Type', 'Cache-Control'):
+                    if response.headers.get(header) != reference.headers.get(header):
+                        problems.append(f'{header} {response.headers.get(header)!r} != '
+                                        f'{reference.headers.get(header)!r}')
+                reference.close()
+            status = 'ok' if not problems else 'FAIL ' + '; '.join(problems)
+            value = response.headers.get(offload_headers[0]) if offload_headers else '-'
+            print(f"  {label:<20} {value:<60} {status}")
+            failures.extend(f'{mode} {label}: {p}' for p in problems)
+    finally:
+        os.remove(export.name)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mode', choices=OFFLOAD_MODES, help='check one mode only')
+    args = parser.parse_args()
+
+    failures = []
+    for mode in [args.mode] if args.mode else OFFLOAD_MODES:
+        print(f"FILE_OFFLOAD={mode}")
+        failures += check_mode(mode)
+    print(f"{len(failures)} failure(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,14 +5,39 @@ Stage Assets Script
 Copies static assets and templates from sing-app-html5-master to the Flask project.
 This script should be run from the project root directory.
 
+Staging is incremental: every staged file is recorded in a manifest
+(.stage-manifest.json in the Flask project) with the source's size, mtime
+and SHA-256 and the staged copy's mtime. On the next run a file whose source size and mtime are
+unchanged is skipped without reading it, a file whose content hash still
+matches is left alone, and only changed files are copied (in a thread
+pool, keeping the source mtime). Files staged by an earlier run whose
+source has since been deleted are removed; files the manifest never
+staged (built bundles, .br/.gz siblings, extra vendor libraries) are
+never touched.
+
+Vendor libraries are downloaded concurrently and checked against pinned
+Subresource Integrity hashes; a download that does not match is discarded.
+--mirror replaces the CDN hosts with a local mirror laid out as
+<mirror>/<host>/<path>, e.g. file:///srv/mirror/code.jquery.com/jquery-3.6.4.min.js.
+
 Usage:
     python scripts/stage_assets.py
+    python scripts/stage_assets.py --source ../sing-app-html5-master --dest .
+    python scripts/stage_assets.py --mirror file:///srv/mirror --workers 8
 """
 
+import argparse
+import base64
+import hashlib
+import json
 import os
 import shutil
+import tempfile
+import time
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import urlsplit
 
 # Project paths
 PROJECT_ROOT = Path(__file__).parent.parent.parent
@@ -21,6 +46,7 @@ SING_APP_DIST = PROJECT_ROOT / "sing-app-html5-master" / "dist"
 FLASK_APP = PROJECT_ROOT / "sing-app-flask"
 STATIC_DIR = FLASK_APP / "static"
 TEMPLATES_DIR = FLASK_APP / "templates"
+MANIFEST_NAME = ".stage-manifest.json"
 
 # Asset mappings: (source_subdir, destination_subdir)
 # None means copy to root of destination
@@ -35,12 +61,16 @@ ASSET_MAPPINGS = [
     ("pages", None),       # pages/ -> templates/
     ("partials", None),    # partials/ -> templates/partials/
 ]
+TEMPLATE_GROUPS = ("pages", "partials")
 
-# Vendor JS libraries to download (URL, destination_rel_path)
+# Vendor JS libraries to download (URL, destination_rel_path, Subresource Integrity hash)
 VENDOR_DOWNLOADS = [
-    ("https://code.jquery.com/jquery-3.6.4.min.js", "js/vendor/jquery.min.js"),
-    ("https://unpkg.com/popper.js@1.16.1/dist/umd/popper.min.js", "js/vendor/popper.min.js"),
-    ("https://cdn.jsdelivr.net/npm/bootstrap@4.6.2/dist/js/bootstrap.min.js", "js/vendor/bootstrap.min.js"),
+    ("https://code.jquery.com/jquery-3.6.4.min.js", "js/vendor/jquery.min.js",
+     "sha256-oP6HI9z1XaZNBrJURtCoUT5SUnxFr8s3BzRl+cbzUq8="),
+    ("https://unpkg.com/popper.js@1.16.1/dist/umd/popper.min.js", "js/vendor/popper.min.js",
+     "sha384-9/reFTGAW83EW2RDu2S0VKaIzap3H66lZH81PoYlFhbGU+6BZp6G7niu735Sk7lN"),
+    ("https://cdn.jsdelivr.net/npm/bootstrap@4.6.2/dist/js/bootstrap.min.js", "js/vendor/bootstrap.min.js",
+     "sha384-+sLIOodYLS7CIrQpBjl+C7nPvqq+FbNUBDunl/OZv93DB7Ln/533i8e/mZXLi/P+"),
 ]
 
 # Prebuilt CSS files to copy from dist/
@@ -50,132 +80,242 @@ PREBUILT_CSS = [
 ]
 
 
+def display(path: Path) -> str:
+    """Path relative to PROJECT_ROOT when possible, for messages."""
+    try:
+        return str(path.relative_to(PROJECT_ROOT))
+    except ValueError:
+        return str(path)
+
+
 def ensure_dir(path: Path):
     """Ensure directory exists."""
     path.mkdir(parents=True, exist_ok=True)
-    print(f"  Created: {path.relative_to(PROJECT_ROOT)}")
+    print(f"  Created: {display(path)}")
 
 
-def copy_tree(src: Path, dst: Path, verbose: bool = True):
-    """Copy entire directory tree, overwriting existing files."""
-    if not src.exists():
-        print(f"  WARNING: Source not found: {src.relative_to(PROJECT_ROOT)}")
-        return False
-    
-    # Remove destination if exists (for clean copy)
-    if dst.exists():
-        shutil.rmtree(dst)
-    
-    # Copy tree
-    shutil.copytree(src, dst)
-    if verbose:
-        print(f"  Copied: {src.relative_to(PROJECT_ROOT)} -> {dst.relative_to(PROJECT_ROOT)}")
-    return True
-
-
-def copy_file(src: Path, dst: Path, verbose: bool = True):
-    """Copy a single file."""
-    if not src.exists():
-        print(f"  WARNING: Source not found: {src}")
-        return False
-    
-    # Ensure destination directory exists
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def integrity_matches(data: bytes, integrity: str) -> bool:
+    """Check `data` against an SRI string such as 'sha384-<base64>'."""
+    algorithm, _, expected = integrity.partition("-")
+    return base64.b64encode(hashlib.new(algorithm, data).digest()).decode() == expected
+
+
+def load_manifest(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path: Path, manifest: dict):
+    """Write the manifest atomically (a crash never leaves half a file)."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def sync_file(src: Path, dst: Path, entry) -> tuple:
+    """
+    Bring `dst` up to date with `src`.
+
+    Returns:
+        tuple: (action: 'unchanged' | 'copied', manifest entry, bytes copied)
+    """
+    st = src.stat()
+    try:
+        dst_st = dst.stat()
+    except FileNotFoundError:
+        dst_st = None
+    if (entry and dst_st and entry["size"] == st.st_size == dst_st.st_size
+            and entry["mtime_ns"] == st.st_mtime_ns and entry["dst_mtime_ns"] == dst_st.st_mtime_ns):
+        return "unchanged", entry, 0
+    sha256 = file_sha256(src)
+    new_entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha256}
+    if dst_st and dst_st.st_size == st.st_size and file_sha256(dst) == sha256:
+        # Touched but identical: keep dst (and its mtime) as it is
+        new_entry["dst_mtime_ns"] = dst_st.st_mtime_ns
+        return "unchanged", new_entry, 0
     dst.parent.mkdir(parents=True, exist_ok=True)
-    
-    shutil.copy2(src, dst)
-    if verbose:
-        print(f"  Copied: {src.relative_to(PROJECT_ROOT)} -> {dst.relative_to(PROJECT_ROOT)}")
-    return True
+    tmp = dst.with_name(dst.name + ".staging")
+    shutil.copy2(src, tmp)   # copy2 keeps the source mtime
+    os.replace(tmp, dst)
+    new_entry["dst_mtime_ns"] = dst.stat().st_mtime_ns
+    return "copied", new_entry, st.st_size
+
+
+def sync_files(pairs, manifest: dict, workers: int) -> dict:
+    """
+    Sync (src, dst, key) pairs in a thread pool and update `manifest` in place.
 
+    Returns:
+        dict: counts per action plus 'bytes' copied
+    """
+    stats = {"copied": 0, "unchanged": 0, "failed": 0, "bytes": 0}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {key: pool.submit(sync_file, src, dst, manifest.get(key)) for src, dst, key in pairs}
+        for key, future in futures.items():
+            try:
+                action, entry, copied = future.result()
+            except OSError as e:
+                print(f"  FAILED: {key} — {e}")
+                stats["failed"] += 1
+                continue
+            manifest[key] = entry
+            stats[action] += 1
+            stats["bytes"] += copied
+    return stats
 
-def download_file(url: str, dst: Path, verbose: bool = True):
-    """Download a file from URL."""
+
+def tree_pairs(src: Path, dst: Path, dest_root: Path):
+    """Yield (source file, destination file, manifest key) for a directory tree."""
+    for dirpath, _dirnames, filenames in os.walk(src):
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            target = dst / path.relative_to(src)
+            yield path, target, target.relative_to(dest_root).as_posix()
+
+
+def remove_orphans(manifest: dict, staged: set, prefixes, dest_root: Path) -> int:
+    """Delete files an earlier run staged under `prefixes` whose source is gone."""
+    removed = 0
+    for key in sorted(manifest):
+        if key in staged or not key.startswith(tuple(prefixes)):
+            continue
+        path = dest_root / key
+        if path.exists():
+            path.unlink()
+            removed += 1
+            print(f"  Removed orphan: {key}")
+        del manifest[key]
+    return removed
+
+
+def download_file(url: str, dst: Path, integrity: str, mirror: str = "", refresh: bool = False):
+    """
+    Download a file from URL (or its --mirror copy) and verify its integrity hash.
+
+    Returns:
+        str: status message; starts with 'FAILED' on error
+    """
     # Ensure destination directory exists
     dst.parent.mkdir(parents=True, exist_ok=True)
-    
+
     if dst.exists():
-        if verbose:
-            print(f"  Exists (skip): {dst.relative_to(PROJECT_ROOT)}")
-        return True
-    
+        if integrity_matches(dst.read_bytes(), integrity):
+            return f"Exists (skip): {dst.name}"
+        if not refresh:
+            return (f"Exists (skip): {dst.name} — differs from the pinned hash, "
+                    f"use --refresh-vendor to re-fetch")
+
+    if mirror:
+        parts = urlsplit(url)
+        url = f"{mirror.rstrip('/')}/{parts.netloc}{parts.path}"
     try:
-        if verbose:
-            print(f"  Downloading: {dst.name}...")
-        urllib.request.urlretrieve(url, dst)
-        size_kb = dst.stat().st_size // 1024
-        if verbose:
-            print(f"  OK: {dst.name} ({size_kb} KB)")
-        return True
+        with urllib.request.urlopen(url, timeout=60) as response:
+            data = response.read()
     except Exception as e:
-        print(f"  FAILED: {dst.name} — {e}")
-        print(f"    Manual download URL: {url}")
-        return False
+        return f"FAILED: {dst.name} — {e}\n    Manual download URL: {url}"
+    if not integrity_matches(data, integrity):
+        return f"FAILED: {dst.name} — integrity check failed ({integrity.split('-')[0]} mismatch)"
+    tmp = dst.with_name(dst.name + ".staging")
+    tmp.write_bytes(data)
+    os.replace(tmp, dst)
+    return f"OK: {dst.name} ({len(data) // 1024} KB)"
 
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--source", type=Path, default=SING_APP_SRC.parent,
+                        help="sing-app-html5-master checkout (with src/ and dist/)")
+    parser.add_argument("--dest", type=Path, default=FLASK_APP, help="Flask project root")
+    parser.add_argument("--mirror", default="", help="base URL of a vendor mirror, e.g. file:///srv/mirror")
+    parser.add_argument("--workers", type=int, default=min(32, (os.cpu_count() or 1) * 4))
+    parser.add_argument("--refresh-vendor", action="store_true",
+                        help="re-download vendor files whose local copy differs from the pinned hash")
+    args = parser.parse_args()
+
+    source_src = args.source / "src"
+    source_dist = args.source / "dist"
+    static_dir = args.dest / "static"
+    templates_dir = args.dest / "templates"
+    manifest_path = args.dest / MANIFEST_NAME
+    started = time.perf_counter()
+
     print("=" * 60)
     print("Staging Assets from Sing App HTML5")
     print("=" * 60)
     print(f"Project root: {PROJECT_ROOT}")
-    print(f"Source: {SING_APP_SRC}")
+    print(f"Source: {source_src}")
     print()
-    
+
     # Ensure destination directories exist
     print("Creating destination directories...")
-    ensure_dir(STATIC_DIR)
-    ensure_dir(TEMPLATES_DIR)
-    ensure_dir(TEMPLATES_DIR / "partials")
-    ensure_dir(STATIC_DIR / "js" / "vendor")
+    ensure_dir(static_dir)
+    ensure_dir(templates_dir)
+    ensure_dir(templates_dir / "partials")
+    ensure_dir(static_dir / "js" / "vendor")
     print()
-    
-    # === Task 1: Copy pre-built CSS from dist/css/ ===
-    print("Copying pre-built CSS from dist/css/...")
-    css_src_dir = SING_APP_DIST / "css"
-    css_dst_dir = STATIC_DIR / "css"
-    ensure_dir(css_dst_dir)
-    
+
+    manifest = load_manifest(manifest_path)
+    pairs = []
+    prefixes = []
+
+    # === Task 1: Pre-built CSS from dist/css/ ===
     for css_file in PREBUILT_CSS:
-        src_file = css_src_dir / css_file
-        dst_file = css_dst_dir / css_file
-        if copy_file(src_file, dst_file):
-            print(f"    {css_file}: OK ({dst_file.stat().st_size // 1024} KB)")
+        src_file = source_dist / "css" / css_file
+        dst_file = static_dir / "css" / css_file
+        if src_file.exists():
+            pairs.append((src_file, dst_file, dst_file.relative_to(args.dest).as_posix()))
         else:
-            print(f"    {css_file}: SKIPPED (not found)")
-    print()
-    
-    # Copy assets from src/ FIRST
-    print("Copying assets from src/...")
+            print(f"  WARNING: Source not found: {display(src_file)} (skipped)")
+
+    # Asset groups from src/
     success_count = 0
-    
     for src_subdir, dst_subdir in ASSET_MAPPINGS:
-        src = SING_APP_SRC / src_subdir
-        
-        if dst_subdir:
-            dst = STATIC_DIR / dst_subdir if src_subdir in ["demo", "fonts", "img", "js", "sass"] else TEMPLATES_DIR / dst_subdir
-        else:
-            # Determine destination based on source type
-            if src_subdir in ["pages", "partials"]:
-                dst = TEMPLATES_DIR / src_subdir
-            else:
-                dst = STATIC_DIR / src_subdir
-        
-        if copy_tree(src, dst):
-            success_count += 1
-    
+        src = source_src / src_subdir
+        base = templates_dir if src_subdir in TEMPLATE_GROUPS else static_dir
+        dst = base / (dst_subdir or src_subdir)
+        if not src.exists():
+            print(f"  WARNING: Source not found: {display(src)}")
+            continue
+        pairs.extend(tree_pairs(src, dst, args.dest))
+        prefixes.append(dst.relative_to(args.dest).as_posix() + "/")
+        success_count += 1
+
+    print(f"Syncing {len(pairs)} files ({args.workers} threads)...")
+    stats = sync_files(pairs, manifest, args.workers)
+    staged = {key for _src, _dst, key in pairs}
+    # Only groups whose source exists are pruned; a missing checkout removes nothing
+    stats["removed"] = remove_orphans(manifest, staged, prefixes, args.dest)
+    save_manifest(manifest_path, manifest)
+    print(f"    Copied: {stats['copied']} ({stats['bytes'] / 1024 / 1024:,.1f} MB), "
+          f"unchanged: {stats['unchanged']}, removed: {stats['removed']}, failed: {stats['failed']}")
     print()
-    
+
     # === Task 2: Download vendor JS libraries AFTER copying src ===
     print("Downloading vendor JS libraries...")
-    vendor_success = 0
-    for url, rel_path in VENDOR_DOWNLOADS:
-        dst = STATIC_DIR / rel_path
-        if download_file(url, dst):
-            vendor_success += 1
+    with ThreadPoolExecutor(max_workers=len(VENDOR_DOWNLOADS)) as pool:
+        results = list(pool.map(
+            lambda item: download_file(item[0], static_dir / item[1], item[2], args.mirror, args.refresh_vendor),
+            VENDOR_DOWNLOADS))
+    for message in results:
+        print(f"  {message}")
+    vendor_success = sum(not message.startswith("FAILED") for message in results)
     print(f"    Downloaded: {vendor_success}/{len(VENDOR_DOWNLOADS)}")
     print()
-    
+
     print("=" * 60)
-    print(f"Completed: {success_count}/{len(ASSET_MAPPINGS)} asset groups copied")
+    print(f"Completed: {success_count}/{len(ASSET_MAPPINGS)} asset groups synced "
+          f"in {time.perf_counter() - started:.2f} s")
     print("=" * 60)
     print()
     print("Next steps:")
@@ -4,6 +4,9 @@ WSGI entry point for production servers (gunicorn, uWSGI, etc.).
 Usage:
     gunicorn wsgi:app
     gunicorn wsgi:app --bind 0.0.0.0:$PORT --workers 2
+
+gunicorn picks up gunicorn.conf.py (preload_app, worker count, fork hooks)
+from the working directory.
 """
 import os
 from dotenv import load_dotenv